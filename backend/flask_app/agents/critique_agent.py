@@ -1,5 +1,10 @@
-from flask_app.tools.gemini_connector import generate_response
-from flask_app.core.utils.logger import log_info, log_error
+import json
+import re
+from flask_app.tools.gemini_connector import generate_many, generate_response, track_model_failures
+from flask_app.core.utils.logger import log_debug, log_info, log_error
+from flask_app.core.utils.prompt_builder import PromptBuilder
+
+CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
 
 class CritiqueAgent:
     def __init__(self, threshold=0.8):
@@ -10,7 +15,7 @@ class CritiqueAgent:
         self.threshold = threshold
         log_info(f"CritiqueAgent initialized with threshold={self.threshold}")
 
-    def perform_critique(self, content, goal, context=None):
+    def perform_critique(self, content, goal, context=None, on_token=None):
         """
         Critique content and evaluate how well it meets the goal.
 
@@ -18,6 +23,7 @@ class CritiqueAgent:
             content (str): Text/content to critique.
             goal (str): The goal or requirement the content should satisfy.
             context (str, optional): Additional context.
+            on_token (callable, optional): Receives partial output as it streams.
 
         Returns:
             dict: {
@@ -36,9 +42,9 @@ class CritiqueAgent:
 
         try:
             prompt = self._build_prompt(content, goal, context)
-            log_info(f"CritiqueAgent prompt: {prompt}")
+            log_debug(f"CritiqueAgent prompt: {prompt}")
 
-            response = generate_response(prompt)
+            response = generate_response(prompt, on_token=on_token)
             log_info("CritiqueAgent received response.")
 
             score, critique_text = self._parse_response(response)
@@ -58,19 +64,121 @@ class CritiqueAgent:
                 "critique_text": "Sorry, critique failed due to an error."
             }
 
-    def _build_prompt(self, content, goal, context):
-        base_prompt = (
-            "You are an expert evaluator. Analyze the following content and score how well it satisfies the goal. "
-            "Score on a scale from 0 (does not satisfy) to 1 (fully satisfies).\n\n"
-            f"Goal:\n{goal}\n\n"
-            f"Content:\n{content}\n"
+    def perform_critique_batch(self, content, goals, context=None):
+        """
+        Critique content against several goals with a single model call.
+
+        The model is asked for a JSON array with one entry per goal. Entries that
+        are missing or malformed are re-scored with individual calls (issued
+        together), so one bad entry never costs a full re-run.
+
+        Args:
+            content (str): Text/content to critique.
+            goals (list of str): Goals the content should satisfy.
+            context (str, optional): Additional context.
+
+        Returns:
+            list of dict: One perform_critique-style result per goal, in goal order.
+        """
+        if not goals:
+            return []
+        if not content.strip():
+            return [self.perform_critique(content, goal) for goal in goals]
+
+        results = [None] * len(goals)
+        try:
+            prompt = self._build_batch_prompt(content, goals, context)
+            log_info(f"CritiqueAgent batch prompt for {len(goals)} goals")
+            # A failed batch call is recovered by the per-goal fallback below, so only the
+            # fallback's failures count against the critique step.
+            with track_model_failures():
+                response = generate_response(prompt, config={"response_mime_type": "application/json"})
+            for index, score, critique_text in self._parse_batch_response(response, len(goals)):
+                results[index] = {
+                    "score": score,
+                    "passed": score >= self.threshold,
+                    "critique_text": critique_text.strip()
+                }
+        except Exception as e:
+            log_error(f"CritiqueAgent batch error: {e}")
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            log_info(f"CritiqueAgent falling back to single critiques for goals {missing}")
+            responses = generate_many([self._build_prompt(content, goals[i], context) for i in missing])
+            for i, response in zip(missing, responses):
+                score, critique_text = self._parse_response(response)
+                results[i] = {
+                    "score": score,
+                    "passed": score >= self.threshold,
+                    "critique_text": critique_text.strip()
+                }
+        return results
+
+    def _build_batch_prompt(self, content, goals, context):
+        numbered_goals = "\n".join(f"{i}. {goal}" for i, goal in enumerate(goals))
+        return (
+            PromptBuilder("critique")
+            .add(
+                "You are an expert evaluator. Analyze the following content and score how well it satisfies each goal. "
+                "Score on a scale from 0 (does not satisfy) to 1 (fully satisfies).\n\n"
+                f"Goals:\n{numbered_goals}\n\n"
+            )
+            .add_section(content, header="Content:\n", priority=1)
+            .add_section(context, header="Additional context:\n", priority=0)
+            .add(
+                "Respond with only a JSON array containing one object per goal, in goal order, of the form "
+                '{"goal": <goal number>, "score": <number between 0 and 1>, "critique": "<detailed reasoning>"}.'
+            )
+            .build()
         )
-        if context:
-            base_prompt += f"Additional context:\n{context}\n"
-        base_prompt += (
-            "Provide a numeric score between 0 and 1 on the first line, then a detailed critique explaining your reasoning."
+
+    def _parse_batch_response(self, response, goal_count):
+        """
+        Strictly parse a batch critique response.
+
+        Args:
+            response (str): Text response from Gemini.
+            goal_count (int): Number of goals that were asked about.
+
+        Returns:
+            list of tuple: (goal index, score, critique_text) for each well-formed entry;
+                entries with a bad index, a non-numeric or out-of-range score, or no
+                critique text are left out, as are duplicates.
+        """
+        entries = json.loads(CODE_FENCE.sub("", response.strip()))
+        if not isinstance(entries, list):
+            raise ValueError("batch critique response is not a JSON array")
+
+        parsed = {}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            index, score, critique_text = entry.get("goal"), entry.get("score"), entry.get("critique")
+            if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < goal_count:
+                continue
+            if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 1:
+                continue
+            if not isinstance(critique_text, str) or not critique_text.strip() or index in parsed:
+                continue
+            parsed[index] = (index, float(score), critique_text)
+        return list(parsed.values())
+
+    def _build_prompt(self, content, goal, context):
+        return (
+            PromptBuilder("critique")
+            .add(
+                "You are an expert evaluator. Analyze the following content and score how well it satisfies the goal. "
+                "Score on a scale from 0 (does not satisfy) to 1 (fully satisfies).\n\n"
+                f"Goal:\n{goal}\n\n"
+            )
+            .add_section(content, header="Content:\n", priority=1)
+            .add_section(context, header="Additional context:\n", priority=0)
+            .add(
+                "Provide a numeric score between 0 and 1 on the first line, then a detailed critique explaining your reasoning."
+            )
+            .build()
         )
-        return base_prompt
 
     def _parse_response(self, response):
         """
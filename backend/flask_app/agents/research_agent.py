@@ -1,39 +1,112 @@
-from flask_app.tools.gemini_connector import generate_response
-from flask_app.tools.serpapi_connector import fetch_search_results
-from flask_app.core.utils.logger import log_info, log_error
+import json
+import os
+import re
+import time
+from urllib.parse import urlsplit
+from flask_app.tools.gemini_connector import generate_response, track_model_failures
+from flask_app.tools.serpapi_connector import SerpError, fetch_search_results, search_many, submit_search
+from flask_app.core.utils.logger import log_debug, log_info, log_error
+from flask_app.core.utils.prompt_builder import PromptBuilder
+
+# Fan-out research (opt-in): sub-queries searched concurrently per task (1 disables it) and
+# the wall-clock seconds the searches may take before synthesis proceeds without stragglers.
+FANOUT_WIDTH = int(os.getenv("RESEARCH_FANOUT_WIDTH", "1"))
+FANOUT_BUDGET = float(os.getenv("RESEARCH_FANOUT_BUDGET", "15"))
+RESULTS_PER_QUERY = 5
+MAX_SOURCES = 15
+# Snippets whose word-trigram Jaccard similarity reaches this are treated as duplicates.
+SNIPPET_SIMILARITY = 0.6
+CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+def normalize_url(url):
+    """Scheme, "www.", query-less trailing slash and fragment do not make a different page."""
+    parts = urlsplit(url or "")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path.rstrip("/")
+    return f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+
+def _shingles(text):
+    words = re.findall(r"\w+", (text or "").lower())
+    return {tuple(words[i:i + 3]) for i in range(max(len(words) - 2, 1))} if words else set()
+
+def dedupe_results(result_lists, max_results=MAX_SOURCES, similarity=SNIPPET_SIMILARITY):
+    """
+    Merge per-query result lists round-robin (so every sub-query's best results
+    come first), dropping repeated URLs and near-duplicate snippets.
+
+    Args:
+        result_lists (list of list): {title, link, snippet} dicts per query, best first.
+        max_results (int): Maximum results kept.
+        similarity (float): Jaccard threshold over snippet word trigrams.
+
+    Returns:
+        list: Unique results.
+    """
+    kept, seen_urls, kept_shingles = [], set(), []
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results) or len(kept) >= max_results:
+                continue
+            result = results[rank]
+            url = normalize_url(result.get("link"))
+            if url in seen_urls:
+                continue
+            shingles = _shingles(result.get("snippet"))
+            if shingles and any(len(shingles & other) / len(shingles | other) >= similarity
+                                for other in kept_shingles):
+                continue
+            seen_urls.add(url)
+            kept_shingles.append(shingles)
+            kept.append(result)
+    return kept
 
 class ResearchAgent:
-    def __init__(self, use_web_search=False):
+    def __init__(self, use_web_search=False, fanout_width=FANOUT_WIDTH, time_budget=FANOUT_BUDGET):
         """
         Args:
             use_web_search (bool): Enable SERPAPI usage for live web data.
+            fanout_width (int): Sub-queries searched concurrently per research call; 1 searches
+                the raw query only.
+            time_budget (float): Seconds the fan-out searches may take in total.
         """
         self.use_web_search = use_web_search
-        log_info(f"ResearchAgent initialized with use_web_search={self.use_web_search}")
+        self.fanout_width = fanout_width
+        self.time_budget = time_budget
+        log_info(f"ResearchAgent initialized with use_web_search={self.use_web_search}, fanout_width={fanout_width}")
 
-    def perform_research(self, query, context=None):
+    def perform_research(self, query, context=None, on_token=None):
         """
         Research using live web search (SERPAPI) + Gemini AI as fallback/refinement.
 
+        With web search and a fan-out width above 1, the query is first expanded
+        into sub-queries that are searched concurrently; their deduplicated results
+        feed one synthesis call.
+
         Args:
             query (str): Research topic or question.
             context (str, optional): Additional context.
+            on_token (callable, optional): Receives partial output as it streams.
 
         Returns:
             str: Research output.
         """
         try:
             web_results = ""
-            if self.use_web_search:
+            sub_queries = None
+            if self.use_web_search and self.fanout_width > 1:
+                sub_queries, web_results = self._fan_out(query, context)
+            elif self.use_web_search:
                 log_info(f"Performing web search for query: {query}")
                 search_data = fetch_search_results(query)
                 web_results = self._format_web_results(search_data)
                 log_info("Web search completed.")
 
-            prompt = self._build_prompt(query, context, web_results)
-            log_info(f"ResearchAgent prompt: {prompt}")
+            prompt = self._build_prompt(query, context, web_results, sub_queries)
+            log_debug(f"ResearchAgent prompt: {prompt}")
 
-            response = generate_response(prompt)
+            response = generate_response(prompt, on_token=on_token)
             log_info("ResearchAgent received response.")
             return response.strip()
 
@@ -41,12 +114,78 @@ class ResearchAgent:
             log_error(f"ResearchAgent error: {e}")
             return "Sorry, I couldn't fetch research data at the moment."
 
-    def _format_web_results(self, search_data):
+    def _fan_out(self, query, context):
+        """
+        Expand the query, search every sub-query concurrently within the time budget
+        and deduplicate the results. The raw query's results are always waited for,
+        so an expansion that eats the budget never leaves synthesis without sources.
+
+        Returns:
+            tuple: (sub-queries, formatted web results)
+        """
+        started = time.time()
+        # Search the raw query while the expansion call runs.
+        raw_search = submit_search(query, RESULTS_PER_QUERY)
+        sub_queries = self._expand_query(query, context)
+        remaining = max(self.time_budget - (time.time() - started), 0.0)
+        result_lists = search_many(sub_queries[1:], RESULTS_PER_QUERY, timeout=remaining)
+        try:
+            raw_results = raw_search.result()
+        except SerpError as e:
+            log_error(str(e))
+            raw_results = []
+        result_lists.insert(0, raw_results)
+        results = dedupe_results(result_lists)
+        log_info(
+            f"Fan-out research: {len(sub_queries)} sub-queries, "
+            f"{sum(len(r) for r in result_lists)} results, {len(results)} after dedupe "
+            f"in {time.time() - started:.2f}s"
+        )
+        return sub_queries, self._format_web_results({"organic_results": results}, limit=MAX_SOURCES)
+
+    def _expand_query(self, query, context=None):
+        """
+        Ask Gemini for complementary search queries covering the topic.
+
+        Returns:
+            list of str: The original query followed by up to fanout_width - 1 sub-queries.
+        """
+        prompt = (
+            f"Write {self.fanout_width - 1} distinct web search queries that together cover "
+            f"different aspects of this research topic:\n{query}\n"
+        )
+        if context:
+            prompt += f"Context: {context}\n"
+        prompt += "Respond with only a JSON array of query strings."
+
+        # A failed expansion only narrows the search, so it must not fail the research step.
+        with track_model_failures():
+            response = generate_response(prompt, config={"response_mime_type": "application/json"})
+        try:
+            expansions = json.loads(CODE_FENCE.sub("", response.strip()))
+            if not isinstance(expansions, list):
+                raise ValueError("query expansion is not a JSON array")
+        except ValueError as e:
+            log_error(f"Query expansion failed, searching the raw query only: {e}")
+            expansions = []
+
+        sub_queries, seen = [query], {query.strip().lower()}
+        for expansion in expansions:
+            if not isinstance(expansion, str) or expansion.strip().lower() in seen:
+                continue
+            seen.add(expansion.strip().lower())
+            sub_queries.append(expansion.strip())
+            if len(sub_queries) >= self.fanout_width:
+                break
+        return sub_queries
+
+    def _format_web_results(self, search_data, limit=5):
         """
         Convert raw SERPAPI search data into text summary to guide Gemini.
 
         Args:
             search_data (dict): SERPAPI JSON response.
+            limit (int): Maximum number of results included.
 
         Returns:
             str: Text summary of web results.
@@ -55,7 +194,7 @@ class ResearchAgent:
             return ""
 
         snippets = []
-        for result in search_data["organic_results"][:5]:  # limit to top 5
+        for result in search_data["organic_results"][:limit]:
             title = result.get("title", "")
             snippet = result.get("snippet", "")
             link = result.get("link", "")
@@ -63,7 +202,7 @@ class ResearchAgent:
 
         return "\n".join(snippets)
 
-    def _build_prompt(self, query, context, web_results):
+    def _build_prompt(self, query, context, web_results, sub_queries=None):
         """
         Build Gemini prompt including web search data if available.
 
@@ -71,15 +210,25 @@ class ResearchAgent:
             query (str): Research question.
             context (str or None): Additional context.
             web_results (str): Summarized web search snippets.
+            sub_queries (list of str, optional): Fan-out queries the results came from.
 
         Returns:
             str: Full prompt string.
         """
-        base_prompt = f"Research thoroughly on the following topic:\n{query}\n"
-        if context:
-            base_prompt += f"Use this context to refine your research:\n{context}\n"
-        if web_results:
-            base_prompt += f"Also consider these recent web search results:\n{web_results}\n"
-        base_prompt += "Provide detailed, accurate, and well-structured information."
-
-        return base_prompt
+        if sub_queries:
+            results_header = (
+                f"These web search results were gathered for the queries {json.dumps(sub_queries)}; "
+                f"synthesize them into one consolidated answer, reconciling overlaps and conflicts:\n"
+            )
+        else:
+            results_header = "Also consider these recent web search results:\n"
+
+        # Results are best first, one per line, so the lowest-ranked are dropped first when over budget.
+        return (
+            PromptBuilder("research")
+            .add(f"Research thoroughly on the following topic:\n{query}\n")
+            .add_section(context, header="Use this context to refine your research:\n", priority=1)
+            .add_ranked(web_results.split("\n") if web_results else [], header=results_header)
+            .add("Provide detailed, accurate, and well-structured information.")
+            .build()
+        )
@@ -1,26 +1,28 @@
 from flask_app.tools.gemini_connector import generate_response
-from flask_app.core.utils.logger import log_info, log_error
+from flask_app.core.utils.logger import log_debug, log_info, log_error
+from flask_app.core.utils.prompt_builder import PromptBuilder
 
 class StrategyAgent:
     def __init__(self):
         log_info("StrategyAgent initialized.")
 
-    def plan_next_steps(self, current_context, long_term_goals):
+    def plan_next_steps(self, current_context, long_term_goals, on_token=None):
         """
         Generate strategic plans or next actions based on context and goals.
 
         Args:
             current_context (str): Summary of current progress or situation.
             long_term_goals (str): Description of long-term objectives.
+            on_token (callable, optional): Receives partial output as it streams.
 
         Returns:
             str: Suggested strategy or next steps.
         """
         try:
             prompt = self._build_prompt(current_context, long_term_goals)
-            log_info(f"StrategyAgent prompt: {prompt}")
+            log_debug(f"StrategyAgent prompt: {prompt}")
 
-            response = generate_response(prompt)
+            response = generate_response(prompt, on_token=on_token)
             log_info("StrategyAgent received response.")
             return response.strip()
 
@@ -29,12 +31,15 @@ class StrategyAgent:
             return "Sorry, I couldn't formulate a strategy at the moment."
 
     def _build_prompt(self, current_context, long_term_goals):
-        base_prompt = (
-            "You are a strategic planner AI.\n"
-            "Given the current context and long-term goals, "
-            "suggest clear, prioritized next steps and strategies.\n\n"
-            f"Current Context:\n{current_context}\n\n"
-            f"Long-Term Goals:\n{long_term_goals}\n\n"
-            "Provide a detailed, actionable plan."
+        return (
+            PromptBuilder("strategy")
+            .add(
+                "You are a strategic planner AI.\n"
+                "Given the current context and long-term goals, "
+                "suggest clear, prioritized next steps and strategies.\n\n"
+            )
+            .add_section(current_context, header="Current Context:\n", footer="\n\n", priority=1)
+            .add_section(long_term_goals, header="Long-Term Goals:\n", footer="\n\n", priority=2)
+            .add("Provide a detailed, actionable plan.")
+            .build()
         )
-        return base_prompt
@@ -1,26 +1,28 @@
 from flask_app.tools.gemini_connector import generate_response
-from flask_app.core.utils.logger import log_info, log_error
+from flask_app.core.utils.logger import log_debug, log_info, log_error
+from flask_app.core.utils.prompt_builder import PromptBuilder
 
 class SummarizerAgent:
     def __init__(self):
         log_info("SummarizerAgent initialized.")
 
-    def summarize(self, text, max_length=500):
+    def summarize(self, text, max_length=500, on_token=None):
         """
         Summarize or clarify given text content.
 
         Args:
             text (str): Text to summarize.
             max_length (int): Max tokens or words in summary (approx).
+            on_token (callable, optional): Receives partial output as it streams.
 
         Returns:
             str: Summarized text.
         """
         try:
             prompt = self._build_prompt(text, max_length)
-            log_info(f"SummarizerAgent prompt: {prompt[:100]}...")  # Log first 100 chars
+            log_debug(f"SummarizerAgent prompt: {prompt}")
 
-            response = generate_response(prompt)
+            response = generate_response(prompt, on_token=on_token)
             log_info("SummarizerAgent received response.")
             return response.strip()
 
@@ -29,9 +31,10 @@ class SummarizerAgent:
             return "Sorry, I couldn't summarize the content at the moment."
 
     def _build_prompt(self, text, max_length):
-        base_prompt = (
-            "Please provide a clear, concise, and structured summary of the following text:\n\n"
-            f"{text}\n\n"
-            f"Limit the summary to approximately {max_length} words or tokens."
+        return (
+            PromptBuilder("summary")
+            .add("Please provide a clear, concise, and structured summary of the following text:\n\n")
+            .add_section(text, footer="\n\n")
+            .add(f"Limit the summary to approximately {max_length} words or tokens.")
+            .build()
         )
-        return base_prompt
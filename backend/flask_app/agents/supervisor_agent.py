@@ -1,16 +1,46 @@
-from flask_app.core.services.agent_service import AgentService
-from flask_app.core.services.planning_service import PlanningService
+import queue
+import threading
+import time
+from flask_app.agents.critique_agent import CritiqueAgent
+from flask_app.agents.research_agent import ResearchAgent
+from flask_app.agents.strategy_agent import StrategyAgent
+from flask_app.agents.summarizer_agent import SummarizerAgent
+from flask_app.core.services.agent_service import DEFAULT_EXECUTION_MODE, get_agent_pool
+from flask_app.core.services.conversation_memory import task_scope
+from flask_app.core.services.planning_service import get_planning_service
+from flask_app.core.services.task_graph import TaskGraph
 from flask_app.core.utils.logger import log_info, log_error
+from flask_app.core.utils.prompt_builder import track_prompts
+from flask_app.core.utils.telemetry import span, trace_task
+from flask_app.tools.gemini_connector import count_model_calls, track_model_failures
+
+TASK_STEPS = ("plan", "research", "summary", "critique", "strategy")
+TASK_GRAPH_WORKERS = 8
+
+class StepError(Exception):
+    """A pipeline step whose model call failed, so its output is only fallback text."""
 
 class SupervisorAgent:
-    def __init__(self, use_web_search=False):
-        self.agent_service = AgentService(use_web_search)
-        self.planning_service = PlanningService()
-        self.research_agent = self.agent_service.create_agent("research")
-        self.summarize_agent = self.agent_service.create_agent("summarize")
-        self.critique_agent = self.agent_service.create_agent("critique")
-        self.strategy_agent = self.agent_service.create_agent("strategy")
-        log_info("SupervisorAgent initialized with LangChain agents")
+    def __init__(self, use_web_search=False, mode=DEFAULT_EXECUTION_MODE):
+        """
+        Args:
+            use_web_search (bool): Enable web search for research.
+            mode (str): Default execution mode ("direct" or "react"); a task can
+                override it with data["mode"].
+        """
+        started = time.perf_counter()
+        self.use_web_search = use_web_search
+        self.mode = mode
+        # Agents come pre-built from the process-wide pool; task state is bound at call time.
+        self.agent_pool = get_agent_pool()
+        self.agent_service = self.agent_pool.get_service(use_web_search)
+        # Plans are persisted and shared by all supervisors (and workers).
+        self.planning_service = get_planning_service()
+        # All goals are critiqued in one structured call instead of one ReAct run per goal.
+        self.critic = CritiqueAgent()
+        self._steps = {}  # step runners per execution mode, built on first use
+        self.agent_pool.record_construction(time.perf_counter() - started)
+        log_info(f"SupervisorAgent initialized in {mode} mode")
 
     def _needs_summarization(self, content: str) -> bool:
         """Determine if content needs summarization"""
@@ -25,57 +55,185 @@ class SupervisorAgent:
             return False
         return True
 
-    def manage_task(self, task_id, data):
+    def _agent_steps(self, mode):
+        """Step runners backed by AgentService agents in the given execution mode."""
+        if mode not in self._steps:
+            research_agent = self.agent_pool.get("research", self.use_web_search, mode)
+            summarize_agent = self.agent_pool.get("summarize", self.use_web_search, mode)
+            strategy_agent = self.agent_pool.get("strategy", self.use_web_search, mode)
+
+            if mode == "direct":
+                steps = {
+                    "research": lambda query, context, on_token: research_agent.run(
+                        query, context, on_token=on_token
+                    ),
+                    "summary": lambda text, on_token: summarize_agent.run(text, on_token=on_token),
+                    "strategy": lambda summary, goals, on_token: strategy_agent.run(
+                        summary, ", ".join(goals), on_token=on_token
+                    )
+                }
+            else:
+                def research(query, context, on_token):
+                    research_input = f"Research: {query}"
+                    if context:
+                        research_input += f"\nContext: {context}"
+                    return research_agent.run(research_input)
+
+                steps = {
+                    "research": research,
+                    "summary": lambda text, on_token: summarize_agent.run(f"Summarize this research: {text}"),
+                    "strategy": lambda summary, goals, on_token: strategy_agent.run(
+                        f"Based on: {summary}\nGenerate strategy for: {', '.join(goals)}"
+                    )
+                }
+            self._steps[mode] = {"critique": self._critique_goals, **steps}
+        return self._steps[mode]
+
+    def _token_steps(self):
+        """Step runners that call the agents directly so model output can be forwarded as it streams."""
+        if "stream" not in self._steps:
+            researcher = ResearchAgent(self.use_web_search)
+            summarizer = SummarizerAgent()
+            strategist = StrategyAgent()
+
+            self._steps["stream"] = {
+                "research": lambda query, context, on_token: researcher.perform_research(
+                    query, context, on_token=on_token
+                ),
+                "summary": lambda text, on_token: summarizer.summarize(text, on_token=on_token),
+                "critique": self._critique_goals,
+                "strategy": lambda summary, goals, on_token: strategist.plan_next_steps(
+                    summary, ", ".join(goals), on_token=on_token
+                )
+            }
+        return self._steps["stream"]
+
+    def manage_task(self, task_id, data, on_event=None):
+        """
+        Run the plan/research/summary/critique/strategy graph for a task;
+        independent steps run concurrently.
+
+        Args:
+            task_id: Task identifier.
+            data (dict): {"query", "goals", "context", "mode" (optional)}.
+            on_event (callable, optional): Receives step_start/step_end/error event dicts.
+
+        Returns:
+            dict: Output of every step plus per-step "timings", the execution "mode",
+                "model_calls" made, the size of each prompt built ("prompts") and
+                the task's span tree ("trace"), or {"error": str}.
+        """
+        mode = data.get("mode") or self.mode
+        try:
+            steps = self._agent_steps(mode)
+        except Exception as e:
+            # Unknown modes and agents that fail to build are reported like step errors.
+            log_error(f"SupervisorAgent could not prepare {mode} agents for task {task_id}: {e}")
+            return {"error": str(e)}
+        return self._run_steps(task_id, data, steps, on_event, mode=mode)
+
+    def stream_task(self, task_id, data):
+        """
+        Run the task in a background thread and yield its events as they happen:
+        step_start/step_end for each step, token events carrying partial model output,
+        and a final done event holding the same dict manage_task returns.
+        """
+        events = queue.Queue()
+
+        def _run():
+            try:
+                result = self._run_steps(task_id, data, self._token_steps(), events.put, mode="stream")
+                events.put({"type": "done", "result": result})
+            finally:
+                events.put(None)
+
+        threading.Thread(target=_run, name=f"task-{task_id}", daemon=True).start()
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            yield event
+
+    def _run_steps(self, task_id, data, steps, on_event=None, mode=None):
         log_info(f"SupervisorAgent managing task: {task_id}")
+        emit = on_event or (lambda event: None)
+        stream = mode == "stream"
+
+        def run_step(name, fn, *args, **extra):
+            emit({"type": "step_start", "step": name, **extra})
+            started = time.time()
+            on_token = (lambda text: emit({"type": "token", "step": name, "text": text, **extra})) if stream else None
+            with span(f"step.{name}", mode=mode), track_model_failures() as failures:
+                result = fn(*args, on_token)
+            if failures["failures"]:
+                # Raising makes the task graph cancel every step that has not started,
+                # instead of spending model calls on the fallback text downstream.
+                raise StepError(f"{name} step failed: {failures['failures']} model call(s) did not succeed")
+            emit({"type": "step_end", "step": name, "result": result,
+                  "elapsed": round(time.time() - started, 3), **extra})
+            return result
+
         try:
             query = data.get("query", "")
             goals = data.get("goals", [])
             context = data.get("context", None)
-            
-            # Step 1: Planning
-            plan = self.planning_service.create_plan(query, goals)
-            
-            # Step 2: Research
-            research_input = f"Research: {query}"
-            if context:
-                research_input += f"\nContext: {context}"
-            research_result = self.research_agent.run(research_input)
-            
-            # Step 3: Conditional Summarization
-            summary = research_result
-            if self._needs_summarization(research_result):
-                summary = self.summarize_agent.run(
-                    f"Summarize this research: {research_result}"
-                )
-            
-            # Step 4: Conditional Critique
+
+            # Planning and research are independent; summary waits for research, and
+            # critique and strategy run in parallel on the summary.
+            graph = TaskGraph(max_workers=TASK_GRAPH_WORKERS)
+            graph.add("plan", lambda r: run_step(
+                "plan", lambda q, g, on_token: self.planning_service.create_plan(q, g, task_id=task_id), query, goals
+            ))
+            graph.add("research", lambda r: run_step("research", steps["research"], query, context))
+
+            # Conditional Summarization
+            def summarize(r):
+                if not self._needs_summarization(r["research"]):
+                    return r["research"]
+                return run_step("summary", steps["summary"], r["research"])
+            graph.add("summary", summarize, deps=["research"])
+
+            # Conditional Critique: every goal that needs one, scored in a single batch call.
+            def critique(r):
+                critique_goals = [goal for goal in goals if self._needs_critique(r["summary"], goal)]
+                if not critique_goals:
+                    return []
+                return run_step("critique", steps["critique"], r["summary"], critique_goals, goals=critique_goals)
+            graph.add("critique", critique, deps=["summary"])
+
+            graph.add("strategy", lambda r: run_step("strategy", steps["strategy"], r["summary"], goals),
+                      deps=["summary"])
+
+            with count_model_calls() as model_calls, track_prompts() as prompts, task_scope(task_id), \
+                    trace_task(task_id) as trace:
+                results = graph.run()
+
+            # Report the first failing goal, else the last critique, as the sequential loop did.
             critique_result = {"passed": True, "score": 1.0}
-            for goal in goals:
-                if self._needs_critique(summary, goal):
-                    critique_input = f"Critique this against goal: {goal}\nContent: {summary}"
-                    critique_response = self.critique_agent.run(critique_input)
-                    # Parse critique response into result format
-                    critique_result = self._parse_critique(critique_response)
-                    if not critique_result["passed"]:
-                        break
-            
-            # Step 5: Strategy
-            strategy_input = f"Based on: {summary}\nGenerate strategy for: {', '.join(goals)}"
-            strategy = self.agent_service.strategy_agent.run(strategy_input)
-            
+            for critique_result in results["critique"]:
+                if not critique_result["passed"]:
+                    break
+
             return {
-                "plan": plan,
-                "research": research_result,
-                "summary": summary,
+                "plan": results["plan"],
+                "research": results["research"],
+                "summary": results["summary"],
                 "critique": critique_result,
-                "strategy": strategy
+                "strategy": results["strategy"],
+                "timings": graph.timings,
+                "mode": mode,
+                "model_calls": model_calls,
+                "prompts": prompts,
+                "trace": trace.to_dict()
             }
 
         except Exception as e:
             log_error(f"SupervisorAgent error for task {task_id}: {e}")
+            emit({"type": "error", "error": str(e)})
             return {"error": str(e)}
-    
-    def _parse_critique(self, critique_text: str) -> dict:
-        if "not sufficient" in critique_text.lower():
-            return {"score": 0.4, "passed": False, "text": critique_text}
-        return {"score": 0.85, "passed": True, "text": critique_text}
+
+    def _critique_goals(self, content, goals, on_token=None):
+        return [
+            {"score": result["score"], "passed": result["passed"], "text": result["critique_text"]}
+            for result in self.critic.perform_critique_batch(content, goals)
+        ]
@@ -1,7 +1,11 @@
-from flask import Flask
+import threading
+from flask import Flask, Response
 from flask_cors import CORS
 from config.settings import Config
 from db.db_init import init_db
+from flask_app.core.services.planning_service import get_planning_service
+from flask_app.core.utils.logger import log_error
+from flask_app.core.utils.telemetry import render_metrics
 
 # Import Blueprints
 from core.routes.user_routes import user_bp
@@ -15,16 +19,32 @@ def create_app():
 
     # Initialize DB
     init_db(app)
+    # Task graph steps run outside the request context; give the planner the app explicitly.
+    get_planning_service().init_app(app)
 
     # Register Blueprints
     app.register_blueprint(user_bp, url_prefix='/api/user')
     app.register_blueprint(task_bp, url_prefix='/api/task')
     app.register_blueprint(document_bp, url_prefix='/api/document')
 
+    # Pre-build pooled agents in the background so the first task request skips construction.
+    # A broken agent build is logged; it must not keep the API from starting.
+    if app.config["AGENT_WARMUP"]:
+        try:
+            from flask_app.core.services.agent_service import get_agent_pool
+            threading.Thread(target=get_agent_pool().warm_up, name="agent-warmup", daemon=True).start()
+        except Exception as e:
+            log_error(f"Agent warm-up skipped: {e}")
+
     @app.route('/ping')
     def ping():
         return {'status': 'pong'}
 
+    # Prometheus scrape target: span latency histograms, model calls and tokens, cache hit ratios.
+    @app.route('/metrics')
+    def metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
     return app
 
 if __name__ == '__main__':
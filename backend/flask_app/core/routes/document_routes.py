@@ -1,7 +1,167 @@
-from flask import Blueprint
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from flask import Blueprint, current_app, request, url_for
+from werkzeug.utils import secure_filename
+from db.models import db, UploadedFile
+from flask_app.core.services.ingestion_service import IngestionQueue
+from flask_app.core.utils.file_parser import file_sha256
+from flask_app.core.utils.logger import log
 
 document_bp = Blueprint('document', __name__)
 
+ALLOWED_EXTENSIONS = {".pdf", ".docx"}
+
+_ingestion_queue = None
+_ingestion_queue_lock = threading.Lock()
+
+def _get_ingestion_queue() -> IngestionQueue:
+    """Create the process-wide ingestion queue on first use, sized from app config."""
+    global _ingestion_queue
+    with _ingestion_queue_lock:
+        if _ingestion_queue is None:
+            app = current_app._get_current_object()
+
+            def _record_status(job):
+                # Persist transitions so any worker (or a restarted one) can answer status polls.
+                with app.app_context():
+                    uploaded = db.session.get(UploadedFile, job["job_id"])
+                    if uploaded is None:
+                        return
+                    uploaded.status = job["status"]
+                    uploaded.error = job["error"]
+                    uploaded.doc_id = job["doc_id"]
+                    if job["status"] in ("ready", "failed"):
+                        uploaded.processed_at = datetime.utcnow()
+                    if job["status"] == "ready":
+                        # A replaced document no longer holds the bytes of its earlier uploads,
+                        # so their hashes must not deduplicate future uploads onto it.
+                        UploadedFile.query.filter(
+                            UploadedFile.doc_id == uploaded.doc_id,
+                            UploadedFile.id != uploaded.id,
+                            UploadedFile.content_hash != uploaded.content_hash
+                        ).update({"content_hash": None}, synchronize_session=False)
+                    db.session.commit()
+
+            _ingestion_queue = IngestionQueue(
+                workers=app.config["INGEST_WORKERS"],
+                max_pending=app.config["INGEST_QUEUE_SIZE"],
+                on_transition=_record_status
+            )
+        return _ingestion_queue
+
+def _epoch(stored_at):
+    """Epoch seconds for a stored datetime; columns hold naive UTC from datetime.utcnow()."""
+    return stored_at.replace(tzinfo=timezone.utc).timestamp() if stored_at else None
+
 @document_bp.route('/test', methods=['GET'])
 def test_document():
     return {'message': 'Document route working!'}
+
+@document_bp.route('/upload', methods=['POST'])
+def upload_document():
+    """Save the file, record it and enqueue ingestion; poll /<id>/status for progress."""
+    file = request.files.get('file')
+    if file is None or not file.filename:
+        return {'error': 'No file provided'}, 400
+
+    filename = secure_filename(file.filename)
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        return {'error': f'Unsupported file type; allowed: {sorted(ALLOWED_EXTENSIONS)}'}, 400
+
+    ingestion_queue = _get_ingestion_queue()
+    if ingestion_queue.is_full():
+        # Backpressure: reject before writing anything to disk.
+        return {'error': 'Ingestion queue is full, retry later'}, 503, {'Retry-After': '5'}
+
+    # An edited version of an existing document keeps its doc_id so only changed chunks are re-indexed.
+    doc_id = request.form.get("replace_doc_id")
+    if doc_id and UploadedFile.query.filter_by(doc_id=doc_id).first() is None:
+        return {'error': f'Unknown document {doc_id}'}, 404
+    doc_id = doc_id or str(uuid.uuid4())
+
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    os.makedirs(upload_folder, exist_ok=True)
+    file_path = os.path.join(upload_folder, f"{uuid.uuid4().hex}_{filename}")
+    file.save(file_path)
+    content_hash = file_sha256(file_path)
+
+    duplicate = UploadedFile.query.filter_by(content_hash=content_hash, status="ready")
+    if request.form.get("replace_doc_id"):
+        # A replacement must land on the requested document, even if another one has these bytes.
+        duplicate = duplicate.filter_by(doc_id=doc_id)
+    duplicate = duplicate.first()
+    if duplicate is not None:
+        # Same bytes already indexed: point the new record at the existing document.
+        os.remove(file_path)
+        uploaded = UploadedFile(
+            filename=filename,
+            filepath=duplicate.filepath,
+            uploaded_at=datetime.utcnow(),
+            doc_id=duplicate.doc_id,
+            content_hash=content_hash,
+            status="ready",
+            processed_at=datetime.utcnow()
+        )
+        db.session.add(uploaded)
+        db.session.commit()
+        log(f"Upload {filename} matches indexed document {duplicate.doc_id}, skipping ingestion")
+        return {
+            'file_id': uploaded.id,
+            'doc_id': uploaded.doc_id,
+            'status': uploaded.status,
+            'deduplicated': True,
+            'status_url': url_for('document.document_status', file_id=uploaded.id)
+        }, 200
+
+    uploaded = UploadedFile(
+        filename=filename,
+        filepath=file_path,
+        uploaded_at=datetime.utcnow(),
+        doc_id=doc_id,
+        content_hash=content_hash,
+        status="queued"
+    )
+    db.session.add(uploaded)
+    db.session.commit()
+
+    metadata = {"file_id": uploaded.id, "filename": filename}
+    if request.form.get("user_id"):
+        metadata["user_id"] = request.form["user_id"]
+    job = ingestion_queue.submit(uploaded.id, file_path, doc_id, metadata=metadata)
+    if job is None:
+        uploaded.status = "failed"
+        uploaded.error = "Ingestion queue is full"
+        db.session.commit()
+        return {'error': 'Ingestion queue is full, retry later'}, 503, {'Retry-After': '5'}
+
+    log(f"Queued document {doc_id} ({filename}) for ingestion")
+    return {
+        'file_id': uploaded.id,
+        'doc_id': doc_id,
+        'status': job["status"],
+        'status_url': url_for('document.document_status', file_id=uploaded.id)
+    }, 202
+
+@document_bp.route('/<int:file_id>/status', methods=['GET'])
+def document_status(file_id):
+    """Report queued/parsing/indexing/ready/failed plus progress and timings."""
+    job = _get_ingestion_queue().get_job(file_id)
+    if job is not None:
+        return job
+
+    # Not queued in this worker: fall back to the persisted status.
+    uploaded = db.session.get(UploadedFile, file_id)
+    if uploaded is None:
+        return {'error': 'Document not found'}, 404
+    return {
+        'job_id': uploaded.id,
+        'doc_id': uploaded.doc_id,
+        'status': uploaded.status,
+        'error': uploaded.error,
+        'timings': {
+            'queued_at': _epoch(uploaded.uploaded_at),
+            f'{uploaded.status}_at': _epoch(uploaded.processed_at)
+        }
+    }
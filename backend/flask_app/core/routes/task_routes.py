@@ -1,7 +1,77 @@
-from flask import Blueprint
+import json
+from flask import Blueprint, Response, request, stream_with_context
+from flask_app.core.services.conversation_memory import get_conversation_memory
 
 task_bp = Blueprint('task', __name__)
 
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
 @task_bp.route('/test', methods=['GET'])
 def test_task():
     return {'message': 'Task route working!'}
+
+@task_bp.route('/memory/metrics', methods=['GET'])
+def memory_metrics():
+    """Conversation memory size per task, plus eviction/summary counters."""
+    return get_conversation_memory().get_metrics()
+
+@task_bp.route('/prompts/metrics', methods=['GET'])
+def prompt_metrics():
+    """Prompt sizes per step (count, total/avg/max tokens, how many were compressed to fit the budget)."""
+    from flask_app.core.utils.prompt_builder import get_prompt_stats
+    return get_prompt_stats()
+
+@task_bp.route('/agents/metrics', methods=['GET'])
+def agent_pool_metrics():
+    """Agent build times in the shared pool vs. per-request supervisor construction time."""
+    from flask_app.core.services.agent_service import get_agent_pool
+    return get_agent_pool().get_metrics()
+
+@task_bp.route('/<task_id>/trace', methods=['GET'])
+def task_trace(task_id):
+    """Span tree of the task's latest run: model calls, searches, retrieval and memory writes per step."""
+    from flask_app.core.utils.telemetry import get_trace
+    trace = get_trace(task_id)
+    if trace is None:
+        return {'error': f'No trace recorded for task {task_id}'}, 404
+    return trace
+
+@task_bp.route('/<task_id>/stream', methods=['GET', 'POST'])
+def stream_task(task_id):
+    """
+    Run a task and stream its progress as server-sent events: step_start/step_end
+    for plan, research, summary, critique and strategy, token events with partial
+    model output, then done (or error). POST takes a JSON body; GET (for
+    EventSource) takes query, goals (repeatable), context and use_web_search args.
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        data = {"query": body.get("query", ""), "goals": body.get("goals", []), "context": body.get("context")}
+        use_web_search = bool(body.get("use_web_search", False))
+    else:
+        data = {
+            "query": request.args.get("query", ""),
+            "goals": request.args.getlist("goals"),
+            "context": request.args.get("context")
+        }
+        use_web_search = request.args.get("use_web_search", "false").lower() in ("1", "true", "yes")
+
+    if not data["query"]:
+        return {'error': 'query is required'}, 400
+
+    # Imported here so app startup does not load the agent/LangChain stack.
+    from flask_app.agents.supervisor_agent import SupervisorAgent
+    supervisor = SupervisorAgent(use_web_search)
+
+    def _events():
+        # Sent immediately so the client gets its first byte before any model call returns.
+        yield _sse({"type": "accepted", "task_id": task_id})
+        for event in supervisor.stream_task(task_id, data):
+            yield _sse(event)
+
+    return Response(
+        stream_with_context(_events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
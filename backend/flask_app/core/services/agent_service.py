@@ -1,18 +1,81 @@
+import os
+import threading
+import time
+from typing import Any, List, Optional
 from langchain.agents import AgentExecutor, Tool, initialize_agent
-from langchain.memory import ConversationBufferMemory
-from flask_app.tools import (
-    GeminiTool,
-    SerpTool,
-    DocumentQATool,
-    MemoryTool
-)
-from flask_app.core.utils.logger import log_info
+from langchain_core.language_models.llms import LLM
+from flask_app.agents.critique_agent import CritiqueAgent
+from flask_app.agents.research_agent import ResearchAgent
+from flask_app.agents.strategy_agent import StrategyAgent
+from flask_app.agents.summarizer_agent import SummarizerAgent
+from flask_app.tools.document_qa_tool import DocumentQATool
+from flask_app.tools.memory_tool import MemoryTool
+from flask_app.tools.serp_tool import SerpTool
+from flask_app.core.utils.logger import log_info, log_error
+from flask_app.core.utils.telemetry import metrics
+from flask_app.core.services.conversation_memory import TaskScopedMemory, get_conversation_memory
 from flask_app.core.services.rag_service import RAGService
+from flask_app.tools.gemini_connector import generate_response
+
+# "direct": pipeline steps call their agent class directly; "react": every step is a LangChain ReAct loop.
+EXECUTION_MODES = ("direct", "react")
+DEFAULT_EXECUTION_MODE = os.getenv("AGENT_EXECUTION_MODE", "direct")
+# Steps with a fixed flow (research searches the web itself when enabled) that need no tool choice.
+DIRECT_AGENT_TYPES = ("research", "summarize", "critique", "strategy")
+VERBOSE_AGENTS = os.getenv("AGENT_VERBOSE", "0") == "1"
+# Structured-chat ReAct: the plain zero-shot agent rejects multi-input tools (DocumentQA, Memory, SerpAPI).
+REACT_AGENT = "structured-chat-zero-shot-react-description"
+# Agents the supervisor pipeline uses; critique runs as a batch call outside the pool.
+PIPELINE_AGENT_TYPES = ("research", "summarize", "strategy")
+
+class GeminiLLM(LLM):
+    """
+    LangChain LLM backed by gemini_connector, so ReAct agents share the
+    client's rate limits, retries, response cache and model call counting.
+    """
+
+    @property
+    def _llm_type(self) -> str:
+        return "gemini"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> str:
+        text = generate_response(prompt)
+        # ReAct stops at "Observation:" so the agent, not the model, runs the tool.
+        for token in stop or ():
+            index = text.find(token)
+            if index != -1:
+                text = text[:index]
+        return text
+
+class DirectAgent:
+    """
+    Thin agent exposing `run` like an AgentExecutor, but calling one method of
+    an existing agent class directly: one model call, no reasoning loop.
+    """
+
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn
+
+    def run(self, *args, **kwargs):
+        # Model calls are counted by gemini_connector itself.
+        return self.fn(*args, **kwargs)
 
 class AgentService:
-    def __init__(self, use_web_search=False):
+    def __init__(self, use_web_search=False, mode=DEFAULT_EXECUTION_MODE):
+        """
+        Args:
+            use_web_search (bool): Give ReAct agents the SerpAPI tool.
+            mode (str): Default execution mode for create_agent, "direct" or "react".
+        """
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode: {mode}")
+        self.mode = mode
+        self.use_web_search = use_web_search
+        self.llm = GeminiLLM()
         self.tools = self._initialize_tools(use_web_search)
-        self.memory = ConversationBufferMemory(memory_key="chat_history")
+        # Histories are kept per task (see conversation_memory.task_scope) under a token budget.
+        self.memory = TaskScopedMemory(store=get_conversation_memory(), memory_key="chat_history")
         log_info("AgentService initialized with LangChain tools")
 
     def _initialize_tools(self, use_web_search):
@@ -32,10 +95,22 @@ class AgentService:
         return tools
 
     def _gemini_fallback(self, prompt: str) -> str:
-        from flask_app.tools.gemini_connector import generate_response
         return generate_response(prompt)
 
-    def create_agent(self, agent_type: str, **kwargs):
+    def create_agent(self, agent_type: str, mode=None, **kwargs):
+        """
+        Args:
+            agent_type (str): research, summarize, critique, strategy or supervisor.
+            mode (str, optional): "direct" returns a DirectAgent for research, summarize,
+                critique and strategy; the supervisor agent needs tool choice and is always
+                a ReAct agent. Defaults to the service's mode.
+        """
+        mode = mode or self.mode
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode: {mode}")
+        if mode == "direct" and agent_type in DIRECT_AGENT_TYPES:
+            return self._create_direct_agent(agent_type)
+
         agent_map = {
             "research": self._create_research_agent,
             "summarize": self._create_summarize_agent,
@@ -45,47 +120,164 @@ class AgentService:
         }
         return agent_map[agent_type](**kwargs)
 
+    def _create_direct_agent(self, agent_type: str) -> DirectAgent:
+        if agent_type == "research":
+            return DirectAgent(agent_type, ResearchAgent(self.use_web_search).perform_research)
+        if agent_type == "summarize":
+            return DirectAgent(agent_type, SummarizerAgent().summarize)
+        if agent_type == "critique":
+            return DirectAgent(agent_type, CritiqueAgent().perform_critique)
+        return DirectAgent(agent_type, StrategyAgent().plan_next_steps)
+
     def _create_research_agent(self):
         return initialize_agent(
+            llm=self.llm,
             tools=self.tools,
-            agent="zero-shot-react-description",
+            agent=REACT_AGENT,
             memory=self.memory,
-            verbose=True,
+            verbose=VERBOSE_AGENTS,
             max_iterations=5
         )
 
     def _create_summarize_agent(self):
         return initialize_agent(
+            llm=self.llm,
             tools=[t for t in self.tools if t.name in ["Gemini", "Memory"]],
-            agent="zero-shot-react-description",
+            agent=REACT_AGENT,
             memory=self.memory,
-            verbose=True,
+            verbose=VERBOSE_AGENTS,
             max_iterations=3
         )
 
     def _create_critique_agent(self):
         return initialize_agent(
+            llm=self.llm,
             tools=[t for t in self.tools if t.name == "Gemini"],
-            agent="zero-shot-react-description",
+            agent=REACT_AGENT,
             memory=self.memory,
-            verbose=False,
+            verbose=VERBOSE_AGENTS,
             max_iterations=2
         )
 
     def _create_strategy_agent(self):
         return initialize_agent(
+            llm=self.llm,
             tools=[t for t in self.tools if t.name in ["Gemini", "Memory", "DocumentQA"]],
-            agent="zero-shot-react-description",
+            agent=REACT_AGENT,
             memory=self.memory,
-            verbose=True,
+            verbose=VERBOSE_AGENTS,
             max_iterations=4
         )
 
     def _create_supervisor_agent(self):
         return initialize_agent(
+            llm=self.llm,
             tools=self.tools,
-            agent="zero-shot-react-description",
+            agent=REACT_AGENT,
             memory=self.memory,
-            verbose=False,
+            verbose=VERBOSE_AGENTS,
             max_iterations=6
         )
+
+
+class AgentPool:
+    """
+    Process-wide registry of pre-built agents keyed by (agent type,
+    use_web_search, mode), so requests reuse executors instead of rebuilding
+    tools and LangChain agents every time.
+
+    Pooled agents hold no per-task state: conversation memory and model call
+    counting are resolved from the caller's context when an agent runs.
+    """
+
+    def __init__(self):
+        self._services = {}
+        self._agents = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.stats = {"builds": 0, "hits": 0, "build_seconds": {}, "constructions": 0, "construction_seconds": 0.0}
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_service(self, use_web_search=False) -> AgentService:
+        key = ("service", bool(use_web_search))
+        with self._key_lock(key):
+            if key not in self._services:
+                started = time.perf_counter()
+                self._services[key] = AgentService(use_web_search)
+                self._record_build(key, time.perf_counter() - started)
+            return self._services[key]
+
+    def get(self, agent_type, use_web_search=False, mode=DEFAULT_EXECUTION_MODE):
+        """Return the shared agent for this key, building it on first use (once, even under concurrency)."""
+        key = (agent_type, bool(use_web_search), mode)
+        agent = self._agents.get(key)
+        if agent is not None:
+            with self._lock:
+                self.stats["hits"] += 1
+            return agent
+
+        service = self.get_service(use_web_search)
+        with self._key_lock(key):
+            if key not in self._agents:
+                started = time.perf_counter()
+                self._agents[key] = service.create_agent(agent_type, mode=mode)
+                self._record_build(key, time.perf_counter() - started)
+            return self._agents[key]
+
+    def _record_build(self, key, seconds):
+        with self._lock:
+            self.stats["builds"] += 1
+            self.stats["build_seconds"]["|".join(str(part) for part in key)] = round(seconds, 4)
+
+    def record_construction(self, seconds):
+        """Per-request construction cost (e.g. SupervisorAgent.__init__), for comparing against builds."""
+        with self._lock:
+            self.stats["constructions"] += 1
+            self.stats["construction_seconds"] += seconds
+
+    def warm_up(self, agent_types=PIPELINE_AGENT_TYPES, web_search_options=(False, True), modes=(DEFAULT_EXECUTION_MODE,)):
+        """Build the given agents ahead of the first request; failures are logged, not raised."""
+        started = time.perf_counter()
+        for use_web_search in web_search_options:
+            for mode in modes:
+                for agent_type in agent_types:
+                    try:
+                        self.get(agent_type, use_web_search, mode)
+                    except Exception as e:
+                        log_error(f"Agent warm-up failed for {agent_type} (web={use_web_search}, {mode}): {e}")
+        log_info(f"AgentPool warm-up finished in {time.perf_counter() - started:.2f}s")
+
+    def get_metrics(self):
+        with self._lock:
+            stats = {**self.stats, "build_seconds": dict(self.stats["build_seconds"])}
+        constructions = stats["constructions"]
+        stats["avg_construction_seconds"] = stats["construction_seconds"] / constructions if constructions else 0.0
+        stats["pooled_agents"] = len(self._agents)
+        return stats
+
+    def collect_metrics(self):
+        """Pool counters as (name, kind, labels, value) samples for the Prometheus /metrics endpoint."""
+        stats = self.get_metrics()
+        yield "sage_agent_pool_builds_total", "counter", {}, stats["builds"]
+        yield "sage_agent_pool_hits_total", "counter", {}, stats["hits"]
+        yield "sage_agent_pool_agents", "gauge", {}, stats["pooled_agents"]
+        for key, seconds in sorted(stats["build_seconds"].items()):
+            yield "sage_agent_pool_build_seconds", "gauge", {"agent": key}, seconds
+        yield "sage_agent_constructions_total", "counter", {}, stats["constructions"]
+        yield "sage_agent_construction_seconds_total", "counter", {}, stats["construction_seconds"]
+
+# Global instance shared by all supervisors
+_agent_pool = AgentPool()
+metrics.register_collector(_agent_pool.collect_metrics)
+metrics.describe("sage_agent_pool_builds_total", "Agents and services built by the shared pool.")
+metrics.describe("sage_agent_pool_hits_total", "Agent lookups served by an already built pooled agent.")
+metrics.describe("sage_agent_pool_agents", "Agents currently held by the shared pool.")
+metrics.describe("sage_agent_pool_build_seconds", "Time the pool spent building each pooled agent or service.")
+metrics.describe("sage_agent_constructions_total", "Per-request supervisor constructions.")
+metrics.describe("sage_agent_construction_seconds_total", "Time spent in per-request supervisor construction.")
+
+def get_agent_pool() -> AgentPool:
+    return _agent_pool
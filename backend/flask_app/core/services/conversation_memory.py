@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional
+from langchain_core.memory import BaseMemory
+from flask_app.core.utils.logger import log
+# task_scope is re-exported: callers enter it from here to scope agent memory.
+from flask_app.core.utils.task_context import current_task_id, task_scope
+from flask_app.core.utils.tokenizer import count_tokens
+
+MEMORY_STRATEGIES = ("summarize", "window")
+
+def _summarize_with_gemini(previous_summary: str, transcript: str) -> str:
+    from flask_app.tools.gemini_connector import generate_response
+    prompt = (
+        "Condense the conversation below into a short summary that keeps facts, decisions and open "
+        "questions needed to continue it.\n\n"
+    )
+    if previous_summary:
+        prompt += f"Summary so far:\n{previous_summary}\n\n"
+    prompt += f"New conversation:\n{transcript}"
+    return generate_response(prompt).strip()
+
+class TaskConversationMemory:
+    """
+    Conversation history per task_id under a token budget.
+
+    Once a task's history exceeds the budget its oldest turns are rolled into a
+    running summary (or simply dropped in "window" mode) until it is back under
+    half the budget, so summarization happens in occasional batches rather than
+    on every turn. Idle tasks are evicted least-recently-used first, by count
+    and by age.
+    """
+
+    def __init__(self, token_budget: int = 2000, max_tasks: int = 256, idle_ttl: Optional[float] = 3600,
+                 strategy: str = "summarize", summarizer: Optional[Callable[[str, str], str]] = None):
+        """
+        Args:
+            token_budget (int): Max approximate tokens of summary + turns kept per task.
+            max_tasks (int): Task memories kept before the least recently used is evicted.
+            idle_ttl (float, optional): Seconds after which an unused task memory is evicted.
+            strategy (str): "summarize" rolls old turns into a summary; "window" drops them.
+            summarizer (callable, optional): (previous_summary, transcript) -> summary;
+                defaults to a Gemini call.
+        """
+        if strategy not in MEMORY_STRATEGIES:
+            raise ValueError(f"Unknown memory strategy: {strategy}")
+        self.token_budget = token_budget
+        self.max_tasks = max_tasks
+        self.idle_ttl = idle_ttl
+        self.strategy = strategy
+        self.summarizer = summarizer or _summarize_with_gemini
+        self._tasks: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"evictions": 0, "summaries": 0, "dropped_turns": 0}
+
+    def _entry(self, task_id: Any, create: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._evict_idle()
+            entry = self._tasks.get(task_id)
+            if entry is None and create:
+                entry = {"summary": "", "summary_tokens": 0, "turns": deque(), "tokens": 0,
+                         "last_used": time.time(), "lock": threading.Lock(), "summarizing": False}
+                self._tasks[task_id] = entry
+                while len(self._tasks) > self.max_tasks:
+                    evicted, _ = self._tasks.popitem(last=False)
+                    self.stats["evictions"] += 1
+                    log(f"Evicted conversation memory of idle task {evicted}")
+            if entry is not None:
+                entry["last_used"] = time.time()
+                self._tasks.move_to_end(task_id)
+            return entry
+
+    def _evict_idle(self):
+        """Drop memories idle longer than idle_ttl. Caller holds the lock."""
+        if self.idle_ttl is None:
+            return
+        cutoff = time.time() - self.idle_ttl
+        # Entries are in recency order, so the idle ones are at the front.
+        while self._tasks:
+            task_id, entry = next(iter(self._tasks.items()))
+            if entry["last_used"] >= cutoff:
+                break
+            del self._tasks[task_id]
+            self.stats["evictions"] += 1
+
+    def add_turn(self, task_id: Any, user_input: str, output: str):
+        entry = self._entry(task_id, create=True)
+        turn = f"Human: {user_input}\nAI: {output}"
+        tokens = count_tokens(turn)
+        with entry["lock"]:
+            entry["turns"].append((turn, tokens))
+            entry["tokens"] += tokens
+            over_budget = entry["tokens"] + entry["summary_tokens"] > self.token_budget
+        if over_budget:
+            self._shrink(task_id, entry)
+
+    def _shrink(self, task_id: Any, entry: Dict[str, Any]):
+        """
+        Roll the oldest turns out until the task is under half its budget.
+
+        The turns to roll out are picked under entry["lock"] but summarized
+        outside it, so the task's readers and writers never wait on the model
+        call; those turns stay in the context until the summary replaces them.
+        One summary runs per task at a time.
+        """
+        target = self.token_budget // 2
+        with entry["lock"]:
+            if entry["summarizing"]:
+                return
+            dropped: List[str] = []
+            dropped_tokens = 0
+            # The newest turn is always kept, even if it alone exceeds the target.
+            for turn, tokens in list(entry["turns"])[:-1]:
+                if entry["tokens"] - dropped_tokens + entry["summary_tokens"] <= target:
+                    break
+                dropped.append(turn)
+                dropped_tokens += tokens
+            if not dropped:
+                return
+            if self.strategy == "window":
+                self._drop_oldest(entry, len(dropped), dropped_tokens)
+                return
+            entry["summarizing"] = True
+            previous_summary = entry["summary"]
+
+        summary = None
+        try:
+            summary = self.summarizer(previous_summary, "\n".join(dropped))
+            # Keep the summary itself within its share of the budget.
+            summary_tokens = count_tokens(summary)
+            if summary_tokens > target:
+                summary = summary[:len(summary) * target // summary_tokens]
+                summary_tokens = count_tokens(summary)
+        except Exception as e:
+            log(f"Conversation summary failed for task {task_id}, dropping old turns: {e}", level="ERROR")
+        finally:
+            with entry["lock"]:
+                # Turns are only removed here, so the summarized ones are still the oldest.
+                self._drop_oldest(entry, len(dropped), dropped_tokens)
+                if summary is not None:
+                    entry["summary"], entry["summary_tokens"] = summary, summary_tokens
+                    self.stats["summaries"] += 1
+                entry["summarizing"] = False
+
+    def _drop_oldest(self, entry: Dict[str, Any], count: int, tokens: int):
+        """Remove the oldest `count` turns. Caller holds entry["lock"]."""
+        for _ in range(count):
+            entry["turns"].popleft()
+        entry["tokens"] -= tokens
+        self.stats["dropped_turns"] += count
+
+    def get_context(self, task_id: Any) -> str:
+        entry = self._entry(task_id)
+        if entry is None:
+            return ""
+        with entry["lock"]:
+            parts = [f"Summary of earlier conversation: {entry['summary']}"] if entry["summary"] else []
+            parts.extend(turn for turn, _ in entry["turns"])
+        return "\n".join(parts)
+
+    def clear(self, task_id: Any):
+        with self._lock:
+            self._tasks.pop(task_id, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            per_task = {
+                str(task_id): {
+                    "tokens": entry["tokens"] + entry["summary_tokens"],
+                    "turns": len(entry["turns"]),
+                    "summary_tokens": entry["summary_tokens"],
+                    "idle_seconds": round(now - entry["last_used"], 1)
+                }
+                for task_id, entry in self._tasks.items()
+            }
+            stats = dict(self.stats)
+        return {
+            "tasks": len(per_task),
+            "total_tokens": sum(task["tokens"] for task in per_task.values()),
+            "token_budget": self.token_budget,
+            **stats,
+            "per_task": per_task
+        }
+
+class TaskScopedMemory(BaseMemory):
+    """
+    LangChain memory that reads and writes the conversation of the task in
+    `current_task_id`, so one agent executor can serve many tasks without
+    their histories mixing. Outside a task scope it is empty and saves nothing.
+    """
+
+    store: Any
+    memory_key: str = "chat_history"
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        task_id = current_task_id.get()
+        return {self.memory_key: self.store.get_context(task_id) if task_id is not None else ""}
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        task_id = current_task_id.get()
+        if task_id is None:
+            return
+        user_input = " ".join(str(value) for key, value in inputs.items() if key != self.memory_key)
+        self.store.add_turn(task_id, user_input, " ".join(str(value) for value in outputs.values()))
+
+    def clear(self) -> None:
+        task_id = current_task_id.get()
+        if task_id is not None:
+            self.store.clear(task_id)
+
+# Global instance shared by every AgentService
+_conversation_memory = TaskConversationMemory(
+    token_budget=int(os.getenv("AGENT_MEMORY_TOKENS", "2000")),
+    max_tasks=int(os.getenv("AGENT_MEMORY_TASKS", "256")),
+    idle_ttl=float(os.getenv("AGENT_MEMORY_IDLE_SECONDS", "3600")),
+    strategy=os.getenv("AGENT_MEMORY_STRATEGY", "summarize")
+)
+
+def get_conversation_memory() -> TaskConversationMemory:
+    return _conversation_memory
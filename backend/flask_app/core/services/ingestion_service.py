@@ -0,0 +1,145 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from flask_app.core.services.rag_service import RAGService, get_rag_service
+from flask_app.core.utils.logger import log
+
+JOB_STATES = ("queued", "parsing", "indexing", "ready", "failed")
+FINISHED_JOB_HISTORY = 1000
+
+class IngestionQueue:
+    """
+    Bounded queue of document ingestion jobs drained by a fixed pool of
+    worker threads, so uploads return immediately and clients poll status.
+
+    `submit` never blocks: when `max_pending` jobs are already waiting it
+    returns None and the caller should ask the client to retry later.
+    """
+
+    def __init__(self, rag_service: Optional[RAGService] = None, workers: int = 2, max_pending: int = 16,
+                 on_transition: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            rag_service: Service that ingests documents; defaults to the shared one.
+            workers (int): Number of documents ingested concurrently.
+            max_pending (int): Queue capacity before uploads are rejected.
+            on_transition (callable, optional): Called with a job snapshot on every
+                state change (e.g. to persist it); must be thread-safe.
+        """
+        self.rag_service = rag_service or get_rag_service()
+        self.workers = workers
+        self.on_transition = on_transition
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_pending)
+        self._jobs: "OrderedDict[Any, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._started = False
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"ingest-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._started = True
+            log(f"IngestionQueue started with {self.workers} workers")
+
+    def is_full(self) -> bool:
+        return self._queue.full()
+
+    def submit(self, job_id: Any, file_path: str, doc_id: str,
+               metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Enqueue a document; returns the job snapshot, or None if the queue is full."""
+        self._start()
+        job = {
+            "job_id": job_id,
+            "doc_id": doc_id,
+            "file_path": file_path,
+            "metadata": metadata or {},
+            "status": "queued",
+            "pages": 0,
+            "total_pages": None,
+            "chunks": 0,
+            "error": None,
+            "timings": {"queued_at": time.time()}
+        }
+        # Registered under the lock so a worker can never pick up an unknown job.
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                log(f"Ingestion queue full, rejecting job {job_id}", level="WARNING")
+                return None
+            self._jobs[job_id] = job
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = {k: v for k, v in job.items() if k not in ("file_path", "metadata")}
+            snapshot["timings"] = dict(job["timings"])
+            snapshot["queue_depth"] = self._queue.qsize()
+            return snapshot
+
+    def _transition(self, job: Dict[str, Any], status: str, **fields):
+        with self._lock:
+            job.update(fields)
+            job["status"] = status
+            job["timings"][f"{status}_at"] = time.time()
+            if status in ("ready", "failed"):
+                self._prune_finished()
+        if self.on_transition:
+            try:
+                self.on_transition(self.get_job(job["job_id"]))
+            except Exception as e:
+                log(f"Ingestion status hook failed for job {job['job_id']}: {e}", level="ERROR")
+
+    def _prune_finished(self):
+        """Forget the oldest finished jobs beyond the history limit. Caller holds the lock."""
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("ready", "failed")]
+        for job_id in finished[:max(0, len(finished) - FINISHED_JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            except Exception as e:
+                # Keep the worker alive; the job is reported as failed.
+                log(f"Ingestion job {job['job_id']} crashed: {e}", level="ERROR")
+                self._transition(job, "failed", error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: Dict[str, Any]):
+        self._transition(job, "parsing")
+
+        def _progress(status: Dict[str, Any]):
+            with self._lock:
+                for key in ("pages", "total_pages", "chunks", "reused_chunks", "deduplicated"):
+                    if key in status:
+                        job[key] = status[key]
+            # All pages are read once the last one is reported; the rest is indexing.
+            if job["status"] == "parsing" and status.get("total_pages") is not None \
+                    and status.get("pages", 0) >= status["total_pages"]:
+                self._transition(job, "indexing")
+
+        doc_id = self.rag_service.process_document(
+            job["file_path"], job["doc_id"], metadata=job["metadata"], progress_callback=_progress
+        )
+        if doc_id is None:
+            error = (self.rag_service.get_status(job["doc_id"]) or {}).get("error") or "Ingestion failed"
+            self._transition(job, "failed", error=error)
+        else:
+            # A content-hash match returns the already indexed document's ID, not job["doc_id"].
+            self._transition(job, "ready", doc_id=doc_id)
+        timings = job["timings"]
+        log(f"Ingestion job {job['job_id']} {job['status']} in "
+            f"{timings[job['status'] + '_at'] - timings['queued_at']:.2f}s")
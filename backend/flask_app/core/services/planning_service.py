@@ -1,33 +1,200 @@
 # flask_app/core/services/planning_service.py
 
 import datetime
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from flask import has_app_context
+from sqlalchemy import update
+from db.models import db, Plan, Checkpoint
 from flask_app.core.utils.logger import log_info, log_error
 
+CACHE_SIZE = int(os.getenv("PLANNING_CACHE_SIZE", "512"))
+# Seconds a cached task is trusted before it is re-read (other workers may have changed it).
+CACHE_TTL = float(os.getenv("PLANNING_CACHE_TTL", "30"))
+DEFAULT_TIMELINE_DAYS = 7
+
 class PlanningService:
-    def __init__(self):
-        # Store tasks as dict: {task_id: {goal, timeline, checkpoints, status}}
-        self.tasks = {}
+    """
+    Task plans and checkpoints persisted in the Plan and Checkpoint tables, so
+    they survive restarts and are shared by every worker.
+
+    Reads go through an LRU cache of task dicts (checkpoints keyed by id);
+    writes go to the database first and then patch the cached entry. Each plan
+    row carries completed/total checkpoint counters that are adjusted by the
+    rows a checkpoint update actually changed, so progress checks never
+    recount. Without a bound Flask app (e.g. in scripts) tasks are kept in the
+    cache only.
+    """
+
+    def __init__(self, app=None, cache_size=CACHE_SIZE, cache_ttl=CACHE_TTL):
+        """
+        Args:
+            app (Flask, optional): App whose database holds the plans; see init_app.
+            cache_size (int): Tasks kept in the read-through cache.
+            cache_ttl (float): Seconds before a cached task is re-read from the database.
+        """
+        self.app = app
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.tasks = OrderedDict()  # task_id -> (loaded_at, task dict)
+        self._lock = threading.RLock()
+
+    def init_app(self, app):
+        """Bind the app so calls from threads without an app context (task graph steps) can use the database."""
+        self.app = app
+
+    @property
+    def persistent(self):
+        return self.app is not None or has_app_context()
+
+    @contextmanager
+    def _session(self):
+        """Yield the db session inside an app context, committing on success."""
+        with (nullcontext() if has_app_context() else self.app.app_context()):
+            try:
+                yield db.session
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _cache_put(self, task_id, task):
+        with self._lock:
+            self.tasks[task_id] = (time.time(), task)
+            self.tasks.move_to_end(task_id)
+            while len(self.tasks) > self.cache_size:
+                self.tasks.popitem(last=False)
+
+    def _load(self, task_id):
+        """Cached task dict, (re)read from the database when missing or stale; None if unknown."""
+        with self._lock:
+            cached = self.tasks.get(task_id)
+            if cached is not None and (not self.persistent or time.time() - cached[0] < self.cache_ttl):
+                self.tasks.move_to_end(task_id)
+                return cached[1]
+        if not self.persistent:
+            return None
+
+        with self._session() as session:
+            plan = session.get(Plan, task_id)
+            if plan is None:
+                with self._lock:
+                    self.tasks.pop(task_id, None)
+                return None
+            rows = session.execute(
+                db.select(Checkpoint).where(Checkpoint.task_id == task_id).order_by(Checkpoint.position)
+            ).scalars()
+            task = {
+                "goal": plan.goal,
+                "deadline": plan.deadline,
+                "checkpoints": OrderedDict(
+                    (row.checkpoint_id, {"id": row.checkpoint_id, "description": row.description,
+                                         "completed": row.completed})
+                    for row in rows
+                ),
+                "status": plan.status,
+                "created_at": plan.created_at,
+                "updated_at": plan.updated_at,
+                "completed": plan.completed_checkpoints
+            }
+        self._cache_put(task_id, task)
+        return task
 
     def create_task(self, task_id, goal, timeline_days, checkpoints):
         """
         Initialize a new task with goal, timeline in days, and checkpoints list.
 
+        Re-creating an existing task (e.g. when its query is run again) keeps it
+        as it is if the goal and checkpoints are unchanged. Otherwise the plan
+        is replaced, but checkpoints whose id and description are unchanged
+        keep their completion status.
+
         Args:
             task_id (str): Unique identifier for the task.
             goal (str): High-level goal description.
             timeline_days (int): Deadline in days from now.
             checkpoints (list of dict): Each checkpoint {id, description, completed=False}.
+
+        Returns:
+            dict: The created task.
         """
-        deadline = datetime.datetime.now() + datetime.timedelta(days=timeline_days)
-        self.tasks[task_id] = {
+        existing = self._load(task_id)
+        previous = existing["checkpoints"] if existing is not None else {}
+        if existing is not None and existing["goal"] == goal and \
+                [(str(cp["id"]), cp.get("description")) for cp in checkpoints] == \
+                [(cp_id, cp.get("description")) for cp_id, cp in previous.items()]:
+            log_info(f"Task {task_id} already planned with these checkpoints, keeping its progress")
+            return existing
+
+        def _completed(cp):
+            kept = previous.get(str(cp["id"]))
+            if kept is not None and kept.get("description") == cp.get("description"):
+                return kept["completed"] or bool(cp.get("completed", False))
+            return bool(cp.get("completed", False))
+
+        now = datetime.datetime.now()
+        deadline = now + datetime.timedelta(days=timeline_days)
+        task = {
             "goal": goal,
             "deadline": deadline,
-            "checkpoints": checkpoints,
+            "checkpoints": OrderedDict(
+                (str(cp["id"]), {**cp, "id": str(cp["id"]), "completed": _completed(cp)})
+                for cp in checkpoints
+            ),
             "status": "in-progress",
-            "created_at": datetime.datetime.now(),
-            "updated_at": datetime.datetime.now()
+            "created_at": existing["created_at"] if existing is not None else now,
+            "updated_at": now
         }
+        task["completed"] = sum(1 for cp in task["checkpoints"].values() if cp["completed"])
+
+        if self.persistent:
+            with self._session() as session:
+                session.execute(db.delete(Checkpoint).where(Checkpoint.task_id == task_id))
+                session.execute(db.delete(Plan).where(Plan.task_id == task_id))
+                session.add(Plan(
+                    task_id=task_id, goal=goal, status=task["status"], deadline=deadline,
+                    created_at=task["created_at"], updated_at=now,
+                    total_checkpoints=len(task["checkpoints"]), completed_checkpoints=task["completed"]
+                ))
+                session.add_all(
+                    Checkpoint(task_id=task_id, checkpoint_id=cp["id"], description=cp.get("description"),
+                               position=position, completed=cp["completed"])
+                    for position, cp in enumerate(task["checkpoints"].values())
+                )
+        self._cache_put(task_id, task)
         log_info(f"Task {task_id} created with deadline {deadline} and checkpoints {checkpoints}")
+        return task
+
+    def create_plan(self, query, goals, task_id=None, timeline_days=DEFAULT_TIMELINE_DAYS):
+        """
+        Create a task for a query with one checkpoint per goal.
+
+        Args:
+            query (str): The task's query, used as its goal.
+            goals (list of str): Goals to track as checkpoints.
+            task_id (str, optional): Task identifier; a new one is generated if omitted.
+            timeline_days (int): Deadline in days from now.
+
+        Returns:
+            dict: {task_id, goal, deadline, status, checkpoints}
+        """
+        task_id = str(task_id) if task_id is not None else uuid.uuid4().hex
+        checkpoints = [
+            {"id": f"goal-{index}", "description": goal, "completed": False}
+            for index, goal in enumerate(goals, start=1)
+        ]
+        task = self.create_task(task_id, query, timeline_days, checkpoints)
+        return {
+            "task_id": task_id,
+            "goal": query,
+            "deadline": task["deadline"].isoformat(),
+            "status": task["status"],
+            "checkpoints": [dict(cp) for cp in task["checkpoints"].values()]
+        }
 
     def update_checkpoint(self, task_id, checkpoint_id, completed=True):
         """
@@ -38,16 +205,75 @@ class PlanningService:
             checkpoint_id (str)
             completed (bool): Mark checkpoint done or not.
         """
-        try:
-            checkpoints = self.tasks[task_id]["checkpoints"]
-            for cp in checkpoints:
-                if cp["id"] == checkpoint_id:
-                    cp["completed"] = completed
-                    self.tasks[task_id]["updated_at"] = datetime.datetime.now()
-                    log_info(f"Checkpoint {checkpoint_id} for task {task_id} marked {'completed' if completed else 'incomplete'}.")
-                    break
-        except KeyError:
-            log_error(f"Task or checkpoint not found for {task_id}, {checkpoint_id}")
+        if self.update_checkpoints(task_id, {checkpoint_id: completed}) is None:
+            return
+        log_info(f"Checkpoint {checkpoint_id} for task {task_id} marked {'completed' if completed else 'incomplete'}.")
+
+    def update_checkpoints(self, task_id, updates):
+        """
+        Set the completion status of several checkpoints of a task in one transaction.
+
+        Args:
+            task_id (str)
+            updates (dict): {checkpoint_id: completed (bool)}.
+
+        Returns:
+            int: Number of checkpoints whose status changed, or None if the task
+                or a checkpoint was not found.
+        """
+        task = self._load(task_id)
+        updates = {str(cp_id): bool(done) for cp_id, done in updates.items()}
+        if task is None or any(cp_id not in task["checkpoints"] for cp_id in updates):
+            log_error(f"Task or checkpoint not found for {task_id}, {list(updates)}")
+            return None
+
+        now = datetime.datetime.now()
+        delta = changed = 0
+        completed_total = None
+        if self.persistent:
+            # Only rows whose status really flips are updated, so the counter delta
+            # stays right even when another worker changed some of them already.
+            with self._session() as session:
+                for completed in (True, False):
+                    ids = [cp_id for cp_id, done in updates.items() if done == completed]
+                    if not ids:
+                        continue
+                    rowcount = session.execute(
+                        update(Checkpoint)
+                        .where(Checkpoint.task_id == task_id, Checkpoint.checkpoint_id.in_(ids),
+                               Checkpoint.completed != completed)
+                        .values(completed=completed)
+                    ).rowcount
+                    changed += rowcount
+                    delta += rowcount if completed else -rowcount
+                session.execute(
+                    update(Plan).where(Plan.task_id == task_id)
+                    .values(completed_checkpoints=Plan.completed_checkpoints + delta, updated_at=now)
+                )
+                # Re-read the counter: the cached one may predate other workers' updates.
+                completed_total = session.execute(
+                    db.select(Plan.completed_checkpoints).where(Plan.task_id == task_id)
+                ).scalar()
+        else:
+            for cp_id, completed in updates.items():
+                if task["checkpoints"][cp_id]["completed"] != completed:
+                    changed += 1
+                    delta += 1 if completed else -1
+
+        with self._lock:
+            for cp_id, completed in updates.items():
+                task["checkpoints"][cp_id]["completed"] = completed
+            task["completed"] = completed_total if completed_total is not None else task["completed"] + delta
+            task["updated_at"] = now
+        return changed
+
+    def set_all_checkpoints(self, task_id, completed=True):
+        """Mark every checkpoint of a task completed (or incomplete); returns the number changed."""
+        task = self._load(task_id)
+        if task is None:
+            log_error(f"Task {task_id} not found for bulk checkpoint update")
+            return None
+        return self.update_checkpoints(task_id, {cp_id: completed for cp_id in task["checkpoints"]})
 
     def check_progress(self, task_id):
         """
@@ -56,15 +282,14 @@ class PlanningService:
         Returns:
             dict: {completed: int, total: int, percentage: float}
         """
-        try:
-            checkpoints = self.tasks[task_id]["checkpoints"]
-            completed = sum(1 for cp in checkpoints if cp.get("completed"))
-            total = len(checkpoints)
-            percentage = (completed / total * 100) if total > 0 else 0.0
-            return {"completed": completed, "total": total, "percentage": percentage}
-        except KeyError:
+        task = self._load(task_id)
+        if task is None:
             log_error(f"Task {task_id} not found for progress check")
             return {"completed": 0, "total": 0, "percentage": 0.0}
+        completed = task["completed"]
+        total = len(task["checkpoints"])
+        percentage = (completed / total * 100) if total > 0 else 0.0
+        return {"completed": completed, "total": total, "percentage": percentage}
 
     def is_task_complete(self, task_id, threshold=90):
         """
@@ -77,17 +302,41 @@ class PlanningService:
             bool
         """
         progress = self.check_progress(task_id)
-        if progress["percentage"] >= threshold:
-            self.tasks[task_id]["status"] = "completed"
-            log_info(f"Task {task_id} marked completed.")
+        if progress["total"] and progress["percentage"] >= threshold:
+            task = self._load(task_id)
+            if task["status"] != "completed":
+                if self.persistent:
+                    with self._session() as session:
+                        session.execute(update(Plan).where(Plan.task_id == task_id).values(status="completed"))
+                task["status"] = "completed"
+                log_info(f"Task {task_id} marked completed.")
             return True
         return False
 
     def get_task(self, task_id):
-        return self.tasks.get(task_id)
+        task = self._load(task_id)
+        if task is None:
+            return None
+        with self._lock:
+            return {
+                **{key: value for key, value in task.items() if key != "completed"},
+                "checkpoints": [dict(cp) for cp in task["checkpoints"].values()]
+            }
 
     def remove_task(self, task_id):
-        if task_id in self.tasks:
-            del self.tasks[task_id]
+        if self.persistent:
+            with self._session() as session:
+                session.execute(db.delete(Checkpoint).where(Checkpoint.task_id == task_id))
+                removed = session.execute(db.delete(Plan).where(Plan.task_id == task_id)).rowcount
+        else:
+            removed = task_id in self.tasks
+        with self._lock:
+            self.tasks.pop(task_id, None)
+        if removed:
             log_info(f"Task {task_id} removed.")
 
+# Global instance shared by every SupervisorAgent; bound to the app in create_app.
+_planning_service = PlanningService()
+
+def get_planning_service() -> PlanningService:
+    return _planning_service
@@ -1,82 +1,539 @@
+import hashlib
+import heapq
 import os
+import threading
+import time
 import uuid
-from typing import List, Dict, Optional
-from flask_app.core.utils.file_parser import parse_file
-from flask_app.core.utils.text_splitter import split_text
+from collections import Counter
+from typing import Any, Callable, List, Dict, Optional, Union
+import numpy as np
+from flask_app.core.utils.file_parser import file_sha256, iter_file_pages
+from flask_app.core.utils.text_splitter import split_spans
+from flask_app.core.utils.bm25_index import BM25Index, CorpusIndex, tokenize
+from flask_app.core.utils.embeddings import Embedder, HashingEmbedder
+from flask_app.core.utils.vector_store import VectorStore
+from flask_app.core.utils.document_store import DocumentStore
 from flask_app.core.utils.logger import log
+from flask_app.core.utils.paths import data_path
+from flask_app.core.utils.prompt_builder import PromptBuilder
+from flask_app.core.utils.telemetry import span, traced
 from flask_app.tools.gemini_connector import generate_gemini_response
 
+RAG_STORE_PATH = os.getenv("RAG_STORE_PATH") or data_path("rag")
+SEARCH_MODES = ("lexical", "vector", "hybrid")
+RRF_K = 60  # Reciprocal rank fusion damping constant
+INGEST_BATCH_CHUNKS = 64
+CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "500"))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "50"))
+CHUNK_UNIT = os.getenv("RAG_CHUNK_UNIT", "chars")  # "chars" or "tokens"
+
+def chunk_hash(text: str) -> int:
+    """64-bit content hash of a chunk, used to skip re-embedding unchanged chunks."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
 class RAGService:
-    def __init__(self):
-        self.vector_store: Dict[str, Dict] = {}
-        
-    def process_document(self, file_path: str, doc_id: Optional[str] = None) -> Optional[str]:
+    def __init__(self, embedder: Optional[Embedder] = None, store_path: Optional[str] = RAG_STORE_PATH):
+        """
+        Args:
+            embedder: Chunk/query embedder; defaults to a local HashingEmbedder.
+            store_path: Directory of the persistent DocumentStore. Documents
+                ingested by earlier runs or other workers are opened from it
+                instead of being re-parsed. None keeps everything in memory.
+        """
+        self.embedder = embedder or HashingEmbedder()
+        self.documents: Dict[str, Dict] = {}
+        self.ingest_status: Dict[str, Dict[str, Any]] = {}
+        # file hash -> event set when its ingestion finishes; identical uploads wait on it.
+        self._inflight: Dict[str, threading.Event] = {}
+        self._inflight_lock = threading.Lock()
+        # Corpus-wide BM25 index for search(); per-document indexes serve retrieve_relevant_chunks.
+        self.corpus = CorpusIndex()
+        self._corpus_records: Dict[str, Dict] = {}  # doc_id -> store record indexed in the corpus
+        self._corpus_lock = threading.Lock()
+        if store_path:
+            self.store = DocumentStore(store_path, self.embedder.dim)
+            self.vector_store = self.store.vectors
+        else:
+            self.store = None
+            self.vector_store = VectorStore(self.embedder.dim)
+
+    def _get_document(self, doc_id: str) -> Optional[Dict]:
+        """
+        Return the document entry, mirroring the DocumentStore record when
+        persistent. Entries are rebuilt whenever the record changed (e.g. the
+        document was re-ingested by another worker); BM25 indexes load lazily.
+        """
+        entry = self.documents.get(doc_id)
+        if not self.store or (entry is not None and entry["record"] is None):
+            # In-memory documents, and documents still ingesting into the store.
+            return entry
+
+        if doc_id not in self.store.records:
+            # Another worker may have ingested it since we last looked.
+            self.store.refresh()
+        record = self.store.records.get(doc_id)
+        if record is None:
+            self.documents.pop(doc_id, None)
+            return None
+
+        if entry is None or entry["record"] is not record:
+            entry = self.documents[doc_id] = {
+                "path": record["path"],
+                "metadata": record.get("metadata", {}),
+                "chunks": self.store.chunk_view(record),
+                "index": None,
+                "record": record
+            }
+        return entry
+
+    def process_document(self, file_path: str, doc_id: Optional[str] = None,
+                         metadata: Optional[Dict[str, Any]] = None,
+                         progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                         workers: Optional[int] = None) -> Optional[str]:
         """
-        Parse and chunk the uploaded file, storing in memory under doc_id.
-        Returns document ID if successful, None otherwise.
+        Stream the uploaded file page by page, chunking and indexing each
+        batch as it arrives, and store it under doc_id together with its BM25
+        inverted index and chunk embeddings (persisted to the DocumentStore
+        when one is configured). `metadata` (e.g. user_id) is kept with the
+        document and can be matched by `search(filters=...)`.
+
+        Chunks of a new document are searchable while the rest of it is
+        still ingesting; a re-ingested document keeps serving its previous
+        version until the new one commits, and keeps it if ingestion fails.
+        `get_status(doc_id)` and `progress_callback` report how far
+        ingestion has got.
+
+        A file whose bytes match an already indexed document is not parsed
+        again; that document's ID is returned unless doc_id names another
+        existing document to replace. Identical files arriving concurrently
+        are ingested once: later callers wait for the first and get its ID.
+        Re-ingesting an edited file under an existing doc_id only embeds
+        chunks whose hash changed, and keeps the stored metadata unless
+        `metadata` overrides it. Returns document ID if successful, None otherwise.
         """
+        started_at = time.time()
+        try:
+            file_hash = file_sha256(file_path)
+        except OSError as e:
+            log(f"Error processing document: {e}", level="ERROR")
+            return None
+
+        done = None
+        while True:
+            with self._inflight_lock:
+                ingesting = self._inflight.get(file_hash)
+                if ingesting is None:
+                    existing = self.find_document_by_hash(file_hash)
+                    if not existing or (doc_id not in (None, existing) and self._get_document(doc_id) is not None):
+                        # Nothing to reuse, or an explicit replacement of another document.
+                        done = self._inflight[file_hash] = threading.Event()
+                    break
+            ingesting.wait()
+
+        if done is not None:
+            try:
+                return self._ingest(file_path, file_hash, doc_id, metadata, progress_callback, workers, started_at)
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(file_hash, None)
+                done.set()
+
+        log(f"Document {file_path} already indexed as {existing}, skipping ingestion")
+        status = self.ingest_status[existing] = {
+            "doc_id": existing,
+            "status": "ready",
+            "deduplicated": True,
+            "started_at": started_at,
+            "finished_at": time.time(),
+            "error": None
+        }
+        if progress_callback:
+            progress_callback(dict(status))
+        return existing
+
+    def _ingest(self, file_path: str, file_hash: str, doc_id: Optional[str],
+                metadata: Optional[Dict[str, Any]],
+                progress_callback: Optional[Callable[[Dict[str, Any]], None]],
+                workers: Optional[int], started_at: float) -> Optional[str]:
+        """Parse, chunk, embed and index one file for process_document."""
         doc_id = doc_id or str(uuid.uuid4())
+        status = self.ingest_status[doc_id] = {
+            "doc_id": doc_id,
+            "status": "ingesting",
+            "pages": 0,
+            "total_pages": None,
+            "chunks": 0,
+            "reused_chunks": 0,
+            "started_at": started_at,
+            "finished_at": None,
+            "error": None
+        }
+        previous = self._get_document(doc_id)
+        # A re-ingest is built off to the side and swapped in on commit, so the indexed
+        # version keeps answering searches meanwhile and survives a failed ingestion.
+        replacing = previous is not None
+        reusable = self._previous_chunk_rows(doc_id)
+        # Metadata passed for a re-ingest updates the stored metadata instead of replacing it.
+        metadata = {**(previous["metadata"] if previous else {}), **(metadata or {})}
+        index = BM25Index()
+        rows: List[int] = []
+        chunk_hashes: List[int] = []
+        entry = {
+            "path": file_path,
+            "metadata": metadata,
+            "chunks": self.store.chunk_view(rows) if self.store else [],
+            "index": index,
+            "record": None,
+            "file_hash": file_hash,
+            "chunk_hashes": chunk_hashes
+        }
+        if not replacing:
+            # A new document is searchable batch by batch while it ingests.
+            self.documents[doc_id] = entry
+
+        def _index_batch(batch: List[str]):
+            hashes = [chunk_hash(chunk) for chunk in batch]
+            # Each previous row is reused at most once, so repeated chunks get their own rows.
+            previous = [reusable.pop(h, None) for h in hashes]
+            fresh = [i for i, row in enumerate(previous) if row is None]
+            fresh_vectors = self.embedder.embed([batch[i] for i in fresh]) if fresh else None
+
+            # Text, then vectors, then postings: every hit can resolve its chunk.
+            if self.store:
+                # Unchanged chunks keep their stored text/vector rows; only new ones are appended.
+                new_rows = iter(self.store.append_chunks([batch[i] for i in fresh], fresh_vectors) if fresh else ())
+                batch_rows = [row if row is not None else next(new_rows) for row in previous]
+            else:
+                vectors = np.empty((len(batch), self.embedder.dim), dtype=np.float32)
+                if fresh:
+                    vectors[fresh] = fresh_vectors
+                reused = [i for i, row in enumerate(previous) if row is not None]
+                if reused:
+                    vectors[reused] = self.vector_store.vectors([previous[i] for i in reused])
+                entry["chunks"].extend(batch)
+                batch_rows = self.vector_store.append(vectors).tolist()
+            rows.extend(batch_rows)
+            if not replacing:
+                self.vector_store.register(doc_id, batch_rows)
+            # idf and the average chunk length span the whole document, so postings are
+            # laid out again for every chunk; only embedding is skipped for unchanged ones.
+            for chunk in batch:
+                terms = tokenize(chunk)
+                term_counts = Counter(terms)
+                chunk_id = index.add_counts(term_counts, len(terms))
+                if not replacing:
+                    self.corpus.add_chunk(doc_id, chunk_id, term_counts, len(terms))
+            chunk_hashes.extend(hashes)
+            status["chunks"] += len(batch)
+            status["reused_chunks"] += len(batch) - len(fresh)
+
         try:
-            text = parse_file(file_path)
-            chunks = split_text(text, max_chunk_size=500)
+            pending: List[str] = []
+            carry = ""
+            for page in iter_file_pages(file_path, workers):
+                status["total_pages"] = page.total
+                if page.text.strip():
+                    buffer = f"{carry} {page.text}" if carry else page.text
+                    # Content-anchored boundaries: an edit re-chunks only its neighbourhood,
+                    # so the other chunks of a re-ingested document keep their hashes.
+                    spans = split_spans(buffer, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_UNIT, anchored=True)
+                    # The last span may be a sentence cut by the page break; carry it over.
+                    # It is at most one chunk long, so the buffer never grows past a page.
+                    pending.extend(span.text(buffer) for span in spans[:-1])
+                    carry = spans[-1].text(buffer) if spans else ""
+                if len(pending) >= INGEST_BATCH_CHUNKS:
+                    _index_batch(pending)
+                    pending = []
+                status["pages"] += 1
+                if progress_callback:
+                    progress_callback(dict(status))
 
-            self.vector_store[doc_id] = {
-                "path": file_path,
-                "chunks": chunks
-            }
+            if carry.strip():
+                pending.append(carry)
+            if pending:
+                _index_batch(pending)
+
+            if self.store:
+                # Publishing the record also swaps the document's vector rows.
+                record = self.store.commit_document(doc_id, file_path, rows, index, metadata,
+                                                    file_hash=file_hash, chunk_hashes=chunk_hashes)
+                entry["chunks"] = self.store.chunk_view(record)
+                entry["record"] = record
+            elif replacing:
+                self.vector_store.replace(doc_id, rows)
+            if replacing:
+                self.corpus.add_document(doc_id, index)
+            if self.store:
+                with self._corpus_lock:
+                    self._corpus_records[doc_id] = entry["record"]
+            self.documents[doc_id] = entry
+            status.update(status="ready", finished_at=time.time())
+            if progress_callback:
+                progress_callback(dict(status))
             log(f"Document processed and stored: {doc_id}")
             return doc_id
         except Exception as e:
+            if not replacing:
+                self.documents.pop(doc_id, None)
+                self.vector_store.remove(doc_id)
+                self.corpus.remove(doc_id)
+            # A failed re-ingest never touched the indexed version, which stays searchable.
+            status.update(status="failed", finished_at=time.time(), error=str(e))
+            if progress_callback:
+                progress_callback(dict(status))
             log(f"Error processing document: {e}", level="ERROR")
             return None
 
-    def retrieve_relevant_chunks(self, doc_id: str, query: str, top_k: int = 5) -> List[str]:
+    def find_document_by_hash(self, file_hash: str) -> Optional[str]:
+        if self.store:
+            return self.store.find_by_file_hash(file_hash)
+        for doc_id, entry in self.documents.items():
+            if entry.get("file_hash") == file_hash and self.ingest_status.get(doc_id, {}).get("status") == "ready":
+                return doc_id
+        return None
+
+    def _previous_chunk_rows(self, doc_id: str) -> Dict[int, int]:
+        """chunk hash -> vector row of the currently indexed version of doc_id, if any."""
+        entry = self._get_document(doc_id)
+        if entry is None:
+            return {}
+        if self.store and entry["record"] is not None:
+            hashes = self.store.load_chunk_hashes(doc_id)
+            rows = self.store.record_rows(entry["record"])
+        else:
+            hashes = entry.get("chunk_hashes", [])
+            rows = self.vector_store.rows(doc_id)
+        reusable: Dict[int, int] = {}
+        for h, row in zip(hashes, rows):
+            reusable.setdefault(h, row)
+        return reusable
+
+    def get_status(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Ingestion progress for documents processed by this instance, else "ready" if stored."""
+        if doc_id in self.ingest_status:
+            return dict(self.ingest_status[doc_id])
+        entry = self._get_document(doc_id)
+        if entry is None:
+            return None
+        return {"doc_id": doc_id, "status": "ready", "chunks": len(entry["chunks"])}
+
+    def _index(self, entry: Dict) -> BM25Index:
+        if entry["index"] is None:
+            entry["index"] = self.store.load_index(entry["record"]["doc_id"])
+        return entry["index"]
+
+    def _lexical_ranking(self, entry: Dict, query: str, top_k: int) -> List[int]:
+        return [chunk_id for _, chunk_id in self._index(entry).search(query, top_k)]
+
+    def _vector_ranking(self, doc_id: str, query: str, top_k: int) -> List[int]:
+        query_vector = self.embedder.embed([query])[0]
+        return [position for _, _, position in self.vector_store.search(query_vector, top_k, doc_ids=[doc_id])]
+
+    def retrieve_relevant_chunks(self, doc_id: str, query: str, top_k: int = 5,
+                                 mode: str = "lexical") -> List[str]:
+        """
+        Return the top_k most relevant chunks of a document.
+
+        mode="lexical" ranks by BM25 over the inverted index, mode="vector" by
+        cosine similarity of embeddings, and mode="hybrid" fuses both rankings
+        with reciprocal rank fusion.
         """
-        Naive semantic search: return top_k most relevant chunks by keyword overlap.
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        with span("rag.retrieve_relevant_chunks", mode=mode):
+            entry = self._get_document(doc_id)
+            if entry is None:
+                log(f"No document with ID {doc_id} found", level="WARNING")
+                return []
+
+            if mode == "lexical":
+                ranking = self._lexical_ranking(entry, query, top_k)
+            elif mode == "vector":
+                ranking = self._vector_ranking(doc_id, query, top_k)
+            else:
+                fused: Dict[int, float] = {}
+                for ranked in (self._lexical_ranking(entry, query, top_k * 2),
+                               self._vector_ranking(doc_id, query, top_k * 2)):
+                    for rank, chunk_id in enumerate(ranked):
+                        fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+                ranking = heapq.nlargest(top_k, fused, key=fused.get)
+
+            chunks = entry["chunks"]
+            return [chunks[chunk_id] for chunk_id in ranking]
+
+    def _document_metadata(self) -> Dict[str, Dict[str, Any]]:
+        if self.store:
+            self.store.refresh()
+            return {doc_id: record.get("metadata", {}) for doc_id, record in self.store.records.items()}
+        return {doc_id: entry["metadata"] for doc_id, entry in self.documents.items()}
+
+    def _sync_corpus(self):
+        """Bring the corpus index in line with the store, which other workers may have changed."""
+        if not self.store:
+            return
+        with self._corpus_lock:
+            records = dict(self.store.records)
+            for doc_id, record in records.items():
+                if self._corpus_records.get(doc_id) is record:
+                    continue
+                entry = self._get_document(doc_id)
+                if entry is None or entry["record"] is None:
+                    continue
+                self.corpus.add_document(doc_id, self._index(entry))
+                self._corpus_records[doc_id] = record
+            for doc_id in [d for d in self._corpus_records if d not in records]:
+                self.corpus.remove(doc_id)
+                del self._corpus_records[doc_id]
+
+    @staticmethod
+    def _matching_doc_ids(metadata: Dict[str, Dict[str, Any]], doc_ids: Optional[List[str]],
+                          filters: Optional[Dict[str, Any]]) -> List[str]:
+        candidates = metadata if doc_ids is None else [d for d in doc_ids if d in metadata]
+        if not filters:
+            return list(candidates)
+
+        def _matches(meta: Dict[str, Any]) -> bool:
+            for key, expected in filters.items():
+                value = meta.get(key)
+                if callable(expected):
+                    if not expected(value):
+                        return False
+                elif isinstance(expected, (list, tuple, set)):
+                    if value not in expected:
+                        return False
+                elif value != expected:
+                    return False
+            return True
+
+        return [doc_id for doc_id in candidates if _matches(metadata[doc_id])]
+
+    @traced("rag.search")
+    def search(self, query: str, doc_ids: Optional[List[str]] = None,
+               filters: Optional[Dict[str, Union[Any, Callable[[Any], bool]]]] = None,
+               top_k: int = 5, mode: str = "hybrid") -> List[Dict[str, Any]]:
         """
-        from difflib import SequenceMatcher
+        One global top-k over every indexed document, or over `doc_ids`
+        and/or documents whose metadata matches `filters`.
+
+        Args:
+            query (str): Search query.
+            doc_ids (list, optional): Restrict the search to these documents.
+            filters (dict, optional): Metadata constraints; a value may be a
+                literal, a collection of accepted values, or a predicate.
+            top_k (int): Number of results across all documents.
+            mode (str): "vector" scores the shared embedding matrix in one
+                product; "lexical" scores the corpus-wide BM25 index, whose idf
+                and average chunk length span every document; "hybrid"
+                (default) fuses both by reciprocal rank, so exact-term matches
+                the hashed embeddings miss are still found.
 
-        if doc_id not in self.vector_store:
-            log(f"No document with ID {doc_id} found", level="WARNING")
+        Returns:
+            list: [{"doc_id", "chunk_index", "score", "text"}, ...], best first.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        metadata = self._document_metadata()
+        selected = self._matching_doc_ids(metadata, doc_ids, filters)
+        if not selected:
             return []
+        # Unrestricted searches scan the whole shared matrix without a row gather.
+        restricted = doc_ids is not None or bool(filters)
+
+        def _vector_hits(k: int) -> List[tuple]:
+            query_vector = self.embedder.embed([query])[0]
+            return self.vector_store.search(query_vector, k, doc_ids=selected if restricted else None)
 
-        chunks = self.vector_store[doc_id]["chunks"]
-        scored_chunks = []
+        def _lexical_hits(k: int) -> List[tuple]:
+            self._sync_corpus()
+            return self.corpus.search(query, k, doc_ids=selected if restricted else None)
 
-        for chunk in chunks:
-            score = SequenceMatcher(None, chunk.lower(), query.lower()).ratio()
-            scored_chunks.append((score, chunk))
+        if mode == "vector":
+            hits = _vector_hits(top_k)
+        elif mode == "lexical":
+            hits = _lexical_hits(top_k)
+        else:
+            fused: Dict[tuple, float] = {}
+            for ranked in (_lexical_hits(top_k * 2), _vector_hits(top_k * 2)):
+                for rank, (_, doc_id, position) in enumerate(ranked):
+                    fused[(doc_id, position)] = fused.get((doc_id, position), 0.0) + 1.0 / (RRF_K + rank + 1)
+            hits = [(fused[key], *key) for key in heapq.nlargest(top_k, fused, key=fused.get)]
 
-        scored_chunks.sort(reverse=True)
-        return [chunk for _, chunk in scored_chunks[:top_k]]
+        results = []
+        for score, doc_id, position in hits:
+            entry = self._get_document(doc_id)
+            if entry is None:
+                continue
+            results.append({
+                "doc_id": doc_id,
+                "chunk_index": int(position),
+                "score": float(score),
+                "text": entry["chunks"][position]
+            })
+        return results
+
+    def query_documents(self, query: str, doc_ids: Optional[List[str]] = None,
+                        filters: Optional[Dict[str, Any]] = None, top_k: int = 8) -> str:
+        """
+        Answer from several documents at once: one global search, one Gemini
+        call, with excerpts labelled so the answer can cite its sources.
+        """
+        results = self.search(query, doc_ids=doc_ids, filters=filters, top_k=top_k, mode="hybrid")
+        # Excerpts are best first, so the lowest-scoring are dropped first when over budget.
+        prompt = (
+            PromptBuilder("rag")
+            .add(
+                "You are an AI assistant. Use the following excerpts from several documents and answer the question "
+                "in a helpful way.\nCite the excerpts you rely on by their [document#chunk] labels.\n\n"
+            )
+            .add_ranked(
+                [f"[{r['doc_id']}#{r['chunk_index']}]\n{r['text']}" for r in results],
+                header="---DOCUMENT EXCERPTS---\n", separator="\n\n", footer="\n\n"
+            )
+            .add(f"---USER QUESTION---\n{query}\n")
+            .build()
+        )
+        return generate_gemini_response(prompt)
 
     def query_document(self, doc_id: str, query: str) -> str:
         """
         Main RAG logic: Retrieve chunks + pass to Gemini for grounded answer.
         """
         context_chunks = self.retrieve_relevant_chunks(doc_id, query)
-        context = "\n\n".join(context_chunks)
-
-        prompt = f"""
-You are an AI assistant. Use the following extracted content from a document and answer the question in a helpful way.
-
----DOCUMENT EXCERPTS---
-{context}
-
----USER QUESTION---
-{query}
-"""
+        prompt = (
+            PromptBuilder("rag")
+            .add(
+                "You are an AI assistant. Use the following extracted content from a document and answer the "
+                "question in a helpful way.\n\n"
+            )
+            .add_ranked(context_chunks, header="---DOCUMENT EXCERPTS---\n", separator="\n\n", footer="\n\n")
+            .add(f"---USER QUESTION---\n{query}\n")
+            .build()
+        )
         return generate_gemini_response(prompt)
 
-# Global instance for backward compatibility
-_rag_service = RAGService()
+# Global instance for backward compatibility, created (with its store) on first use
+_rag_service = None
+_rag_service_lock = threading.Lock()
+
+def get_rag_service() -> RAGService:
+    global _rag_service
+    with _rag_service_lock:
+        if _rag_service is None:
+            _rag_service = RAGService()
+        return _rag_service
 
 # Legacy functions (deprecated but kept for compatibility)
 def process_document(file_path: str, doc_id: str = None):
-    return _rag_service.process_document(file_path, doc_id)
+    return get_rag_service().process_document(file_path, doc_id)
 
-def retrieve_relevant_chunks(doc_id: str, query: str, top_k: int = 5):
-    return _rag_service.retrieve_relevant_chunks(doc_id, query, top_k)
+def retrieve_relevant_chunks(doc_id: str, query: str, top_k: int = 5, mode: str = "lexical"):
+    return get_rag_service().retrieve_relevant_chunks(doc_id, query, top_k, mode)
 
 def query_document_with_rag(doc_id: str, query: str):
-    return _rag_service.query_document(doc_id, query)
\ No newline at end of file
+    return get_rag_service().query_document(doc_id, query)
+
+def search_documents(query: str, doc_ids: list = None, filters: dict = None, top_k: int = 5, mode: str = "hybrid"):
+    return get_rag_service().search(query, doc_ids, filters, top_k, mode)
+
+def query_documents_with_rag(query: str, doc_ids: list = None, filters: dict = None):
+    return get_rag_service().query_documents(query, doc_ids, filters)
\ No newline at end of file
@@ -0,0 +1,114 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from flask_app.core.utils.logger import log
+
+class TaskGraph:
+    """
+    Dependency graph of named steps run on a thread pool: a node starts as soon
+    as all of its dependencies have produced results, so independent nodes run
+    in parallel and total latency follows the critical path.
+
+    Nodes can be cancelled while the graph runs (e.g. by another node's result);
+    cancelled nodes that have not started are skipped, as is everything that
+    depends on them. A node that raises cancels all remaining nodes and the
+    error is re-raised from `run`.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._cancelled = set()
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def add(self, name: str, fn: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = ()) -> "TaskGraph":
+        """
+        Args:
+            name (str): Unique node name.
+            fn (callable): Called with the results of all finished nodes (read-only).
+            deps (iterable): Names of nodes that must finish first.
+        """
+        if name in self._nodes:
+            raise ValueError(f"Duplicate task graph node: {name}")
+        self._nodes[name] = {"fn": fn, "deps": tuple(deps)}
+        return self
+
+    def cancel(self, names: Iterable[str]):
+        """Cancel nodes that have not started yet; safe to call from inside a node."""
+        with self._lock:
+            for name in names:
+                self._cancelled.add(name)
+                future = self._futures.get(name)
+                if future is not None:
+                    future.cancel()
+
+    def _timed(self, name: str, fn: Callable, results: Dict[str, Any], origin: float):
+        started = time.time()
+        try:
+            return fn(results)
+        finally:
+            finished = time.time()
+            with self._lock:
+                self.timings[name] = {
+                    "start": round(started - origin, 3),
+                    "end": round(finished - origin, 3),
+                    "elapsed": round(finished - started, 3)
+                }
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Execute the graph and return {node name: result} for nodes that ran.
+        Per-node start/end offsets and durations are left in `timings`.
+        """
+        for name, node in self._nodes.items():
+            missing = [dep for dep in node["deps"] if dep not in self._nodes]
+            if missing:
+                raise ValueError(f"Node {name} depends on unknown nodes {missing}")
+
+        origin = time.time()
+        results: Dict[str, Any] = {}
+        skipped: List[str] = []
+        pending = dict(self._nodes)
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="task-graph") as pool:
+            while pending or running:
+                with self._lock:
+                    for name, node in list(pending.items()):
+                        if name in self._cancelled or any(dep in skipped for dep in node["deps"]):
+                            skipped.append(name)
+                            del pending[name]
+                        elif all(dep in results for dep in node["deps"]):
+                            # Nodes run in the caller's context (e.g. its model call counter).
+                            future = pool.submit(
+                                contextvars.copy_context().run, self._timed, name, node["fn"], dict(results), origin
+                            )
+                            self._futures[name] = future
+                            running[future] = name
+                            del pending[name]
+                if not running:
+                    # Only cancelled/skipped nodes remain (a cycle would also end here).
+                    skipped.extend(pending)
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if future.cancelled():
+                        skipped.append(name)
+                        continue
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        log(f"Task graph node {name} failed: {e}", level="ERROR")
+                        error = error or e
+                        self.cancel(list(pending) + list(running.values()))
+
+        if error is not None:
+            raise error
+        return results
@@ -0,0 +1,266 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for both indexing and querying."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class _MappedPostings(Mapping):
+    """Read-only term -> postings view over a memory-mapped (N, 2) int32 array."""
+
+    def __init__(self, vocabulary: Dict[str, List[int]], postings: np.ndarray):
+        self._vocabulary = vocabulary
+        self._postings = postings
+
+    def __getitem__(self, term: str) -> List[List[int]]:
+        start, count = self._vocabulary[term]
+        return self._postings[start:start + count].tolist()
+
+    def __iter__(self):
+        return iter(self._vocabulary)
+
+    def __len__(self) -> int:
+        return len(self._vocabulary)
+
+
+class BM25Index:
+    """
+    Inverted index over a list of chunks with Okapi BM25 scoring.
+
+    Postings are built once at ingest time, so a query only touches the
+    chunks that contain at least one of its terms. A saved index is loaded
+    read-only with its postings memory-mapped.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> [(chunk_id, term_frequency), ...]
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+        self.total_length = 0
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[str], **kwargs) -> "BM25Index":
+        index = cls(**kwargs)
+        for chunk in chunks:
+            index.add(chunk)
+        return index
+
+    @property
+    def num_chunks(self) -> int:
+        return len(self.doc_lengths)
+
+    @property
+    def avg_length(self) -> float:
+        return self.total_length / self.num_chunks if self.num_chunks else 0.0
+
+    def add(self, chunk: str) -> int:
+        """Index a chunk and return its chunk id."""
+        terms = tokenize(chunk)
+        return self.add_counts(Counter(terms), len(terms))
+
+    def add_counts(self, term_counts: Mapping[str, int], length: int) -> int:
+        """Index a chunk already tokenized into term frequencies; returns its chunk id."""
+        chunk_id = len(self.doc_lengths)
+        # Length first: concurrent searches may see the chunk before its postings, never after.
+        self.doc_lengths.append(length)
+        self.total_length += length
+        for term, tf in term_counts.items():
+            self.postings[term].append((chunk_id, tf))
+        return chunk_id
+
+    def save(self, prefix: str):
+        """
+        Write the index as `<prefix>.vocab.json` plus int32 `<prefix>.postings`
+        and `<prefix>.lengths` arrays that `load` memory-maps.
+        """
+        vocabulary: Dict[str, List[int]] = {}
+        flat: List[Tuple[int, int]] = []
+        for term, postings in self.postings.items():
+            vocabulary[term] = [len(flat), len(postings)]
+            flat.extend(postings)
+
+        for suffix, payload in ((".postings", np.asarray(flat, dtype=np.int32).reshape(-1, 2)),
+                                (".lengths", np.asarray(self.doc_lengths, dtype=np.int32))):
+            with open(prefix + suffix + ".tmp", "wb") as f:
+                f.write(payload.tobytes())
+            os.replace(prefix + suffix + ".tmp", prefix + suffix)
+        with open(prefix + ".vocab.json.tmp", "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": vocabulary}, f)
+        os.replace(prefix + ".vocab.json.tmp", prefix + ".vocab.json")
+
+    @classmethod
+    def load(cls, prefix: str) -> "BM25Index":
+        """Open an index written by `save` without copying its postings into memory."""
+        with open(prefix + ".vocab.json") as f:
+            meta = json.load(f)
+        index = cls(k1=meta["k1"], b=meta["b"])
+
+        def _map(suffix: str) -> np.ndarray:
+            path = prefix + suffix
+            if not os.path.getsize(path):
+                return np.zeros(0, dtype=np.int32)
+            return np.memmap(path, dtype=np.int32, mode="r")
+
+        index.postings = _MappedPostings(meta["terms"], _map(".postings").reshape(-1, 2))
+        index.doc_lengths = _map(".lengths")
+        index.total_length = int(index.doc_lengths.sum())
+        return index
+
+    def idf(self, term: str) -> float:
+        return self._idf(len(self.postings.get(term, ())))
+
+    def _idf(self, df: int) -> float:
+        return math.log(1 + (self.num_chunks - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[float, int]]:
+        """
+        Score chunks matching any query term.
+
+        Returns:
+            list: (score, chunk_id) pairs, best first, at most top_k long.
+        """
+        if not self.num_chunks or top_k <= 0:
+            return []
+
+        avg_length = self.avg_length or 1.0
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(len(postings))
+            for chunk_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(top_k, ((score, chunk_id) for chunk_id, score in scores.items()))
+
+
+class CorpusIndex:
+    """
+    One BM25 index over the chunks of every document.
+
+    Postings carry (document ordinal, chunk id, term frequency), and document
+    frequencies and the average chunk length are corpus-wide, so scores of
+    chunks from different documents are comparable and a query is one pass
+    over its terms' postings, filtered to the selected documents. Documents
+    are added chunk by chunk while they ingest or whole from their
+    per-document BM25Index, and replaced or removed as a unit.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> [(doc_ordinal, chunk_id, term_frequency), ...]
+        self.postings: Dict[str, List[Tuple[int, int, int]]] = defaultdict(list)
+        self._doc_ids: List[Optional[str]] = []
+        self._ordinals: Dict[str, int] = {}
+        self._lengths: Dict[int, List[int]] = {}  # doc ordinal -> chunk lengths
+        self._terms: Dict[int, Set[str]] = {}  # doc ordinal -> its terms, to remove its postings
+        self.num_chunks = 0
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._ordinals
+
+    def _ordinal(self, doc_id: str) -> int:
+        ordinal = self._ordinals.get(doc_id)
+        if ordinal is None:
+            ordinal = self._ordinals[doc_id] = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+            self._lengths[ordinal] = []
+            self._terms[ordinal] = set()
+        return ordinal
+
+    def _remove(self, doc_id: str):
+        ordinal = self._ordinals.pop(doc_id, None)
+        if ordinal is None:
+            return
+        for term in self._terms.pop(ordinal):
+            kept = [posting for posting in self.postings[term] if posting[0] != ordinal]
+            if kept:
+                self.postings[term] = kept
+            else:
+                del self.postings[term]
+        lengths = self._lengths.pop(ordinal)
+        self.num_chunks -= len(lengths)
+        self.total_length -= sum(lengths)
+        self._doc_ids[ordinal] = None
+
+    def add_chunk(self, doc_id: str, chunk_id: int, term_counts: Mapping[str, int], length: int):
+        """Index the next chunk of a document; chunk ids follow the document's own BM25Index."""
+        with self._lock:
+            ordinal = self._ordinal(doc_id)
+            self._lengths[ordinal].append(length)
+            self.num_chunks += 1
+            self.total_length += length
+            for term, tf in term_counts.items():
+                self.postings[term].append((ordinal, chunk_id, tf))
+                self._terms[ordinal].add(term)
+
+    def add_document(self, doc_id: str, index: BM25Index):
+        """Index (or replace) a whole document from its per-document BM25Index."""
+        with self._lock:
+            self._remove(doc_id)
+            ordinal = self._ordinal(doc_id)
+            lengths = [int(length) for length in index.doc_lengths]
+            self._lengths[ordinal] = lengths
+            self.num_chunks += len(lengths)
+            self.total_length += sum(lengths)
+            for term, postings in index.postings.items():
+                self.postings[term].extend((ordinal, chunk_id, tf) for chunk_id, tf in postings)
+                self._terms[ordinal].add(term)
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove(doc_id)
+
+    def search(self, query: str, top_k: int = 5,
+               doc_ids: Optional[Iterable[str]] = None) -> List[Tuple[float, str, int]]:
+        """
+        Score chunks matching any query term across the corpus.
+
+        Args:
+            query (str): Search query.
+            top_k (int): Maximum results.
+            doc_ids (iterable, optional): Only score chunks of these documents; None scores all.
+
+        Returns:
+            list: (score, doc_id, chunk_id) tuples, best first.
+        """
+        if top_k <= 0:
+            return []
+        with self._lock:
+            if not self.num_chunks:
+                return []
+            allowed = None if doc_ids is None else {self._ordinals[d] for d in doc_ids if d in self._ordinals}
+            avg_length = self.total_length / self.num_chunks or 1.0
+            scores: Dict[Tuple[int, int], float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                # Document frequency over the whole corpus, not only the selected documents.
+                idf = math.log(1 + (self.num_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+                for ordinal, chunk_id, tf in postings:
+                    if allowed is not None and ordinal not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[ordinal][chunk_id] / avg_length)
+                    scores[(ordinal, chunk_id)] += idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(top_k, ((score, ordinal, chunk_id) for (ordinal, chunk_id), score in scores.items()))
+            return [(score, self._doc_ids[ordinal], chunk_id) for score, ordinal, chunk_id in best]
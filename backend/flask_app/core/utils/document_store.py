@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from flask_app.core.utils.bm25_index import BM25Index
+from flask_app.core.utils.vector_store import VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process locking is unavailable
+    fcntl = None
+
+
+def _to_ranges(rows: Sequence[int]) -> List[List[int]]:
+    """Compress row ids into [start, end) runs, preserving their order."""
+    ranges: List[List[int]] = []
+    for row in rows:
+        if ranges and ranges[-1][1] == row:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([row, row + 1])
+    return ranges
+
+
+def _from_ranges(ranges: Iterable[Sequence[int]]) -> List[int]:
+    return [row for start, end in ranges for row in range(start, end)]
+
+
+class ChunkStore:
+    """
+    Chunk text kept in an append-only UTF-8 file, addressed through an
+    int64 (byte offset, byte length) table. Both files are memory-mapped
+    read-only, so chunk text is paged in on demand instead of held in memory.
+    """
+
+    def __init__(self, directory: str):
+        self.text_path = os.path.join(directory, "chunks.txt")
+        self.offsets_path = os.path.join(directory, "chunks.offsets")
+        self._text = np.zeros(0, dtype=np.uint8)
+        self._offsets = np.zeros((0, 2), dtype=np.int64)
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def reload(self):
+        """Re-map both files to pick up chunks appended since they were opened."""
+        if not os.path.exists(self.offsets_path):
+            return
+        rows = os.path.getsize(self.offsets_path) // 16
+        if rows != len(self._offsets):
+            self._offsets = np.memmap(self.offsets_path, dtype=np.int64, mode="r", shape=(rows, 2))
+            self._text = np.memmap(self.text_path, dtype=np.uint8, mode="r") \
+                if os.path.getsize(self.text_path) else np.zeros(0, dtype=np.uint8)
+
+    def append(self, texts: Sequence[str]) -> List[int]:
+        """Append chunks and return their row ids. Callers must hold the store lock."""
+        start_row = os.path.getsize(self.offsets_path) // 16 if os.path.exists(self.offsets_path) else 0
+        offset = os.path.getsize(self.text_path) if os.path.exists(self.text_path) else 0
+
+        encoded = [text.encode("utf-8") for text in texts]
+        table = np.zeros((len(encoded), 2), dtype=np.int64)
+        for i, data in enumerate(encoded):
+            table[i] = (offset, len(data))
+            offset += len(data)
+
+        # Text first, then offsets: a reader never sees an offset past the text end.
+        with open(self.text_path, "ab") as f:
+            f.write(b"".join(encoded))
+        with open(self.offsets_path, "ab") as f:
+            f.write(table.tobytes())
+        self.reload()
+        return list(range(start_row, start_row + len(encoded)))
+
+    def get(self, row: int) -> str:
+        if row >= len(self._offsets):
+            self.reload()
+        offset, length = self._offsets[row]
+        return bytes(self._text[offset:offset + length]).decode("utf-8")
+
+
+class ChunkView(Sequence):
+    """Lazy, list-like view of one document's chunks inside a ChunkStore."""
+
+    def __init__(self, store: ChunkStore, rows: List[int]):
+        self._store = store
+        self._rows = rows
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._store.get(row) for row in self._rows[position]]
+        return self._store.get(self._rows[position])
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class DocumentStore:
+    """
+    On-disk RAG store shared by every worker process.
+
+    Layout under `directory`:
+        chunks.txt / chunks.offsets   append-only chunk text + offset table
+        vectors.f32                   append-only float32 embedding rows
+        lexical/<doc_id>.*            per-document BM25 postings
+        documents.jsonl               append-only manifest of document records
+        meta.json                     embedding dimension of the store
+
+    Chunk row i and vector row i always describe the same chunk. Writers
+    serialise on `store.lock`; readers pick up other workers' documents by
+    replaying new manifest lines in `refresh`.
+    """
+
+    def __init__(self, directory: str, dim: int):
+        self.directory = directory
+        self.lexical_dir = os.path.join(directory, "lexical")
+        os.makedirs(self.lexical_dir, exist_ok=True)
+        self._check_meta(dim)
+
+        self.chunks = ChunkStore(directory)
+        self.vectors = VectorStore(dim, path=os.path.join(directory, "vectors.f32"))
+        self.manifest_path = os.path.join(directory, "documents.jsonl")
+        self.lock_path = os.path.join(directory, "store.lock")
+        self.records: Dict[str, Dict] = {}
+        self._manifest_offset = 0
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def _check_meta(self, dim: int):
+        meta_path = os.path.join(self.directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                stored_dim = json.load(f)["dim"]
+            if stored_dim != dim:
+                raise ValueError(f"RAG store at {self.directory} holds {stored_dim}-d vectors, embedder produces {dim}-d")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"dim": dim}, f)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _apply(self, record: Dict) -> str:
+        doc_id = record["doc_id"]
+        self.vectors.remove(doc_id)
+        if record.get("removed"):
+            self.records.pop(doc_id, None)
+        else:
+            self.vectors.register(doc_id, _from_ranges(record["rows"]))
+            self.records[doc_id] = record
+        return doc_id
+
+    def refresh(self) -> List[str]:
+        """Replay manifest lines written since the last refresh; returns the affected doc ids."""
+        with self._lock:
+            if not os.path.exists(self.manifest_path):
+                return []
+            with open(self.manifest_path, "rb") as f:
+                f.seek(self._manifest_offset)
+                lines = f.readlines()
+            changed = []
+            for line in lines:
+                if not line.endswith(b"\n"):
+                    break  # Partially written by another process; read it next time.
+                self._manifest_offset += len(line)
+                changed.append(self._apply(json.loads(line)))
+            if changed:
+                self.chunks.reload()
+                self.vectors.reload()
+            return changed
+
+    def _append_record(self, record: Dict):
+        with open(self.manifest_path, "ab") as f:
+            line = (json.dumps(record) + "\n").encode("utf-8")
+            f.write(line)
+        self._manifest_offset += len(line)
+        self._apply(record)
+
+    def append_chunks(self, chunks: Sequence[str], vectors: np.ndarray) -> List[int]:
+        """
+        Append one batch of chunks and their vectors; returns their row ids.
+        Callers attach the rows to a document with `vectors.register`; other
+        workers see the document only once `commit_document` publishes it.
+        """
+        with self._locked():
+            self.refresh()
+            rows = self.chunks.append(chunks)
+            vector_rows = self.vectors.append(vectors).tolist()
+            if rows != vector_rows:
+                raise RuntimeError(f"RAG store out of sync: chunk rows {rows[:1]} vs vector rows {vector_rows[:1]}")
+        return rows
+
+    def commit_document(self, doc_id: str, path: str, rows: Sequence[int], index: BM25Index,
+                        metadata: Optional[Dict] = None, file_hash: Optional[str] = None,
+                        chunk_hashes: Optional[Sequence[int]] = None) -> Dict:
+        """Persist the lexical index and chunk hashes and publish the document; returns its manifest record."""
+        with self._locked():
+            self.refresh()
+            prefix = self.lexical_prefix(doc_id)
+            index.save(prefix)
+            with open(prefix + ".hashes.tmp", "wb") as f:
+                f.write(np.asarray(chunk_hashes or [], dtype=np.uint64).tobytes())
+            os.replace(prefix + ".hashes.tmp", prefix + ".hashes")
+            record = {"doc_id": doc_id, "path": path, "file_hash": file_hash,
+                      "metadata": metadata or {}, "rows": _to_ranges(rows)}
+            self._append_record(record)
+        return record
+
+    def remove_document(self, doc_id: str):
+        with self._locked():
+            self.refresh()
+            if doc_id in self.records:
+                self._append_record({"doc_id": doc_id, "removed": True})
+
+    def lexical_prefix(self, doc_id: str) -> str:
+        return os.path.join(self.lexical_dir, doc_id)
+
+    def chunk_view(self, record_or_rows) -> ChunkView:
+        """View a document's chunks from its manifest record or a (growing) list of rows."""
+        if isinstance(record_or_rows, dict):
+            return ChunkView(self.chunks, _from_ranges(record_or_rows["rows"]))
+        return ChunkView(self.chunks, record_or_rows)
+
+    def load_index(self, doc_id: str) -> BM25Index:
+        return BM25Index.load(self.lexical_prefix(doc_id))
+
+    def load_chunk_hashes(self, doc_id: str) -> List[int]:
+        path = self.lexical_prefix(doc_id) + ".hashes"
+        if not os.path.exists(path):
+            return []
+        return np.fromfile(path, dtype=np.uint64).tolist()
+
+    def find_by_file_hash(self, file_hash: str) -> Optional[str]:
+        self.refresh()
+        for doc_id, record in self.records.items():
+            if record.get("file_hash") == file_hash:
+                return doc_id
+        return None
+
+    @staticmethod
+    def record_rows(record: Dict) -> List[int]:
+        return _from_ranges(record["rows"])
@@ -0,0 +1,55 @@
+import math
+import zlib
+from collections import Counter
+from typing import Protocol, Sequence
+
+import numpy as np
+
+from flask_app.core.utils.bm25_index import tokenize
+
+
+class Embedder(Protocol):
+    """Anything that maps a batch of texts to a (len(texts), dim) float32 matrix."""
+
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length in place; all-zero rows are left as is."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder using the hashing trick.
+
+    Unigrams and bigrams are hashed with crc32 (stable across processes,
+    unlike the builtin hash) into `dim` signed buckets with sublinear term
+    frequency. No model download or network call is required.
+    """
+
+    def __init__(self, dim: int = 512, use_bigrams: bool = True):
+        self.dim = dim
+        self.use_bigrams = use_bigrams
+
+    def _features(self, text: str) -> Counter:
+        terms = tokenize(text)
+        features = Counter(terms)
+        if self.use_bigrams:
+            features.update(f"{a} {b}" for a, b in zip(terms, terms[1:]))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, tf in self._features(text).items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dim] += sign * (1.0 + math.log(tf))
+        return normalize_rows(matrix)
@@ -1,13 +1,78 @@
+import hashlib
 import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
 from PyPDF2 import PdfReader
 import docx
 
-def parse_pdf(file_path: str) -> str:
+# PDFs with at least this many pages are extracted by a process pool.
+PARALLEL_PAGE_THRESHOLD = 64
+PAGES_PER_BATCH = 16
+DOCX_PARAGRAPHS_PER_PAGE = 50
+
+Page = namedtuple("Page", ["number", "total", "text"])
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Hex SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """Worker entry point: extract pages [start, end) of a PDF."""
     reader = PdfReader(file_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() or ""
-    return text.strip()
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def iter_pdf_pages(file_path: str, workers: Optional[int] = None) -> Iterator[Page]:
+    """
+    Yield PDF pages in order as they are extracted. Large PDFs are split into
+    page batches extracted in parallel; at most two batches per worker are in
+    flight so memory stays bounded regardless of document size.
+    """
+    reader = PdfReader(file_path)
+    total = len(reader.pages)
+    workers = workers or os.cpu_count() or 1
+
+    if total < PARALLEL_PAGE_THRESHOLD or workers < 2:
+        for number, page in enumerate(reader.pages):
+            yield Page(number, total, page.extract_text() or "")
+        return
+
+    batches = [(start, min(start + PAGES_PER_BATCH, total)) for start in range(0, total, PAGES_PER_BATCH)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        next_batch = 0
+        while next_batch < len(batches) or pending:
+            while next_batch < len(batches) and len(pending) < workers * 2:
+                start, end = batches[next_batch]
+                pending.append((start, pool.submit(_extract_page_range, file_path, start, end)))
+                next_batch += 1
+            start, future = pending.pop(0)
+            for offset, text in enumerate(future.result()):
+                yield Page(start + offset, total, text)
+
+def iter_docx_pages(file_path: str) -> Iterator[Page]:
+    """DOCX has no pages; yield groups of paragraphs instead."""
+    paragraphs = docx.Document(file_path).paragraphs
+    total = (len(paragraphs) + DOCX_PARAGRAPHS_PER_PAGE - 1) // DOCX_PARAGRAPHS_PER_PAGE
+    for number in range(total):
+        group = paragraphs[number * DOCX_PARAGRAPHS_PER_PAGE:(number + 1) * DOCX_PARAGRAPHS_PER_PAGE]
+        yield Page(number, total, "\n".join(para.text for para in group))
+
+def iter_file_pages(file_path: str, workers: Optional[int] = None) -> Iterator[Page]:
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".pdf":
+        return iter_pdf_pages(file_path, workers)
+    elif ext == ".docx":
+        return iter_docx_pages(file_path)
+    else:
+        raise ValueError(f"Unsupported file extension: {ext}")
+
+def parse_pdf(file_path: str) -> str:
+    return "\n".join(page.text for page in iter_pdf_pages(file_path)).strip()
 
 def parse_docx(file_path: str) -> str:
     doc = docx.Document(file_path)
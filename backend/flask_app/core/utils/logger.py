@@ -1,5 +1,141 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+from flask_app.core.utils.task_context import current_task_id
 
-def log(message: str, level: str = "INFO"):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"{timestamp} | {level.upper()} | {message}")
+# Minimum level overall, plus per-module overrides, e.g.
+# LOG_LEVELS="flask_app.agents=WARNING,flask_app.tools.gemini_connector=DEBUG".
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# "json" emits one JSON object per line; "text" keeps the "time | LEVEL | message" lines.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_FILE = os.getenv("LOG_FILE") or None
+# Messages longer than this are cut, and below WARNING only a sample of them is kept at all.
+LOG_MAX_CHARS = int(os.getenv("LOG_MAX_CHARS", "2000"))
+LOG_LARGE_SAMPLE_RATE = float(os.getenv("LOG_LARGE_SAMPLE_RATE", "0.1"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+LOGGER_ROOT = "sage"
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, module, task_id, message and any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "module": record.name[len(LOGGER_ROOT) + 1:],
+            "message": record.getMessage()
+        }
+        if record.task_id is not None:
+            payload["task_id"] = record.task_id
+        payload.update(record.fields)
+        return json.dumps(payload, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        timestamp = datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S")
+        task = f"task={record.task_id} | " if record.task_id is not None else ""
+        return f"{timestamp} | {record.levelname} | {task}{record.getMessage()}"
+
+_dropped = {"count": 0}
+
+def _level(name: str) -> int:
+    levelno = logging.getLevelName(name.strip().upper())
+    return levelno if isinstance(levelno, int) else logging.INFO
+
+class _DeferredQueueHandler(QueueHandler):
+    """Enqueue records as they are; formatting happens on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on logging; count what was lost instead.
+            _dropped["count"] += 1
+
+def _configure() -> QueueListener:
+    root = logging.getLogger(LOGGER_ROOT)
+    root.setLevel(_level(LOG_LEVEL))
+    root.propagate = False
+    for override in filter(None, (item.strip() for item in LOG_LEVELS.split(","))):
+        module, _, level = override.partition("=")
+        logging.getLogger(f"{LOGGER_ROOT}.{module.strip()}").setLevel(_level(level))
+
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else TextFormatter()
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if LOG_FILE:
+        handlers.append(logging.FileHandler(LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+    root.addHandler(_DeferredQueueHandler(records))
+    listener = QueueListener(records, *handlers, respect_handler_level=False)
+    listener.start()
+    # Drain what is queued before the interpreter exits.
+    atexit.register(listener.stop)
+    return listener
+
+_listener = _configure()
+_loggers: Dict[str, logging.Logger] = {}
+
+def _logger(module: str) -> logging.Logger:
+    logger = _loggers.get(module)
+    if logger is None:
+        logger = _loggers[module] = logging.getLogger(f"{LOGGER_ROOT}.{module}")
+    return logger
+
+def _emit(level: str, message: str, depth: int, fields: Dict[str, Any]):
+    levelno = _level(level)
+    # Attribute the record to the calling module so per-module levels apply.
+    logger = _logger(sys._getframe(depth).f_globals.get("__name__", "unknown"))
+    if not logger.isEnabledFor(levelno):
+        return
+
+    message = str(message)
+    if len(message) > LOG_MAX_CHARS:
+        if levelno < logging.WARNING and random.random() >= LOG_LARGE_SAMPLE_RATE:
+            return
+        fields = {**fields, "original_chars": len(message), "sample_rate": LOG_LARGE_SAMPLE_RATE
+                  if levelno < logging.WARNING else 1.0}
+        message = f"{message[:LOG_MAX_CHARS]}... [{len(message) - LOG_MAX_CHARS} chars truncated]"
+
+    record = logger.makeRecord(logger.name, levelno, "", 0, message, None, None)
+    record.task_id = current_task_id.get()
+    record.fields = fields
+    logger.handle(record)
+
+def log(message: str, level: str = "INFO", **fields):
+    """
+    Log from any module without blocking on I/O: the record is queued and a
+    background thread formats and writes it.
+
+    Args:
+        message (str): Log message; very long ones are truncated (and sampled below WARNING).
+        level (str): DEBUG, INFO, WARNING, ERROR or CRITICAL.
+        **fields: Extra structured fields for the JSON record.
+    """
+    _emit(level, message, 2, fields)
+
+def log_debug(message: str, **fields):
+    _emit("DEBUG", message, 2, fields)
+
+def log_info(message: str, **fields):
+    _emit("INFO", message, 2, fields)
+
+def log_error(message: str, **fields):
+    _emit("ERROR", message, 2, fields)
+
+def get_log_stats() -> Dict[str, Any]:
+    return {"queued": _listener.queue.qsize(), "dropped": _dropped["count"]}
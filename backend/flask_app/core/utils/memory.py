@@ -1,55 +1,513 @@
+import atexit
+import bisect
+import heapq
 import os
 import json
-from typing import Any, Optional
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
+from flask_app.core.utils.embeddings import Embedder, HashingEmbedder
 from flask_app.core.utils.logger import log
+from flask_app.core.utils.memory_index import MemoryVectorIndex
+from flask_app.core.utils.paths import data_path
+from flask_app.core.utils.telemetry import span
 
-MEMORY_PATH = os.path.join("flask_app", "data", "memory", "task_context.json")
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process locking is unavailable
+    fcntl = None
+
+MEMORY_PATH = data_path("memory", "task_context.json")
+# Append-only log of memory writes; replaces rewriting MEMORY_PATH on every set.
+MEMORY_LOG_PATH = data_path("memory", "task_context.jsonl")
+FLUSH_INTERVAL = float(os.getenv("MEMORY_FLUSH_INTERVAL", "1.0"))
+MAX_ENTRIES = int(os.getenv("MEMORY_MAX_ENTRIES", "100000"))
+# Embed stored values so agents can recall them by meaning (see MemoryManager.recall).
+SEMANTIC_RECALL = os.getenv("MEMORY_SEMANTIC", "1") == "1"
+# Compact once the log holds this many times more records than live keys.
+COMPACT_RATIO = 4
+COMPACT_MIN_RECORDS = 1000
+
+GLOBAL_NAMESPACE = "global"
+NAMESPACE_KINDS = ("user", "task")
+
+def user_namespace(user_id: Any) -> str:
+    return f"user:{user_id}"
+
+def task_namespace(task_id: Any) -> str:
+    return f"task:{task_id}"
+
+def _check_namespace(namespace: str) -> str:
+    kind, _, owner = namespace.partition(":")
+    if namespace != GLOBAL_NAMESPACE and (kind not in NAMESPACE_KINDS or not owner):
+        raise ValueError(f"Invalid memory namespace {namespace!r}; use 'global', 'user:<id>' or 'task:<id>'")
+    return namespace
+
+def _updated_at(entry: Dict[str, Any]) -> float:
+    # Entries written before namespaces existed only carry an ISO timestamp.
+    if "updated_at" not in entry:
+        try:
+            entry["updated_at"] = datetime.fromisoformat(entry["timestamp"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            entry["updated_at"] = 0.0
+    return entry["updated_at"]
 
 class MemoryManager:
-    def __init__(self):
-        self.memory = self._load_memory()
+    """
+    Namespaced key/value task memory backed by an append-only JSON-lines log.
+
+    `set` updates memory immediately and queues a log record; a background
+    thread appends queued records in one batch every `flush_interval` seconds
+    (write-behind), so a write costs O(1) regardless of memory size. On load
+    the log is replayed; once it holds mostly superseded records it is
+    compacted into one record per live key. Appends and compaction take an
+    exclusive file lock, and records other processes appended are replayed
+    before each flush.
+
+    Keys live in a namespace: "global" (the default, used by the legacy API),
+    "user:<id>" or "task:<id>". Entries may carry a TTL, and the least
+    recently used entries are evicted beyond `max_entries`. Per-namespace
+    sorted indexes over keys and update times answer prefix and time-range
+    queries in O(log n + results).
+
+    With an embedder, every stored value is also embedded into a
+    MemoryVectorIndex persisted next to the log, and `recall` finds entries
+    by meaning rather than by exact key.
+    """
+
+    def __init__(self, log_path: str = MEMORY_LOG_PATH, flush_interval: float = FLUSH_INTERVAL,
+                 legacy_path: Optional[str] = MEMORY_PATH, max_entries: int = MAX_ENTRIES,
+                 embedder: Optional[Embedder] = None, vector_path: Optional[str] = None):
+        """
+        Args:
+            log_path (str): JSON-lines log file.
+            flush_interval (float): Seconds between write-behind flushes; 0 flushes on every set.
+            legacy_path (str, optional): Old whole-file JSON memory, imported once if no log exists.
+            max_entries (int): Live entries kept before least recently used ones are evicted.
+            embedder (optional): Enables semantic recall; None disables it.
+            vector_path (str, optional): Path prefix of the persisted vectors; defaults to
+                the log path with a ".vectors" suffix instead of its extension.
+        """
+        self.log_path = log_path
+        self.lock_path = log_path + ".lock"
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.RLock()
+        # Serialises flushes, replays and compactions in this process; see _locked.
+        self._flush_lock = threading.Lock()
+        self._log_offset = 0
+        self._log_inode = None
+        self._log_records = 0
+        self._flusher = None
+        self._vectors = None
+        if embedder is not None:
+            self._vectors = MemoryVectorIndex(embedder, vector_path or os.path.splitext(log_path)[0] + ".vectors")
+        self._reset()
+        self._load_memory(legacy_path)
+        atexit.register(self.flush)
 
-    def _load_memory(self) -> dict:
+    def _reset(self):
+        # (namespace, key) -> entry, in least- to most-recently-used order.
+        self.memory: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._keys: Dict[str, List[str]] = defaultdict(list)  # namespace -> sorted keys
+        self._times: Dict[str, List[Tuple[float, str]]] = defaultdict(list)  # namespace -> sorted (updated_at, key)
+        self._expiry: List[Tuple[float, str, str]] = []  # heap of (expires_at, namespace, key)
+        self.stats = {"evictions": 0, "expirations": 0}
+        if self._vectors is not None:
+            self._vectors.clear()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Hold the log for disk work: the in-process flush lock plus the exclusive file lock
+        against other processes. It does not take self._lock, so get/set never wait on I/O.
+        """
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        with self._flush_lock:
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_memory(self, legacy_path: Optional[str]):
         try:
-            if os.path.exists(MEMORY_PATH):
-                with open(MEMORY_PATH, "r") as f:
-                    return json.load(f)
-            return {}
+            if not os.path.exists(self.log_path) and legacy_path and os.path.exists(legacy_path):
+                with open(legacy_path, "r") as f:
+                    legacy = json.load(f)
+                self._write(*({"op": "set", "ns": GLOBAL_NAMESPACE, "key": key, "entry": entry}
+                              for key, entry in legacy.items()), flush=False)
+                self.flush()
+                log(f"Imported {len(legacy)} memory keys from {legacy_path}")
+            else:
+                with self._locked():
+                    self._replay()
         except Exception as e:
             log(f"Error loading memory: {e}", level="ERROR")
-            return {}
+
+    def _index_remove(self, namespace: str, key: str):
+        entry = self.memory.pop((namespace, key), None)
+        if entry is None:
+            return None
+        if self._vectors is not None:
+            self._vectors.remove(namespace, key)
+        keys = self._keys[namespace]
+        del keys[bisect.bisect_left(keys, key)]
+        times = self._times[namespace]
+        del times[bisect.bisect_left(times, (_updated_at(entry), key))]
+        if not keys:
+            del self._keys[namespace], self._times[namespace]
+        return entry
+
+    def _apply(self, record: Dict[str, Any]):
+        namespace, key = record.get("ns", GLOBAL_NAMESPACE), record["key"]
+        self._index_remove(namespace, key)
+        if record["op"] != "set":
+            return
+        entry = record["entry"]
+        expires_at = entry.get("expires_at")
+        if expires_at is not None:
+            if expires_at <= time.time():
+                return  # Expired while the log sat on disk.
+            heapq.heappush(self._expiry, (expires_at, namespace, key))
+        self.memory[(namespace, key)] = entry
+        bisect.insort(self._keys[namespace], key)
+        bisect.insort(self._times[namespace], (_updated_at(entry), key))
+
+    def _replay(self):
+        """
+        Apply log records written since the last replay (all of them after a compaction).
+        Caller holds _locked(); the log is read before self._lock is taken.
+        """
+        if not os.path.exists(self.log_path):
+            return
+        inode = os.stat(self.log_path).st_ino
+        # New or compacted file: rebuild from the start.
+        rebuild = inode != self._log_inode
+        records, consumed = [], 0
+        with open(self.log_path, "rb") as f:
+            f.seek(0 if rebuild else self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Torn or in-progress write; the rest is read next time.
+                consumed += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError as e:
+                    log(f"Skipping corrupt memory log record: {e}", level="ERROR")
+
+        with self._lock:
+            if rebuild:
+                self._reset()
+                self._log_offset, self._log_records, self._log_inode = 0, 0, inode
+            self._log_offset += consumed
+            applied = []
+            for record in records:
+                try:
+                    self._apply(record)
+                except KeyError as e:
+                    log(f"Skipping corrupt memory log record: {e}", level="ERROR")
+                    continue
+                self._log_records += 1
+                applied.append(record)
+            # Unflushed local writes are newer than anything on disk: keep them on top.
+            touched = {(record.get("ns", GLOBAL_NAMESPACE), record["key"]) for record in applied}
+            restored = [record for record in self._pending
+                        if rebuild or (record.get("ns", GLOBAL_NAMESPACE), record["key"]) in touched]
+            for record in restored:
+                self._apply(record)
+            self._evict()
+            if self._vectors is not None:
+                if rebuild:
+                    self._load_vectors()
+                else:
+                    # Other processes' writes: embed locally, they persist their own vectors.
+                    self._vectors.add_many(self._embeddable(applied + restored), persist=False)
+
+    def _embeddable(self, records: Iterable[Dict[str, Any]]) -> List[Tuple[str, str, Any, float]]:
+        """(namespace, key, value, updated_at) of the set records whose entry is still live."""
+        items = {}
+        for record in records:
+            slot = (record.get("ns", GLOBAL_NAMESPACE), record["key"])
+            entry = self.memory.get(slot)
+            if record["op"] == "set" and entry is record["entry"]:
+                items[slot] = (*slot, entry["value"], _updated_at(entry))
+        return list(items.values())
+
+    def _load_vectors(self):
+        """Rebuild the vector index from its files, embedding entries with no stored vector."""
+        live = {slot: _updated_at(entry) for slot, entry in self.memory.items()}
+        missing = self._vectors.load(live)
+        self._vectors.add_many((*slot, self.memory[slot]["value"], live[slot]) for slot in missing)
+        if missing:
+            log(f"Embedded {len(missing)} memory entries without stored vectors")
+
+    def flush(self):
+        """
+        Append all queued records to the log in one write.
+
+        self._lock is only taken to swap out the queue and to update offsets and
+        indexes; the write, fsync and compaction run under _locked() alone, so
+        request threads keep reading and writing memory meanwhile.
+        """
+        with self._locked():
+            # Pick up other processes' writes first so ours stay the latest.
+            self._replay()
+            self._expire()
+            if self._vectors is not None:
+                self._vectors.flush()
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            data = "".join(json.dumps(record) + "\n" for record in pending).encode("utf-8")
+            try:
+                with open(self.log_path, "ab") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                inode = os.stat(self.log_path).st_ino
+            except OSError as e:
+                with self._lock:
+                    self._pending = pending + self._pending
+                log(f"Error saving memory: {e}", level="ERROR")
+                return
+            with self._lock:
+                if self._log_inode is None:
+                    self._log_inode = inode
+                self._log_offset += len(data)
+                self._log_records += len(pending)
+                compact = self._log_records >= max(COMPACT_MIN_RECORDS, COMPACT_RATIO * len(self.memory))
+            if compact:
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the log as one record per live key. Caller holds _locked()."""
+        with self._lock:
+            live = list(self.memory.items())
+        # Writes made meanwhile are still queued and get appended to the new file.
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for (namespace, key), entry in live:
+                f.write(json.dumps({"op": "set", "ns": namespace, "key": key, "entry": entry}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        if self._vectors is not None:
+            self._vectors.rewrite()
+        stat = os.stat(self.log_path)
+        with self._lock:
+            log(f"Compacted memory log from {self._log_records} to {len(live)} records")
+            self._log_inode, self._log_offset, self._log_records = stat.st_ino, stat.st_size, len(live)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                log(f"Memory flush failed: {e}", level="ERROR")
+
+    def _expire(self):
+        """Drop entries whose TTL has passed. Replay skips them, so no log record is needed."""
+        with self._lock:
+            now = time.time()
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, namespace, key = heapq.heappop(self._expiry)
+                entry = self.memory.get((namespace, key))
+                # The heap is lazy: skip keys rewritten with another TTL since.
+                if entry is not None and entry.get("expires_at") == expires_at:
+                    self._index_remove(namespace, key)
+                    self.stats["expirations"] += 1
+
+    def _evict(self):
+        """Evict least recently used entries beyond max_entries. Caller holds the lock."""
+        while len(self.memory) > self.max_entries:
+            namespace, key = next(iter(self.memory))
+            self._index_remove(namespace, key)
+            self._pending.append({"op": "delete", "ns": namespace, "key": key})
+            self.stats["evictions"] += 1
+
+    def _write(self, *records: Dict[str, Any], flush: bool = True):
+        with self._lock:
+            for record in records:
+                self._apply(record)
+                self._pending.append(record)
+            if self._vectors is not None:
+                self._vectors.add_many(self._embeddable(records))
+            self._evict()
+            if flush:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self.flush_interval <= 0:
+            self.flush()
+        elif self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="memory-flush", daemon=True)
+            self._flusher.start()
 
     def _save_memory(self):
-        try:
-            os.makedirs(os.path.dirname(MEMORY_PATH), exist_ok=True)
-            with open(MEMORY_PATH, "w") as f:
-                json.dump(self.memory, f, indent=4)
-        except Exception as e:
-            log(f"Error saving memory: {e}", level="ERROR")
+        self.flush()
 
-    def get(self, key: str, default: Any = None) -> Any:
-        return self.memory.get(key, default)
+    def _live(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        """Entry for a key, touched for LRU, or None if missing or expired. Caller holds the lock."""
+        entry = self.memory.get((namespace, key))
+        if entry is None:
+            return None
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and expires_at <= time.time():
+            self._index_remove(namespace, key)
+            self.stats["expirations"] += 1
+            return None
+        self.memory.move_to_end((namespace, key))
+        return entry
 
-    def set(self, key: str, value: Any):
-        self.memory[key] = {
+    @staticmethod
+    def _entry(value: Any, ttl: Optional[float]) -> Dict[str, Any]:
+        now = time.time()
+        return {
             "value": value,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "updated_at": now,
+            "expires_at": now + ttl if ttl else None
         }
-        self._save_memory()
 
-# Global instance for backward compatibility
-_memory_manager = MemoryManager()
+    def get(self, key: str, default: Any = None, namespace: str = GLOBAL_NAMESPACE) -> Any:
+        with self._lock:
+            entry = self._live(_check_namespace(namespace), key)
+        return default if entry is None else entry
+
+    def get_many(self, keys: Iterable[str], namespace: str = GLOBAL_NAMESPACE) -> Dict[str, Any]:
+        """Entries for the keys that exist, in one lock acquisition."""
+        _check_namespace(namespace)
+        with self._lock:
+            found = {key: self._live(namespace, key) for key in keys}
+        return {key: entry for key, entry in found.items() if entry is not None}
+
+    def set(self, key: str, value: Any, namespace: str = GLOBAL_NAMESPACE, ttl: Optional[float] = None):
+        """
+        Args:
+            key (str): Key within the namespace.
+            value: JSON-serializable value.
+            namespace (str): "global", "user:<id>" or "task:<id>".
+            ttl (float, optional): Seconds until the entry expires; None keeps it.
+        """
+        with span("memory.set"):
+            self._write({"op": "set", "ns": _check_namespace(namespace), "key": key, "entry": self._entry(value, ttl)})
+
+    def set_many(self, items: Dict[str, Any], namespace: str = GLOBAL_NAMESPACE, ttl: Optional[float] = None):
+        """Set several keys with one lock acquisition and one queued flush."""
+        _check_namespace(namespace)
+        with span("memory.set_many", keys=len(items)):
+            self._write(*({"op": "set", "ns": namespace, "key": key, "entry": self._entry(value, ttl)}
+                          for key, value in items.items()))
+
+    def delete(self, key: str, namespace: str = GLOBAL_NAMESPACE):
+        self._write({"op": "delete", "ns": _check_namespace(namespace), "key": key})
+
+    def query(self, namespace: str = GLOBAL_NAMESPACE, prefix: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Entries of one namespace, optionally filtered by key prefix or update-time range.
+
+        Args:
+            namespace (str): Namespace to read.
+            prefix (str, optional): Only keys starting with this prefix (in key order).
+            since (float, optional): Only entries updated at or after this epoch time.
+            until (float, optional): Only entries updated before this epoch time.
+            limit (int, optional): Maximum number of entries.
+
+        Returns:
+            dict: key -> entry, in key order for prefix queries, else in update-time order.
+        """
+        _check_namespace(namespace)
+        with self._lock:
+            if prefix is not None:
+                keys = self._keys.get(namespace, [])
+                start = bisect.bisect_left(keys, prefix)
+                candidates = []
+                for key in keys[start:]:
+                    if not key.startswith(prefix):
+                        break
+                    candidates.append(key)
+            else:
+                times = self._times.get(namespace, [])
+                start = bisect.bisect_left(times, (since, "")) if since is not None else 0
+                end = bisect.bisect_left(times, (until, "")) if until is not None else len(times)
+                candidates = [key for _, key in times[start:end]]
+
+            results = {}
+            for key in candidates:
+                entry = self._live(namespace, key)
+                if entry is None:
+                    continue
+                if prefix is not None and ((since is not None and entry["updated_at"] < since)
+                                           or (until is not None and entry["updated_at"] >= until)):
+                    continue
+                results[key] = entry
+                if limit is not None and len(results) >= limit:
+                    break
+            return results
+
+    def recall(self, query: str, top_k: int = 5, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Entries whose key and value are semantically closest to a free-text query.
+
+        Args:
+            query (str): What to look for.
+            top_k (int): Maximum number of entries.
+            namespace (str, optional): Only search this namespace; None searches all.
+
+        Returns:
+            list: {"namespace", "key", "score", "value", "timestamp"} dicts, best first.
+        """
+        if self._vectors is None:
+            raise ValueError("Semantic recall is disabled for this memory (MEMORY_SEMANTIC=0)")
+        with self._lock:
+            keys = None
+            if namespace is not None:
+                keys = [(_check_namespace(namespace), key) for key in self._keys.get(namespace, [])]
+            results = []
+            for score, hit_namespace, key in self._vectors.search(query, top_k=top_k, keys=keys):
+                entry = self._live(hit_namespace, key)
+                if entry is None or score <= 0:
+                    continue
+                results.append({"namespace": hit_namespace, "key": key, "score": round(score, 4),
+                                "value": entry["value"], "timestamp": entry["timestamp"]})
+            return results
+
+    def namespaces(self) -> List[str]:
+        with self._lock:
+            return sorted(self._keys)
+
+# Global instance for backward compatibility, loaded from the log on first use
+_memory_manager = None
+_memory_manager_lock = threading.Lock()
+
+def get_memory_manager() -> MemoryManager:
+    global _memory_manager
+    with _memory_manager_lock:
+        if _memory_manager is None:
+            _memory_manager = MemoryManager(embedder=HashingEmbedder() if SEMANTIC_RECALL else None)
+        return _memory_manager
 
 # Legacy functions (deprecated but kept for compatibility)
 def load_memory():
     pass  # Now handled by MemoryManager initialization
 
 def save_memory():
-    _memory_manager._save_memory()
+    get_memory_manager()._save_memory()
 
-def get_memory(key: str) -> Any:
-    return _memory_manager.get(key)
+def get_memory(key: str, namespace: str = GLOBAL_NAMESPACE) -> Any:
+    return get_memory_manager().get(key, namespace=namespace)
 
-def set_memory(key: str, value: Any):
-    _memory_manager.set(key, value)
\ No newline at end of file
+def set_memory(key: str, value: Any, namespace: str = GLOBAL_NAMESPACE, ttl: Optional[float] = None):
+    get_memory_manager().set(key, value, namespace=namespace, ttl=ttl)
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from flask_app.core.utils.embeddings import Embedder
+from flask_app.core.utils.logger import log
+from flask_app.core.utils.vector_store import VectorStore
+
+def memory_text(key: str, value: Any) -> str:
+    """Text embedded for a memory entry: its key plus the value (JSON for non-strings)."""
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return f"{key}: {text}"
+
+def _doc_id(namespace: str, key: str) -> str:
+    return f"{namespace}\x1f{key}"
+
+class MemoryVectorIndex:
+    """
+    Embeddings of memory entries in one growing float32 matrix, for semantic recall.
+
+    Each entry owns one row; rewriting an entry appends a new row and masks
+    the old one. Rows are persisted next to the memory log as a raw float32
+    file plus a JSON-lines label file ({"row", "ns", "key", "updated_at"}),
+    both append-only, so a restart reuses stored vectors for every entry whose
+    update time still matches instead of re-embedding it. `rewrite` drops the
+    rows of dead entries when the memory log is compacted.
+    """
+
+    def __init__(self, embedder: Embedder, path: Optional[str] = None):
+        """
+        Args:
+            embedder: Maps texts to unit-length vectors (e.g. HashingEmbedder).
+            path (str, optional): Path prefix of the persisted files (<path>.f32, <path>.jsonl).
+        """
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.path = path
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._store = VectorStore(self.dim)
+        self._rows: Dict[Tuple[str, str], Tuple[int, float]] = {}  # (ns, key) -> (row, updated_at)
+        self._unsaved: List[Dict[str, Any]] = []  # labels of rows not yet on disk
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add_many(self, items: Iterable[Tuple[str, str, Any, float]], persist: bool = True):
+        """
+        Embed and index entries in one batch.
+
+        Args:
+            items: (namespace, key, value, updated_at) tuples.
+            persist (bool): Queue the rows for the next `flush`; False for entries
+                another process wrote (and persists) itself.
+        """
+        items = list(items)
+        if not items:
+            return
+        vectors = self.embedder.embed([memory_text(key, value) for _, key, value, _ in items])
+        self._add_vectors(items, vectors, persist)
+
+    def _add_vectors(self, items, vectors: np.ndarray, persist: bool):
+        with self._lock:
+            for (namespace, key, _, updated_at), vector in zip(items, vectors):
+                doc_id = _doc_id(namespace, key)
+                self._store.remove(doc_id)
+                row = int(self._store.add(doc_id, vector[None, :])[0])
+                self._rows[(namespace, key)] = (row, updated_at)
+                if persist:
+                    self._unsaved.append({"ns": namespace, "key": key, "updated_at": updated_at, "vector": vector})
+
+    def remove(self, namespace: str, key: str):
+        with self._lock:
+            if self._rows.pop((namespace, key), None) is not None:
+                self._store.remove(_doc_id(namespace, key))
+
+    def search(self, query: str, top_k: int = 5,
+               keys: Optional[Iterable[Tuple[str, str]]] = None) -> List[Tuple[float, str, str]]:
+        """
+        Args:
+            query (str): Free-text query.
+            top_k (int): Maximum results.
+            keys (iterable, optional): (namespace, key) pairs to search; None searches everything.
+
+        Returns:
+            list: (score, namespace, key) tuples, best first.
+        """
+        query_vector = self.embedder.embed([query])[0]
+        doc_ids = None if keys is None else [_doc_id(namespace, key) for namespace, key in keys]
+        with self._lock:
+            hits = self._store.search(query_vector, top_k=top_k, doc_ids=doc_ids)
+        return [(score, *doc_id.split("\x1f", 1)) for score, doc_id, _ in hits]
+
+    def load(self, live: Dict[Tuple[str, str], float]) -> List[Tuple[str, str]]:
+        """
+        Replace the index with the persisted rows that match live entries.
+
+        Args:
+            live (dict): (namespace, key) -> updated_at of every live memory entry.
+
+        Returns:
+            list: Live (namespace, key) pairs with no usable stored vector; the caller embeds them.
+        """
+        with self._lock:
+            self._reset()
+            found: Dict[Tuple[str, str], int] = {}
+            matrix = self._read_matrix()
+            if matrix is not None and os.path.exists(self.path + ".jsonl"):
+                with open(self.path + ".jsonl", "rb") as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        try:
+                            label = json.loads(line)
+                        except ValueError:
+                            continue
+                        slot = (label["ns"], label["key"])
+                        if label["row"] < len(matrix) and live.get(slot) == label["updated_at"]:
+                            found[slot] = label["row"]
+            if found:
+                slots = list(found)
+                items = [(namespace, key, None, live[(namespace, key)]) for namespace, key in slots]
+                self._add_vectors(items, np.asarray(matrix[[found[slot] for slot in slots]]), persist=False)
+            return [slot for slot in live if slot not in found]
+
+    def _read_matrix(self) -> Optional[np.ndarray]:
+        if not self.path or not os.path.exists(self.path + ".f32"):
+            return None
+        rows = os.path.getsize(self.path + ".f32") // (4 * self.dim)
+        if not rows:
+            return None
+        return np.memmap(self.path + ".f32", dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def flush(self):
+        """
+        Append unsaved rows to the persisted files. Caller holds the memory file lock,
+        which serialises flushes; the index lock is only held to take the queue.
+        """
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, []
+        if not self.path or not unsaved:
+            return
+        try:
+            with open(self.path + ".f32", "ab") as f:
+                # Label rows by file position, cutting off any torn row an earlier crash left.
+                start = f.seek(0, os.SEEK_END) // (4 * self.dim)
+                f.truncate(start * 4 * self.dim)
+                f.write(np.asarray([item["vector"] for item in unsaved], dtype=np.float32).tobytes())
+            with open(self.path + ".jsonl", "a") as f:
+                f.write("".join(
+                    json.dumps({"row": start + i, "ns": item["ns"], "key": item["key"],
+                                "updated_at": item["updated_at"]}) + "\n"
+                    for i, item in enumerate(unsaved)
+                ))
+        except OSError as e:
+            log(f"Error saving memory vectors: {e}", level="ERROR")
+
+    def rewrite(self):
+        """
+        Keep only the rows of live entries, in memory and on disk. Caller holds the memory
+        file lock; the files are written after the index lock is released.
+        """
+        with self._lock:
+            slots = list(self._rows)
+            vectors = self._store.vectors([self._rows[slot][0] for slot in slots]) if slots \
+                else np.zeros((0, self.dim), dtype=np.float32)
+            items = [(namespace, key, None, self._rows[(namespace, key)][1]) for namespace, key in slots]
+            # Rows added since the last flush are still owed to the files.
+            unsaved = self._unsaved
+            self._reset()
+            self._unsaved = unsaved
+            self._add_vectors(items, vectors, persist=False)
+        if not self.path:
+            return
+        with open(self.path + ".f32.tmp", "wb") as f:
+            f.write(vectors.tobytes())
+        with open(self.path + ".jsonl.tmp", "w") as f:
+            for row, (namespace, key, _, updated_at) in enumerate(items):
+                f.write(json.dumps({"row": row, "ns": namespace, "key": key, "updated_at": updated_at}) + "\n")
+        # Old labels must never meet the new matrix (or vice versa): drop them first, so a
+        # crash in between only costs re-embedding on the next load.
+        if os.path.exists(self.path + ".jsonl"):
+            os.remove(self.path + ".jsonl")
+        os.replace(self.path + ".f32.tmp", self.path + ".f32")
+        os.replace(self.path + ".jsonl.tmp", self.path + ".jsonl")
@@ -0,0 +1,11 @@
+import os
+
+# Runtime data (RAG store, caches, memory log) lives under backend/flask_app/data,
+# whatever directory the app is started from; SAGE_DATA_DIR moves it elsewhere.
+DATA_DIR = os.getenv("SAGE_DATA_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data"
+)
+
+def data_path(*parts: str) -> str:
+    """Absolute path of a file or directory under DATA_DIR."""
+    return os.path.join(DATA_DIR, *parts)
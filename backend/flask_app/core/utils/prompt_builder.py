@@ -0,0 +1,183 @@
+import contextvars
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+from flask_app.core.utils.logger import log
+from flask_app.core.utils.tokenizer import count_tokens, iter_tokens
+
+# Approximate prompt tokens allowed per step; override with PROMPT_BUDGET_<STEP>, e.g. PROMPT_BUDGET_SUMMARY.
+DEFAULT_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+STEP_BUDGETS = {
+    "research": 6000,
+    "summary": 8000,
+    "critique": 4000,
+    "strategy": 4000,
+    "rag": 4000
+}
+TRUNCATION_MARKER = " [...]"
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def step_budget(step: str) -> int:
+    return int(os.getenv(f"PROMPT_BUDGET_{step.upper()}", STEP_BUDGETS.get(step, DEFAULT_BUDGET)))
+
+# Prompt sizes recorded by track_prompts(); None outside a tracking scope.
+_prompt_log: contextvars.ContextVar = contextvars.ContextVar("prompt_log", default=None)
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+@contextmanager
+def track_prompts():
+    """
+    Record every prompt built in this context (and in threads that copy it).
+
+    Yields:
+        list: {"step", "tokens", "original_tokens", "budget"} per built prompt.
+    """
+    prompts: List[Dict[str, Any]] = []
+    token = _prompt_log.set(prompts)
+    try:
+        yield prompts
+    finally:
+        _prompt_log.reset(token)
+
+def get_prompt_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-step prompt counts and sizes since startup."""
+    with _stats_lock:
+        stats = {step: dict(values) for step, values in _stats.items()}
+    for values in stats.values():
+        values["avg_tokens"] = values["tokens"] / values["prompts"] if values["prompts"] else 0.0
+    return stats
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Keep at most `max_tokens` approximate tokens of text (including the cut marker)."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    used, keep = 0, max_tokens - count_tokens(TRUNCATION_MARKER)
+    for start, _, weight in iter_tokens(text):
+        used += weight
+        if used > keep:
+            return text[:start].rstrip() + TRUNCATION_MARKER if start else ""
+    return text
+
+def _dedupe_sentences(text: str, seen: set) -> str:
+    kept = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        normalized = " ".join(sentence.lower().split())
+        if not normalized:
+            continue
+        if normalized in seen and len(normalized) > 20:
+            continue
+        seen.add(normalized)
+        kept.append(sentence.strip())
+    return " ".join(kept) if "\n" not in text else "\n".join(kept)
+
+class PromptBuilder:
+    """
+    Assembles a prompt from parts under a token budget.
+
+    Fixed parts (instructions, the question) are always kept verbatim.
+    Sections (content, context) may be compressed, and ranked parts (search
+    results, retrieved chunks; best first) may lose their lowest-ranked items.
+    When the prompt is over budget, `build` first drops sentences repeated
+    across compressible parts, then the lowest-ranked items (keeping at least
+    one per ranked part), then truncates sections, lowest priority first.
+    Every built prompt's size is logged and recorded for track_prompts().
+    """
+
+    def __init__(self, step: str, budget: Optional[int] = None):
+        """
+        Args:
+            step (str): Step name used for the budget lookup and reporting.
+            budget (int, optional): Token budget; defaults to step_budget(step).
+        """
+        self.step = step
+        self.budget = budget or step_budget(step)
+        self._parts: List[Dict[str, Any]] = []
+
+    def add(self, text: str) -> "PromptBuilder":
+        """Fixed text, never trimmed."""
+        self._parts.append({"kind": "fixed", "text": text})
+        return self
+
+    def add_section(self, text: str, header: str = "", footer: str = "\n", priority: int = 1) -> "PromptBuilder":
+        """Compressible text; lower priority is truncated first. Empty text adds nothing."""
+        if text:
+            self._parts.append({"kind": "section", "text": text, "header": header, "footer": footer,
+                                "priority": priority})
+        return self
+
+    def add_ranked(self, items: Sequence[str], header: str = "", separator: str = "\n", footer: str = "\n",
+                   priority: int = 0) -> "PromptBuilder":
+        """Items ordered best first; the last ones are dropped first. No items adds nothing."""
+        items = [item for item in items if item]
+        if items:
+            self._parts.append({"kind": "ranked", "items": items, "header": header, "separator": separator,
+                                "footer": footer, "priority": priority})
+        return self
+
+    @staticmethod
+    def _render(part: Dict[str, Any]) -> str:
+        if part["kind"] == "fixed":
+            return part["text"]
+        body = part["text"] if part["kind"] == "section" else part["separator"].join(part["items"])
+        return f"{part['header']}{body}{part['footer']}"
+
+    def _tokens(self) -> int:
+        return sum(count_tokens(self._render(part)) for part in self._parts)
+
+    def _compress(self, tokens: int) -> int:
+        # 1. Repeated sentences (e.g. the same fact in research and context).
+        seen: set = set()
+        for part in self._parts:
+            if part["kind"] == "section":
+                part["text"] = _dedupe_sentences(part["text"], seen)
+            elif part["kind"] == "ranked":
+                deduped = [_dedupe_sentences(item, seen) for item in part["items"]]
+                part["items"] = [item for item in deduped if item] or part["items"][:1]
+        tokens = self._tokens()
+
+        # 2. Lowest-ranked items, lowest priority part first.
+        compressible = sorted((p for p in self._parts if p["kind"] != "fixed"), key=lambda p: p["priority"])
+        for part in compressible:
+            while part["kind"] == "ranked" and tokens > self.budget and len(part["items"]) > 1:
+                tokens -= count_tokens(part["items"].pop()) + count_tokens(part["separator"])
+
+        # 3. Truncate sections (and the last surviving ranked items), lowest priority first.
+        for part in compressible:
+            if tokens <= self.budget:
+                break
+            if part["kind"] == "section":
+                size = count_tokens(part["text"])
+                part["text"] = truncate_tokens(part["text"], max(size - (tokens - self.budget), 0))
+            else:
+                size = count_tokens(part["items"][0])
+                part["items"][0] = truncate_tokens(part["items"][0], max(size - (tokens - self.budget), 0))
+            tokens = self._tokens()
+        return tokens
+
+    def build(self) -> str:
+        original = tokens = self._tokens()
+        if tokens > self.budget:
+            tokens = self._compress(tokens)
+        prompt = "".join(self._render(part) for part in self._parts
+                         if part["kind"] == "fixed" or part.get("text") or part.get("items"))
+
+        record = {"step": self.step, "tokens": tokens, "original_tokens": original, "budget": self.budget}
+        prompts = _prompt_log.get()
+        if prompts is not None:
+            prompts.append(record)
+        with _stats_lock:
+            stats = _stats.setdefault(self.step, {"prompts": 0, "tokens": 0, "max_tokens": 0, "compressed": 0})
+            stats["prompts"] += 1
+            stats["tokens"] += tokens
+            stats["max_tokens"] = max(stats["max_tokens"], tokens)
+            stats["compressed"] += tokens < original
+
+        compressed = f", compressed from {original}" if tokens < original else ""
+        log(f"Prompt for {self.step}: {tokens} tokens (budget {self.budget}{compressed})")
+        if tokens > self.budget:
+            log(f"Prompt for {self.step} is still over budget after compression: {tokens} > {self.budget}",
+                level="WARNING")
+        return prompt
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from flask_app.core.utils.logger import log
+
+def cache_key(model_name: str, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """Content address of a model call: SHA-256 over model, prompt and sorted generation config."""
+    payload = json.dumps(
+        {"model": model_name, "prompt": prompt, "config": generation_config or {}},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier cache of model responses: an in-process LRU with TTL, optionally
+    backed by a SQLite file shared across processes and restarts.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 3600, path: Optional[str] = None):
+        """
+        Args:
+            max_entries (int): Capacity of the in-process LRU tier.
+            ttl (float, optional): Seconds an entry stays valid in both tiers; None never expires.
+            path (str, optional): SQLite file for the persistent tier; omitted keeps it memory-only.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_opened = False
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        """SQLite tier, opened on first use so importing a module never touches disk. Caller holds the lock."""
+        if not self._db_opened:
+            self._db_opened = True
+            if self.path:
+                self._open_db(self.path)
+        return self._db
+
+    def _open_db(self, path: str):
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+        except sqlite3.Error as e:
+            log(f"Response cache disk tier disabled ({path}): {e}", level="ERROR")
+            self._db = None
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+
+            db = self._disk()
+            if db is not None:
+                try:
+                    row = db.execute(
+                        "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    log(f"Response cache read failed: {e}", level="ERROR")
+                    row = None
+                if row is not None and not self._expired(row[1]):
+                    # Promote to the memory tier, keeping the original age.
+                    self._put_memory(key, row[1], row[0])
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key: str, response: str):
+        created_at = time.time()
+        with self._lock:
+            self._put_memory(key, created_at, response)
+            self.stats["stores"] += 1
+            db = self._disk()
+            if db is not None:
+                try:
+                    db.execute(
+                        "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                        (key, response, created_at)
+                    )
+                except sqlite3.Error as e:
+                    log(f"Response cache write failed: {e}", level="ERROR")
+
+    def _put_memory(self, key: str, created_at: float, response: str):
+        """Insert into the LRU tier. Caller holds the lock."""
+        self._entries[key] = (created_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            db = self._disk()
+            if db is not None:
+                db.execute("DELETE FROM responses")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
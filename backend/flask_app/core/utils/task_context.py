@@ -0,0 +1,16 @@
+import contextvars
+from contextlib import contextmanager
+from typing import Any
+
+# Task the current code runs for: routes agent memory and tags log records.
+# None outside a task; threads started through contextvars.copy_context() inherit it.
+current_task_id: contextvars.ContextVar = contextvars.ContextVar("current_task_id", default=None)
+
+@contextmanager
+def task_scope(task_id: Any):
+    """Attribute work in this context (and copies of it) to `task_id`."""
+    token = current_task_id.set(task_id)
+    try:
+        yield
+    finally:
+        current_task_id.reset(token)
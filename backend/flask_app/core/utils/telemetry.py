@@ -0,0 +1,238 @@
+import bisect
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "1") == "1"
+# Per-task traces kept for /api/task/<task_id>/trace, oldest dropped first.
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "200"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f"{name}={json.dumps(value)}" for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class MetricsRegistry:
+    """
+    In-process counters and latency histograms, rendered in the Prometheus
+    text exposition format. Collectors registered by other modules (e.g. cache
+    statistics) are read only when metrics are scraped.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]] = []
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        # Bucket counts are stored per bucket and made cumulative when rendered.
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def register_collector(self, collector: Callable[[], Iterable[Tuple[str, str, Dict[str, Any], float]]]):
+        """Add a callable returning (name, "counter" | "gauge", labels, value) samples at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def header(name: str, kind: str):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(state) for key, state in series.items()}
+                          for name, series in self._histograms.items()}
+
+        for name in sorted(counters):
+            header(name, "counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+
+        for name in sorted(histograms):
+            header(name, "histogram")
+            for key, state in sorted(histograms[name].items()):
+                for bound, cumulative in zip(self.buckets, itertools.accumulate(state[:len(self.buckets)])):
+                    lines.append(f"{name}_bucket{_format_labels(key, 'le=%s' % json.dumps(str(bound)))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, 'le=%s' % json.dumps('+Inf'))} {state[-1]}")
+                lines.append(f"{name}_sum{_format_labels(key)} {state[-2]}")
+                lines.append(f"{name}_count{_format_labels(key)} {state[-1]}")
+
+        collected: Dict[Tuple[str, str], List[Tuple[LabelKey, float]]] = {}
+        for collector in self._collectors:
+            try:
+                for name, kind, labels, value in collector():
+                    collected.setdefault((name, kind), []).append((_label_key(labels), value))
+            except Exception:
+                continue  # A failing collector must not break the scrape.
+        for (name, kind), samples in sorted(collected.items()):
+            header(name, kind)
+            for key, value in samples:
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+class Trace:
+    """Spans recorded for one task, in a parent/child tree."""
+
+    def __init__(self, task_id: Any):
+        self.task_id = task_id
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        spans = sorted((dict(span) for span in list(self.spans)), key=lambda span: span["start"])
+        child_seconds: Dict[int, float] = {}
+        for span in spans:
+            if span["parent"] is not None:
+                child_seconds[span["parent"]] = child_seconds.get(span["parent"], 0.0) + span["duration"]
+        for span in spans:
+            # Time not covered by child spans, e.g. LangChain overhead inside a step.
+            span["self_duration"] = round(max(span["duration"] - child_seconds.get(span["id"], 0.0), 0.0), 6)
+        return {
+            "task_id": self.task_id,
+            "started_at": self.started_at,
+            "duration": round((self.finished_at or time.time()) - self.started_at, 6),
+            "spans": spans
+        }
+
+metrics = MetricsRegistry()
+metrics.describe("sage_span_duration_seconds", "Duration of instrumented operations.")
+metrics.describe("sage_span_errors_total", "Instrumented operations that raised.")
+metrics.describe("sage_cache_lookups_total", "Response cache lookups by result.")
+metrics.describe("sage_cache_hit_ratio", "Share of response cache lookups served from memory or disk.")
+metrics.describe("sage_cache_entries", "Entries held in the in-memory response cache.")
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_span_ids = itertools.count(1)
+_traces: "OrderedDict[str, Trace]" = OrderedDict()
+_traces_lock = threading.Lock()
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block: the duration goes into the sage_span_duration_seconds histogram
+    and, inside trace_task(), into the task's trace under the enclosing span.
+
+    Yields:
+        dict: Attributes of the span; values set on it while it runs are recorded too.
+    """
+    if not TELEMETRY_ENABLED:
+        yield attributes
+        return
+    span_id = next(_span_ids)
+    parent = _current_span.get()
+    token = _current_span.set(span_id)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        _current_span.reset(token)
+        metrics.observe("sage_span_duration_seconds", duration, span=name)
+        if error is not None:
+            metrics.inc("sage_span_errors_total", span=name, error=error)
+        trace = _current_trace.get()
+        if trace is not None:
+            record = {"id": span_id, "parent": parent, "name": name,
+                      "start": round(started - trace._origin, 6), "duration": round(duration, 6)}
+            if attributes:
+                record["attributes"] = attributes
+            if error is not None:
+                record["error"] = error
+            trace.spans.append(record)
+
+def traced(name: str):
+    """Decorator form of span()."""
+    def decorator(fn):
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        wrapper.__name__, wrapper.__doc__, wrapper.__wrapped__ = fn.__name__, fn.__doc__, fn
+        return wrapper
+    return decorator
+
+@contextmanager
+def trace_task(task_id: Any):
+    """Collect the spans of this context (and threads copying it) into a trace kept for get_trace()."""
+    trace = Trace(task_id)
+    if TELEMETRY_ENABLED:
+        with _traces_lock:
+            _traces[str(task_id)] = trace
+            _traces.move_to_end(str(task_id))
+            while len(_traces) > TRACE_HISTORY:
+                _traces.popitem(last=False)
+    token = _current_trace.set(trace)
+    try:
+        with span("task"):
+            yield trace
+    finally:
+        trace.finished_at = time.time()
+        _current_trace.reset(token)
+
+def get_trace(task_id: Any) -> Optional[Dict[str, Any]]:
+    """Trace JSON of the latest run of a task, or None if it is unknown or was dropped."""
+    with _traces_lock:
+        trace = _traces.get(str(task_id))
+    return trace.to_dict() if trace is not None else None
+
+def cache_collector(cache: str, get_stats: Callable[[], Dict[str, Any]]):
+    """
+    Collector exposing a ResponseCache's statistics as lookup counters and a hit-ratio gauge.
+
+    Args:
+        cache (str): Value of the "cache" label.
+        get_stats (callable): Returns ResponseCache.get_stats() output.
+    """
+    def collect():
+        stats = get_stats()
+        for result, field in (("hit", "hits"), ("disk_hit", "disk_hits"), ("miss", "misses")):
+            yield "sage_cache_lookups_total", "counter", {"cache": cache, "result": result}, stats[field]
+        yield "sage_cache_hit_ratio", "gauge", {"cache": cache}, stats["hit_ratio"]
+        yield "sage_cache_entries", "gauge", {"cache": cache}, stats["entries"]
+    return collect
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    return metrics.render()
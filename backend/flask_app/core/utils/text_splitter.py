@@ -1,16 +1,140 @@
-def split_text(text: str, max_chunk_size: int = 500) -> list:
-    sentences = text.split('. ')
-    chunks = []
-    current_chunk = ""
-
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) <= max_chunk_size:
-            current_chunk += sentence + '. '
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence + '. '
-
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-
-    return chunks
+import re
+import zlib
+from collections import deque
+from typing import List, NamedTuple
+from flask_app.core.utils.tokenizer import count_tokens, iter_tokens
+
+# A sentence ends after terminal punctuation (plus closing quotes/brackets)
+# followed by whitespace, or at a line break.
+SENTENCE_BOUNDARY = re.compile(r"[.!?][\"')\]]*\s+|\n\s*")
+SIZE_UNITS = ("chars", "tokens")
+
+class Span(NamedTuple):
+    """Half-open [start, end) character range of a chunk in its source text."""
+    start: int
+    end: int
+
+    def text(self, source: str) -> str:
+        return source[self.start:self.end]
+
+def _sentences(text: str):
+    """Yield (start, end) of each sentence, whitespace-trimmed, in one regex pass."""
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        end = match.start() + len(match.group().rstrip())
+        if text[start:end].strip():
+            yield start, end
+        start = match.end()
+    if start < len(text) and text[start:].strip():
+        yield start, len(text.rstrip())
+
+def _measure(text: str, start: int, end: int, unit: str) -> int:
+    return end - start if unit == "chars" else count_tokens(text, start, end)
+
+def _hard_split(text: str, start: int, end: int, max_size: int, unit: str):
+    """Cut one oversized sentence into pieces no larger than max_size."""
+    if unit == "tokens":
+        piece_start, size = start, 0
+        for token_start, token_end, weight in iter_tokens(text, start, end):
+            if size + weight > max_size and token_start > piece_start:
+                yield piece_start, token_start, size
+                piece_start, size = token_start, 0
+            size += weight
+        if text[piece_start:end].strip():
+            yield piece_start, end, size
+        return
+
+    while end - start > max_size:
+        # Prefer the last whitespace before the cap; fall back to a hard cut.
+        cut = text.rfind(" ", start + 1, start + max_size + 1)
+        cut = cut if cut > start else start + max_size
+        yield start, cut, cut - start
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    if start < end:
+        yield start, end, end - start
+
+def _is_anchor(text: str, start: int, end: int, size: int, target: int) -> bool:
+    """
+    Whether a sentence closes a content-anchored chunk: true for a pseudo-random
+    share size/target of sentences, decided by the sentence's own text only.
+    """
+    digest = zlib.crc32(text[start:end].encode("utf-8"))
+    return digest * target < size * 0xFFFFFFFF
+
+def split_spans(text: str, max_chunk_size: int = 500, overlap: int = 0, unit: str = "chars",
+                anchored: bool = False) -> List[Span]:
+    """
+    Split text into chunk spans in a single pass over its sentences.
+
+    Args:
+        text (str): Source text; it is never copied, chunks are offsets into it.
+        max_chunk_size (int): Hard cap per chunk, in `unit`. Sentences longer
+            than the cap (tables, text without punctuation) are cut at
+            whitespace or token boundaries.
+        overlap (int): Approximate size, in `unit`, of trailing sentences
+            repeated at the start of the next chunk.
+        unit (str): "chars" or "tokens" (approximate model tokens).
+        anchored (bool): End chunks after sentences chosen by their content
+            (about every max_chunk_size / 2) instead of packing greedily, so
+            an edit only moves the boundaries of the chunks around it and
+            the rest of a re-ingested document splits exactly as before.
+
+    Returns:
+        list: Span(start, end) per chunk, in order.
+    """
+    if unit not in SIZE_UNITS:
+        raise ValueError(f"Unknown size unit: {unit}")
+    if not 0 <= overlap < max_chunk_size:
+        raise ValueError("overlap must be non-negative and smaller than max_chunk_size")
+    target = max(max_chunk_size // 2, 1)
+    min_size = max_chunk_size // 4
+
+    spans: List[Span] = []
+    window = deque()  # (start, end, size) pieces of the chunk being built
+    tokens = 0  # sum of piece sizes in the window, for unit="tokens"
+    emitted_end = -1
+
+    def _size(extra=None) -> int:
+        # Char size is the covered range, so separators between sentences count.
+        last_end = extra[1] if extra else window[-1][1]
+        if unit == "chars":
+            return last_end - window[0][0]
+        return tokens + (extra[2] if extra else 0)
+
+    def _pop():
+        nonlocal tokens
+        tokens -= window.popleft()[2]
+
+    def _emit():
+        nonlocal emitted_end
+        spans.append(Span(window[0][0], window[-1][1]))
+        emitted_end = window[-1][1]
+        # Keep trailing pieces that fit in the overlap to seed the next chunk.
+        while window and _size() > overlap:
+            _pop()
+
+    for start, end in _sentences(text):
+        size = _measure(text, start, end, unit)
+        pieces = _hard_split(text, start, end, max_chunk_size, unit) if size > max_chunk_size \
+            else ((start, end, size),)
+        for piece in pieces:
+            while window and _size(piece) > max_chunk_size:
+                if window[-1][1] != emitted_end:
+                    _emit()
+                else:
+                    # Only overlap is left and it does not fit with this piece: drop it.
+                    _pop()
+            window.append(piece)
+            tokens += piece[2]
+            if anchored and _size() >= min_size and _is_anchor(text, piece[0], piece[1], piece[2], target):
+                _emit()
+
+    if window and window[-1][1] != emitted_end:
+        spans.append(Span(window[0][0], window[-1][1]))
+    return spans
+
+def split_text(text: str, max_chunk_size: int = 500, overlap: int = 0, unit: str = "chars",
+               anchored: bool = False) -> List[str]:
+    return [span.text(text) for span in split_spans(text, max_chunk_size, overlap, unit, anchored)]
@@ -0,0 +1,23 @@
+import re
+from typing import Iterator, Optional, Tuple
+
+# Words and individual punctuation marks; long words count as several
+# sub-word tokens, which tracks BPE-style tokenizers closely enough for budgets.
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+CHARS_PER_SUBWORD = 6
+
+
+def _token_weight(length: int) -> int:
+    return 1 + length // CHARS_PER_SUBWORD
+
+
+def iter_tokens(text: str, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, int, int]]:
+    """Yield (start, end, token_count) for each word/punctuation match in text[start:end] without slicing."""
+    end = len(text) if end is None else end
+    for match in TOKEN_PATTERN.finditer(text, start, end):
+        yield match.start(), match.end(), _token_weight(match.end() - match.start())
+
+
+def count_tokens(text: str, start: int = 0, end: Optional[int] = None) -> int:
+    """Approximate model token count of text[start:end]."""
+    return sum(weight for _, _, weight in iter_tokens(text, start, end))
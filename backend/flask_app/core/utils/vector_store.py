@@ -0,0 +1,166 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class VectorStore:
+    """
+    Contiguous float32 matrix of unit-length chunk embeddings for all documents.
+
+    Rows are appended per document and tagged with the owning document and the
+    chunk's position inside it, so a query is a single matrix-vector product
+    over either the whole matrix or one document's rows.
+
+    With a `path` the matrix lives in an append-only file that is opened as a
+    read-only np.memmap, so several processes share its pages via the OS cache.
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 1024, path: Optional[str] = None):
+        self.dim = dim
+        self.path = path
+        self._size = 0
+        self._matrix = np.zeros((0 if path else initial_capacity, dim), dtype=np.float32)
+        self._row_owner = np.full(initial_capacity, -1, dtype=np.int32)
+        self._row_position = np.zeros(initial_capacity, dtype=np.int32)
+        self._doc_ids: List[str] = []
+        self._doc_ordinals: Dict[str, int] = {}
+        self._doc_rows: Dict[str, List[int]] = {}
+        self._lock = threading.RLock()
+        self.reload()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_rows
+
+    def reload(self):
+        """Re-map the backing file to pick up rows appended since it was opened."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        rows = os.path.getsize(self.path) // (4 * self.dim)
+        if rows != self._size:
+            self._matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(rows, self.dim)) \
+                if rows else np.zeros((0, self.dim), dtype=np.float32)
+            self._size = rows
+            self._reserve(rows)
+
+    def _reserve(self, needed: int):
+        capacity = len(self._row_owner)
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            self._row_owner = np.concatenate([self._row_owner, np.full(capacity - len(self._row_owner), -1, dtype=np.int32)])
+            self._row_position = np.resize(self._row_position, capacity)
+        if not self.path and needed > len(self._matrix):
+            self._matrix = np.resize(self._matrix, (capacity, self.dim))
+
+    def register(self, doc_id: str, row_ids: Iterable[int]):
+        """Attach existing matrix rows to a document as its next chunk positions."""
+        row_ids = list(row_ids)
+        with self._lock:
+            if doc_id not in self._doc_ordinals:
+                self._doc_ordinals[doc_id] = len(self._doc_ids)
+                self._doc_ids.append(doc_id)
+            doc_rows = self._doc_rows.setdefault(doc_id, [])
+            if row_ids:
+                self._reserve(max(row_ids) + 1)
+                self._row_owner[row_ids] = self._doc_ordinals[doc_id]
+                self._row_position[row_ids] = np.arange(len(doc_rows), len(doc_rows) + len(row_ids))
+            doc_rows.extend(row_ids)
+
+    def append(self, vectors: np.ndarray) -> np.ndarray:
+        """Append rows without assigning them to a document; returns their row ids."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            if self.path:
+                start = os.path.getsize(self.path) // (4 * self.dim) if os.path.exists(self.path) else 0
+                with open(self.path, "ab") as f:
+                    f.write(vectors.tobytes())
+                self.reload()
+            else:
+                start = self._size
+                self._reserve(start + len(vectors))
+                self._matrix[start:start + len(vectors)] = vectors
+                self._size = start + len(vectors)
+        return np.arange(start, start + len(vectors))
+
+    def add(self, doc_id: str, vectors: np.ndarray) -> np.ndarray:
+        """Append a document's chunk vectors; returns the row ids assigned to them."""
+        with self._lock:
+            row_ids = self.append(vectors)
+            self.register(doc_id, row_ids.tolist())
+        return row_ids
+
+    def replace(self, doc_id: str, row_ids: Iterable[int]):
+        """Swap a document's rows for `row_ids` in one step, so searches see either version but never neither."""
+        with self._lock:
+            self.remove(doc_id)
+            self.register(doc_id, row_ids)
+
+    def rows(self, doc_id: str) -> List[int]:
+        """Row ids of a document, in chunk order."""
+        return list(self._doc_rows.get(doc_id, ()))
+
+    def vectors(self, row_ids: Iterable[int]) -> np.ndarray:
+        """Copy of the given rows; rows of removed documents remain readable."""
+        return np.array(self._matrix[list(row_ids)], dtype=np.float32)
+
+    def remove(self, doc_id: str):
+        """Forget a document; its rows stay in the matrix but are never returned."""
+        with self._lock:
+            rows = self._doc_rows.pop(doc_id, None)
+            if rows:
+                self._row_owner[rows] = -1
+
+    def _select(self, doc_ids: Optional[Iterable[str]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Return (matrix view, row ids) for the requested documents; row ids None means all rows."""
+        if doc_ids is None:
+            return self._matrix[:self._size], None
+
+        rows: List[int] = []
+        for doc_id in doc_ids:
+            rows.extend(self._doc_rows.get(doc_id, ()))
+        if rows:
+            low, high = min(rows), max(rows)
+            if high - low + 1 == len(rows):
+                # Rows fill one contiguous block (the common case): slice instead of gathering a copy.
+                return self._matrix[low:high + 1], np.arange(low, high + 1)
+        row_ids = np.asarray(rows, dtype=np.int64)
+        return self._matrix[row_ids], row_ids
+
+    def search(self, query_vector: np.ndarray, top_k: int = 5,
+               doc_ids: Optional[Iterable[str]] = None) -> List[Tuple[float, str, int]]:
+        """
+        Cosine similarity search (rows and query are unit length).
+
+        Returns:
+            list: (score, doc_id, chunk_position) tuples, best first.
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32).reshape(self.dim)
+        matrix, row_ids = self._select(doc_ids)
+        if top_k <= 0 or not len(matrix):
+            return []
+
+        scores = matrix @ query_vector
+        if row_ids is None:
+            row_ids = np.arange(len(matrix))
+        # Rows of removed documents are masked out of the candidate set.
+        live = self._row_owner[row_ids] >= 0
+        if not live.all():
+            scores, row_ids = scores[live], row_ids[live]
+            if not len(scores):
+                return []
+
+        k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        return [
+            (float(scores[i]),
+             self._doc_ids[self._row_owner[row_ids[i]]],
+             int(self._row_position[row_ids[i]]))
+            for i in candidates
+        ]
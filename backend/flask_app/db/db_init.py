@@ -1,6 +1,36 @@
+from sqlalchemy import inspect, text
 from db.models import db
+from flask_app.core.utils.logger import log_info
+
+def upgrade_schema():
+    """
+    Bring tables created by an older version up to the models: create_all only
+    creates missing tables, so columns and indexes added to existing tables
+    (e.g. UploadedFile.doc_id/content_hash/status) are added here. New columns
+    are nullable; rows stored before the upgrade read them as NULL.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        with engine.begin() as connection:
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                log_info(f"Schema upgrade: added column {table.name}.{column.name}")
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(bind=connection)
+                    log_info(f"Schema upgrade: added index {index.name}")
 
 def init_db(app):
     db.init_app(app)
     with app.app_context():
         db.create_all()
+        upgrade_schema()
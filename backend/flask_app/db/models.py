@@ -18,3 +18,32 @@ class UploadedFile(db.Model):
     filename = db.Column(db.String(255))
     filepath = db.Column(db.String(255))
     uploaded_at = db.Column(db.DateTime)
+    doc_id = db.Column(db.String(64), index=True)
+    content_hash = db.Column(db.String(64), index=True)
+    status = db.Column(db.String(20), default="queued")
+    processed_at = db.Column(db.DateTime)
+    error = db.Column(db.Text)
+
+class Plan(db.Model):
+    task_id = db.Column(db.String(64), primary_key=True)
+    goal = db.Column(db.Text)
+    status = db.Column(db.String(50), index=True)
+    deadline = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    # Maintained incrementally on every checkpoint change so progress checks never recount.
+    total_checkpoints = db.Column(db.Integer, default=0, nullable=False)
+    completed_checkpoints = db.Column(db.Integer, default=0, nullable=False)
+
+class Checkpoint(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('task_id', 'checkpoint_id', name='uq_checkpoint_task_checkpoint'),
+        db.Index('ix_checkpoint_task_completed', 'task_id', 'completed'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.String(64), db.ForeignKey('plan.task_id'), nullable=False)
+    checkpoint_id = db.Column(db.String(64), nullable=False)
+    description = db.Column(db.Text)
+    position = db.Column(db.Integer)
+    completed = db.Column(db.Boolean, default=False, nullable=False)
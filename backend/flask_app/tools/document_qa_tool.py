@@ -1,15 +1,18 @@
+from typing import Optional
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-from flask_app.core.services.rag_service import query_document_with_rag
+from flask_app.core.services.rag_service import query_document_with_rag, query_documents_with_rag
 
 class DocumentQAInput(BaseModel):
     query: str = Field(..., description="Question about the document")
-    document_id: str = Field(..., description="ID of the uploaded document")
+    document_id: Optional[str] = Field(None, description="ID of the uploaded document; omit to search all documents")
 
 class DocumentQATool(BaseTool):
     name = "DocumentQA"
     description = "Answers questions about uploaded documents using RAG"
     args_schema = DocumentQAInput
 
-    def _run(self, query: str, document_id: str) -> str:
-        return query_document_with_rag(document_id, query)
\ No newline at end of file
+    def _run(self, query: str, document_id: Optional[str] = None) -> str:
+        if document_id:
+            return query_document_with_rag(document_id, query)
+        return query_documents_with_rag(query)
\ No newline at end of file
@@ -1,32 +1,427 @@
+import asyncio
+import contextvars
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from flask_app.core.utils.logger import log
+from flask_app.core.utils.rate_limit import TokenBucket, backoff_delay
+from flask_app.core.utils.response_cache import ResponseCache, cache_key
+from flask_app.core.utils.telemetry import cache_collector, metrics, span
+from flask_app.core.utils.tokenizer import count_tokens
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Configure Gemini with your API key
 api_key = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=api_key)
+# Point at another server (e.g. "http://127.0.0.1:8089" for a local fake) over REST.
+api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+if api_endpoint:
+    genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": api_endpoint})
+else:
+    genai.configure(api_key=api_key)
 
-model = genai.GenerativeModel("models/gemini-2.0-flash")
+MODEL_NAME = "models/gemini-2.0-flash"
+model = genai.GenerativeModel(MODEL_NAME)
+
+# Deterministic mode pins temperature to 0 so identical prompts can be served from cache.
+DETERMINISTIC = os.getenv("GEMINI_DETERMINISTIC", "0") == "1"
 
 generation_config = {
-    "temperature": 1,
+    "temperature": 0 if DETERMINISTIC else 1,
     "top_p": 0.95,
     "top_k": 40,
     "max_output_tokens": 8192
 }
 
-def generate_response(prompt: str) -> str:
+FALLBACK_RESPONSE = "Sorry, failed to generate a response."
+
+# Transient failures worth retrying; anything else (bad request, auth) fails immediately.
+RETRYABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    ConnectionError,
+    TimeoutError
+)
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("GEMINI_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("GEMINI_CACHE_TTL", "3600")),
+    path=os.getenv("GEMINI_CACHE_PATH") or None
+)
+metrics.register_collector(cache_collector("gemini", response_cache.get_stats))
+metrics.describe("sage_model_calls_total", "Model calls, sent to Gemini or served from the response cache.")
+metrics.describe("sage_model_tokens_total", "Approximate tokens sent to and received from Gemini.")
+
+# Per-task model call counter, set by count_model_calls(); None outside a counting scope.
+_model_calls: contextvars.ContextVar = contextvars.ContextVar("model_calls", default=None)
+_model_calls_lock = threading.Lock()
+# Per-step failure counter, set by track_model_failures().
+_model_failures: contextvars.ContextVar = contextvars.ContextVar("model_failures", default=None)
+
+@contextmanager
+def count_model_calls():
     """
-    Send a prompt to Gemini and return the raw text response.
+    Count model calls made in this context (and in threads that copy it) until exit.
+
+    Yields:
+        dict: {"calls": model requests actually sent, "cache_hits": calls served from cache}.
     """
+    counter = {"calls": 0, "cache_hits": 0}
+    token = _model_calls.set(counter)
     try:
-        chat = model.start_chat(history=[])
-        response = chat.send_message(prompt, generation_config=generation_config)
-        return response.text
+        yield counter
+    finally:
+        _model_calls.reset(token)
+
+@contextmanager
+def track_model_failures():
+    """
+    Count model calls in this context that failed after all retries and fell back to
+    FALLBACK_RESPONSE (generate_response and generate_many return it instead of raising).
+
+    Yields:
+        dict: {"failures": int}.
+    """
+    counter = {"failures": 0}
+    token = _model_failures.set(counter)
+    try:
+        yield counter
+    finally:
+        _model_failures.reset(token)
+
+def record_model_failure():
+    counter = _model_failures.get()
+    if counter is not None:
+        with _model_calls_lock:
+            counter["failures"] += 1
+
+def record_model_call(cache_hit: bool = False, counter: Optional[Dict[str, int]] = None):
+    """Count one call in the metrics and in `counter`, or in the current context's counter if there is one."""
+    metrics.inc("sage_model_calls_total", result="cache_hit" if cache_hit else "sent")
+    counter = counter if counter is not None else _model_calls.get()
+    if counter is not None:
+        with _model_calls_lock:
+            counter["cache_hits" if cache_hit else "calls"] += 1
+
+class GeminiError(Exception):
+    """A model call failed after all retries (or with a non-retryable error)."""
+
+_STREAM_END = object()
+
+def _request(prompt: str, config: Dict[str, Any], timeout: float,
+             on_chunk: Optional[Callable[[str], None]] = None,
+             cancelled: Optional[threading.Event] = None) -> str:
+    """Blocking SDK call; with `on_chunk`, streams and forwards each text chunk as it arrives."""
+    request_options = {"timeout": timeout}
+    if on_chunk is None:
+        # One stateless generate_content call per prompt; no chat session is needed.
+        return model.generate_content(prompt, generation_config=config, request_options=request_options).text
+
+    parts = []
+    for chunk in model.generate_content(prompt, generation_config=config, request_options=request_options, stream=True):
+        if cancelled is not None and cancelled.is_set():
+            break
+        # The final chunk may carry only a finish reason and no text.
+        text = chunk.text if chunk.parts else ""
+        if text:
+            parts.append(text)
+            on_chunk(text)
+    return "".join(parts)
+
+def record_tokens(prompt: str, response: str):
+    """Add the approximate prompt and response token counts of a sent call to the metrics."""
+    metrics.inc("sage_model_tokens_total", count_tokens(prompt), direction="prompt")
+    metrics.inc("sage_model_tokens_total", count_tokens(response), direction="response")
+
+def _should_cache(config: Dict[str, Any], use_cache: Optional[bool]) -> bool:
+    # Sampled output is only cached on request; temperature-0 output is cached by default.
+    if use_cache is not None:
+        return use_cache
+    return config.get("temperature", 1) == 0
+
+class AsyncGeminiClient:
+    """
+    Asyncio client for Gemini with a concurrency cap, token-bucket rate
+    limiting, a per-request timeout and jittered exponential backoff.
+
+    All calls run on one event loop owned by the client (started lazily in a
+    daemon thread), so the limits are shared by every caller in the process:
+    coroutines awaited from other loops and the blocking `generate_sync` used
+    by the agents.
+    """
+
+    def __init__(self, max_concurrency: int = 8, requests_per_second: float = 5.0, burst: Optional[float] = None,
+                 max_retries: int = 4, timeout: float = 60.0, backoff_base: float = 0.5, backoff_cap: float = 20.0):
+        """
+        Args:
+            max_concurrency (int): Requests in flight at once.
+            requests_per_second (float): Sustained request rate; 0 disables rate limiting.
+            burst (float, optional): Bucket capacity; defaults to one second of requests.
+            max_retries (int): Retries after the first attempt for retryable errors.
+            timeout (float): Per-attempt request timeout in seconds.
+            backoff_base (float): First backoff ceiling in seconds, doubled per retry.
+            backoff_cap (float): Upper bound on a single backoff.
+        """
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket: Optional[TokenBucket] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    # Limits are created on the loop that will use them.
+                    self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                    if self.requests_per_second > 0:
+                        self._bucket = TokenBucket(self.requests_per_second, self.burst)
+                    ready.set()
+                    loop.run_forever()
+
+                threading.Thread(target=_run, name="gemini-client", daemon=True).start()
+                ready.wait()
+                self._loop = loop
+        return self._loop
+
+    async def _call(self, prompt: str, config: Dict[str, Any],
+                    on_chunk: Optional[Callable[[str], None]] = None,
+                    cancelled: Optional[threading.Event] = None) -> str:
+        emitted = []
+
+        def _forward(text: str):
+            emitted.append(True)
+            on_chunk(text)
+
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                if self._bucket is not None:
+                    await self._bucket.acquire()
+                self.stats["requests"] += 1
+                try:
+                    return await asyncio.to_thread(
+                        _request, prompt, config, self.timeout, _forward if on_chunk else None, cancelled
+                    )
+                except RETRYABLE_ERRORS as e:
+                    error = e
+                    if emitted:
+                        # Part of a stream already reached the caller; a retry would repeat it.
+                        self.stats["failures"] += 1
+                        raise GeminiError(f"Gemini stream interrupted: {e}") from e
+                except Exception as e:
+                    self.stats["failures"] += 1
+                    raise GeminiError(f"Gemini request failed: {e}") from e
+
+            if attempt == self.max_retries:
+                break
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            self.stats["retries"] += 1
+            log(f"Gemini retryable error ({error}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s",
+                level="WARNING")
+            # Sleep outside the semaphore so other prompts can use the slot meanwhile.
+            await asyncio.sleep(delay)
+
+        self.stats["failures"] += 1
+        raise GeminiError(f"Gemini request failed after {self.max_retries + 1} attempts: {error}") from error
+
+    async def _generate(self, prompt: str, config: Optional[Dict[str, Any]], use_cache: Optional[bool],
+                        counter: Optional[Dict[str, int]] = None) -> str:
+        config = {**generation_config, **(config or {})}
+        cached = _should_cache(config, use_cache)
+        key = cache_key(MODEL_NAME, prompt, config) if cached else None
+        if cached:
+            response = response_cache.get(key)
+            if response is not None:
+                record_model_call(cache_hit=True, counter=counter)
+                return response
+
+        record_model_call(counter=counter)
+        text = await self._call(prompt, config)
+        record_tokens(prompt, text)
+        if cached:
+            response_cache.set(key, text)
+        return text
+
+    async def generate(self, prompt: str, config: Optional[Dict[str, Any]] = None,
+                       use_cache: Optional[bool] = None) -> str:
+        """
+        Generate a response for one prompt.
+
+        Raises:
+            GeminiError: The call failed with a non-retryable error or ran out of retries.
+        """
+        loop = self._ensure_loop()
+        # The counter is read here because the client loop does not share the caller's context.
+        coroutine = self._generate(prompt, config, use_cache, _model_calls.get())
+        if asyncio.get_running_loop() is loop:
+            return await coroutine
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+    async def generate_many(self, prompts: Sequence[str], config: Optional[Dict[str, Any]] = None,
+                            use_cache: Optional[bool] = None, return_exceptions: bool = False) -> List[Any]:
+        """
+        Generate responses for many prompts concurrently, within the client's limits.
+
+        Returns:
+            list: Responses in prompt order; with `return_exceptions`, failed prompts
+                hold their GeminiError instead of aborting the batch.
+        """
+        return await asyncio.gather(
+            *(self.generate(prompt, config, use_cache) for prompt in prompts),
+            return_exceptions=return_exceptions
+        )
+
+    async def _generate_many(self, prompts: Sequence[str], config: Optional[Dict[str, Any]],
+                             use_cache: Optional[bool], return_exceptions: bool,
+                             counter: Optional[Dict[str, int]]) -> List[Any]:
+        return await asyncio.gather(
+            *(self._generate(prompt, config, use_cache, counter) for prompt in prompts),
+            return_exceptions=return_exceptions
+        )
+
+    def generate_sync(self, prompt: str, config: Optional[Dict[str, Any]] = None,
+                      use_cache: Optional[bool] = None) -> str:
+        """Blocking wrapper for threads without an event loop (agents, Flask handlers)."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self._generate(prompt, config, use_cache, _model_calls.get()), loop
+        ).result()
+
+    def generate_many_sync(self, prompts: Sequence[str], config: Optional[Dict[str, Any]] = None,
+                           use_cache: Optional[bool] = None, return_exceptions: bool = False) -> List[Any]:
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self._generate_many(prompts, config, use_cache, return_exceptions, _model_calls.get()), loop
+        ).result()
+
+    def stream_sync(self, prompt: str, config: Optional[Dict[str, Any]] = None,
+                    use_cache: Optional[bool] = None) -> Iterator[str]:
+        """
+        Blocking generator of response text chunks, under the same limits and retries
+        (a stream is only retried before its first chunk). Closing the generator early
+        stops reading the response.
+
+        Raises:
+            GeminiError: The call failed; chunks already yielded are not retracted.
+        """
+        config = {**generation_config, **(config or {})}
+        cached = _should_cache(config, use_cache)
+        key = cache_key(MODEL_NAME, prompt, config) if cached else None
+        if cached:
+            response = response_cache.get(key)
+            if response is not None:
+                record_model_call(cache_hit=True)
+                yield response
+                return
+
+        record_model_call()
+        loop = self._ensure_loop()
+        chunks: "queue.Queue[Any]" = queue.Queue()
+        cancelled = threading.Event()
+        future = asyncio.run_coroutine_threadsafe(self._call(prompt, config, chunks.put, cancelled), loop)
+        future.add_done_callback(lambda _: chunks.put(_STREAM_END))
+        parts = []
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _STREAM_END:
+                    break
+                parts.append(chunk)
+                yield chunk
+        finally:
+            cancelled.set()
+        text = future.result()
+        record_tokens(prompt, text)
+        if cached:
+            response_cache.set(key, text)
+
+gemini_client = AsyncGeminiClient(
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+    requests_per_second=float(os.getenv("GEMINI_RATE_LIMIT", "5")),
+    max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "4")),
+    timeout=float(os.getenv("GEMINI_TIMEOUT", "60"))
+)
+
+def generate_response(prompt: str, config: Optional[Dict[str, Any]] = None,
+                      use_cache: Optional[bool] = None,
+                      on_token: Optional[Callable[[str], None]] = None) -> str:
+    """
+    Send a prompt to Gemini and return the raw text response.
+
+    Args:
+        prompt (str): Prompt text.
+        config (dict, optional): Overrides merged over the module generation_config.
+        use_cache (bool, optional): Force the response cache on or off for this call;
+            by default only deterministic (temperature 0) calls are cached.
+        on_token (callable, optional): Stream the response, calling this with each
+            text chunk as it arrives; the full text is still returned.
+    """
+    with span("gemini.generate_response", streamed=on_token is not None) as attributes:
+        try:
+            if on_token is None:
+                return gemini_client.generate_sync(prompt, config=config, use_cache=use_cache)
+            parts = []
+            for chunk in gemini_client.stream_sync(prompt, config=config, use_cache=use_cache):
+                parts.append(chunk)
+                on_token(chunk)
+            return "".join(parts)
+        except GeminiError as e:
+            log(f"Gemini error: {e}", level="ERROR")
+            attributes["error"] = type(e).__name__
+            record_model_failure()
+            return FALLBACK_RESPONSE
+
+def generate_response_stream(prompt: str, config: Optional[Dict[str, Any]] = None,
+                             use_cache: Optional[bool] = None) -> Iterator[str]:
+    """
+    Yield the response text in chunks as Gemini produces them.
+
+    Raises:
+        GeminiError: The call failed (possibly after some chunks were yielded).
+    """
+    return gemini_client.stream_sync(prompt, config=config, use_cache=use_cache)
+
+def generate_gemini_response(prompt: str, config: Optional[Dict[str, Any]] = None,
+                             use_cache: Optional[bool] = None) -> str:
+    """Alias used by the RAG service; shares the cache with generate_response."""
+    return generate_response(prompt, config=config, use_cache=use_cache)
+
+async def generate_response_async(prompt: str, config: Optional[Dict[str, Any]] = None,
+                                  use_cache: Optional[bool] = None) -> str:
+    return await gemini_client.generate(prompt, config=config, use_cache=use_cache)
+
+def generate_many(prompts: Sequence[str], config: Optional[Dict[str, Any]] = None,
+                  use_cache: Optional[bool] = None) -> List[str]:
+    """Blocking batch API; failed prompts get the fallback text like generate_response."""
+    with span("gemini.generate_many", prompts=len(prompts)):
+        results = gemini_client.generate_many_sync(prompts, config=config, use_cache=use_cache,
+                                                   return_exceptions=True)
+    for i, result in enumerate(results):
+        if isinstance(result, BaseException):
+            log(f"Gemini error for prompt {i}: {result}", level="ERROR")
+            record_model_failure()
+            results[i] = FALLBACK_RESPONSE
+    return results
 
-    except Exception as e:
-        log(f"Gemini error: {e}", level="ERROR")
-        return "Sorry, failed to generate a response."
+def get_cache_stats() -> Dict[str, Any]:
+    return response_cache.get_stats()
@@ -1,19 +1,53 @@
+import json
+from typing import List, Optional
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-from flask_app.core.utils.memory import get_memory, set_memory
+from flask_app.core.utils.memory import GLOBAL_NAMESPACE, get_memory_manager
 
 class MemoryInput(BaseModel):
-    key: str = Field(..., description="Memory key to access")
-    value: str = Field(None, description="Value to store (for write operations)")
-    operation: str = Field("get", description="Operation: 'get' or 'set'")
+    key: str = Field(None, description="Memory key to access (or key prefix for 'query', free text for 'search')")
+    value: str = Field(None, description="Value to store (for 'set'); a JSON object of key/value pairs for 'set_many'")
+    operation: str = Field("get", description="Operation: 'get', 'set', 'delete', 'get_many', 'set_many', 'query' or 'search'")
+    namespace: str = Field(None, description="'global' (default), 'user:<id>' or 'task:<id>'; 'search' spans all if omitted")
+    keys: List[str] = Field(None, description="Keys to read (for 'get_many')")
+    ttl: float = Field(None, description="Seconds until stored values expire")
+    since: float = Field(None, description="Only entries updated at or after this epoch time (for 'query')")
+    until: float = Field(None, description="Only entries updated before this epoch time (for 'query')")
+    limit: int = Field(None, description="Maximum entries returned (for 'query' and 'search')")
 
 class MemoryTool(BaseTool):
     name = "Memory"
-    description = "Stores and retrieves task context from memory"
+    description = (
+        "Stores and retrieves task context from memory. Keys live in a namespace ('global', 'user:<id>' "
+        "or 'task:<id>'); supports get, set, delete, get_many, set_many, query by key prefix or time range, "
+        "and search, which finds stored research by meaning - try it before researching a topic again"
+    )
     args_schema = MemoryInput
 
-    def _run(self, key: str, value: str = None, operation: str = "get") -> str:
-        if operation == "set":
-            set_memory(key, value)
-            return f"Value stored for key: {key}"
-        return str(get_memory(key))
\ No newline at end of file
+    def _run(self, key: str = None, value: str = None, operation: str = "get", namespace: str = None,
+             keys: Optional[List[str]] = None, ttl: float = None, since: float = None, until: float = None,
+             limit: int = None) -> str:
+        memory = get_memory_manager()
+        try:
+            if operation == "search":
+                return json.dumps(memory.recall(key or "", top_k=limit or 5, namespace=namespace), default=str)
+            namespace = namespace or GLOBAL_NAMESPACE
+            if operation == "set":
+                memory.set(key, value, namespace=namespace, ttl=ttl)
+                return f"Value stored for key: {key}"
+            if operation == "delete":
+                memory.delete(key, namespace=namespace)
+                return f"Deleted key: {key}"
+            if operation == "get_many":
+                return json.dumps(memory.get_many(keys or [], namespace=namespace), default=str)
+            if operation == "set_many":
+                items = json.loads(value or "{}")
+                memory.set_many(items, namespace=namespace, ttl=ttl)
+                return f"Stored {len(items)} values in {namespace}"
+            if operation == "query":
+                return json.dumps(
+                    memory.query(namespace, prefix=key, since=since, until=until, limit=limit), default=str
+                )
+            return str(memory.get(key, namespace=namespace))
+        except ValueError as e:
+            return f"Memory error: {e}"
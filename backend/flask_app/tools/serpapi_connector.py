@@ -1,34 +1,233 @@
+import contextvars
+import json
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 from flask_app.core.utils.logger import log
+from flask_app.core.utils.paths import data_path
+from flask_app.core.utils.response_cache import ResponseCache, cache_key
+from flask_app.core.utils.telemetry import cache_collector, metrics, span
 
 load_dotenv()
 
 SERP_API_KEY = os.getenv("SERP_API_KEY")
-SERP_URL = "https://serpapi.com/search"
+# Point at another server (e.g. "http://127.0.0.1:8090/search" for a local stub).
+SERP_URL = os.getenv("SERP_API_URL", "https://serpapi.com/search")
+SERP_TIMEOUT = float(os.getenv("SERP_TIMEOUT", "10"))
+SERP_CONNECT_TIMEOUT = 3.05
+SERP_MAX_RETRIES = int(os.getenv("SERP_MAX_RETRIES", "3"))
+SERP_MAX_CONCURRENCY = int(os.getenv("SERP_MAX_CONCURRENCY", "8"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Fields kept from each organic result; the rest of a SerpAPI response is never used.
+RESULT_FIELDS = ("title", "link", "snippet")
 
-def search_google(query: str, num_results: int = 5) -> list:
+class SerpError(Exception):
+    """A search that failed after retries, or was rejected by the API."""
+
+def normalize_query(query: str) -> str:
+    """Queries differing only in case or whitespace share one cache entry and one request."""
+    return " ".join(query.split()).lower()
+
+class SerpClient:
     """
-    Fetches search results from SerpAPI (Google Search).
+    SerpAPI client shared by SerpTool and ResearchAgent.
+
+    Requests go through one keep-alive `requests.Session` whose connection
+    pool is sized for `max_concurrency`, with connect/read timeouts and
+    urllib3 retries (exponential backoff, Retry-After honoured) on 429/5xx and
+    connection errors. Results are cached by normalized query in a
+    ResponseCache (LRU + optional SQLite, with TTL), and identical queries
+    already in flight wait for that request instead of sending their own.
     """
-    try:
-        params = {
-            "q": query,
-            "api_key": SERP_API_KEY,
-            "num": num_results,
-            "engine": "google"
+
+    def __init__(self, api_key: Optional[str] = SERP_API_KEY, url: str = SERP_URL,
+                 timeout: float = SERP_TIMEOUT, max_retries: int = SERP_MAX_RETRIES,
+                 max_concurrency: int = SERP_MAX_CONCURRENCY, cache: Optional[ResponseCache] = None):
+        """
+        Args:
+            api_key (str, optional): SerpAPI key.
+            url (str): Search endpoint.
+            timeout (float): Read timeout per attempt, in seconds.
+            max_retries (int): Retries for connection errors and retryable statuses.
+            max_concurrency (int): Pooled connections and search_many worker threads.
+            cache (ResponseCache, optional): Result cache; None disables caching.
+        """
+        self.api_key = api_key
+        self.url = url
+        self.timeout = (SERP_CONNECT_TIMEOUT, timeout)
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_concurrency,
+            pool_maxsize=max_concurrency,
+            max_retries=Retry(
+                total=max_retries,
+                backoff_factor=0.5,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=("GET",),
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.stats = {"requests": 0, "coalesced": 0, "errors": 0}
+
+    def _request(self, query: str, num_results: int) -> Dict[str, Any]:
+        params = {"q": query, "api_key": self.api_key, "num": num_results, "engine": "google"}
+        with self._lock:
+            self.stats["requests"] += 1
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise SerpError(f"SerpAPI request failed for {query!r}: {e}") from e
+        if "error" in data:
+            raise SerpError(f"SerpAPI error for {query!r}: {data['error']}")
+        return {
+            "organic_results": [
+                {field: result.get(field) for field in RESULT_FIELDS}
+                for result in data.get("organic_results", [])[:num_results]
+            ]
         }
-        response = requests.get(SERP_URL, params=params)
-        results = response.json().get("organic_results", [])
-
-        links = [{
-            "title": r.get("title"),
-            "link": r.get("link"),
-            "snippet": r.get("snippet")
-        } for r in results[:num_results]]
-
-        return links
-    except Exception as e:
-        log(f"SerpAPI error: {e}", level="ERROR")
-        return []
+
+    def fetch(self, query: str, num_results: int = 5) -> Dict[str, Any]:
+        """
+        Search results in SerpAPI's shape, trimmed to {"organic_results": [{title, link, snippet}]}.
+
+        Raises:
+            SerpError: The request failed after retries or the API returned an error.
+        """
+        with span("serpapi.search") as attributes:
+            normalized = normalize_query(query)
+            key = cache_key("serpapi", normalized, {"num": num_results})
+            if self.cache is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    attributes["source"] = "cache"
+                    return json.loads(cached)
+
+            with self._lock:
+                future = self._in_flight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._in_flight[key] = Future()
+                else:
+                    self.stats["coalesced"] += 1
+            if not leader:
+                attributes["source"] = "coalesced"
+                return future.result()
+
+            attributes["source"] = "request"
+            try:
+                data = self._request(query, num_results)
+                if self.cache is not None:
+                    self.cache.set(key, json.dumps(data))
+                future.set_result(data)
+                return data
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+
+    def search(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        """List of {title, link, snippet} dicts, best first."""
+        return self.fetch(query, num_results)["organic_results"]
+
+    def submit(self, query: str, num_results: int = 5) -> Future:
+        """
+        Start search() on the worker pool and return its Future. The search runs in a
+        copy of the caller's context, so its span lands in the caller's task trace.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="serpapi")
+        return self._executor.submit(contextvars.copy_context().run, self.search, query, num_results)
+
+    def search_many(self, queries: Sequence[str], num_results: int = 5,
+                    timeout: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Run several searches concurrently on the pooled session.
+
+        Args:
+            queries (list of str): Search queries.
+            num_results (int): Results per query.
+            timeout (float, optional): Seconds to wait overall; searches still running
+                then yield [] here but finish in the background and fill the cache.
+
+        Returns:
+            list: One result list per query, in order; a failed or late query yields [].
+        """
+        futures = [self.submit(query, num_results) for query in queries]
+        _, late = wait(futures, timeout=timeout)
+        if late:
+            log(f"{len(late)} of {len(futures)} searches missed the {timeout}s budget", level="WARNING")
+        results = []
+        for query, future in zip(queries, futures):
+            if future in late:
+                results.append([])
+                continue
+            try:
+                results.append(future.result())
+            except SerpError as e:
+                log(str(e), level="ERROR")
+                results.append([])
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        if self.cache is not None:
+            stats["cache"] = self.cache.get_stats()
+        return stats
+
+serp_client = SerpClient(
+    cache=ResponseCache(
+        max_entries=int(os.getenv("SERP_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("SERP_CACHE_TTL", "21600")),
+        path=os.getenv("SERP_CACHE_PATH", data_path("cache", "serpapi.sqlite3")) or None
+    )
+)
+metrics.register_collector(cache_collector("serpapi", serp_client.cache.get_stats))
+
+def fetch_search_results(query: str, num_results: int = 5) -> Dict[str, Any]:
+    """
+    Fetches search results from SerpAPI (Google Search) in SerpAPI's response shape.
+    Returns {} on failure.
+    """
+    try:
+        return serp_client.fetch(query, num_results)
+    except SerpError as e:
+        log(str(e), level="ERROR")
+        return {}
+
+def search_google(query: str, num_results: int = 5) -> list:
+    """
+    Fetches search results from SerpAPI (Google Search) as {title, link, snippet} dicts.
+    """
+    return fetch_search_results(query, num_results).get("organic_results", [])
+
+def submit_search(query: str, num_results: int = 5) -> Future:
+    """Start search_google in the background; the Future raises SerpError on failure."""
+    return serp_client.submit(query, num_results)
+
+def search_many(queries: Sequence[str], num_results: int = 5, timeout: Optional[float] = None) -> List[list]:
+    """Concurrent search_google over several queries, results in query order."""
+    return serp_client.search_many(queries, num_results, timeout=timeout)
+
+def get_cache_stats() -> Dict[str, Any]:
+    return serp_client.get_stats()
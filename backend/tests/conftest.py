@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The app imports both "flask_app.<module>" and top-level "db"/"core"/"config" modules.
+sys.path[:0] = [BACKEND_DIR, os.path.join(BACKEND_DIR, "flask_app")]
+
+# Keep runtime data, caches and the database out of the source tree, and never call real APIs.
+os.environ.setdefault("SAGE_DATA_DIR", tempfile.mkdtemp(prefix="sage-test-data-"))
+os.environ.setdefault("SERP_CACHE_PATH", "")
+os.environ.setdefault("MEMORY_SEMANTIC", "0")
+os.environ.setdefault("AGENT_WARMUP", "0")
+os.environ.setdefault("DB_URI", "sqlite://")
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("SERP_API_KEY", "test-key")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """
+    Replace the Gemini SDK call with a local fake and start from an empty response cache.
+
+    Yields:
+        dict: {"prompts": prompts received, "reply": callable(prompt) -> text};
+            streamed replies are forwarded word by word.
+    """
+    from flask_app.tools import gemini_connector
+
+    state = {"prompts": [], "reply": lambda prompt: f"answer to: {prompt[:40]}"}
+
+    def _request(prompt, config, timeout, on_chunk=None, cancelled=None):
+        state["prompts"].append(prompt)
+        text = state["reply"](prompt)
+        if on_chunk is not None:
+            for word in text.split(" "):
+                on_chunk(word + " ")
+        return text
+
+    monkeypatch.setattr(gemini_connector, "_request", _request)
+    gemini_connector.response_cache.clear()
+    yield state
+    gemini_connector.response_cache.clear()
+
+@pytest.fixture
+def app():
+    from app import create_app
+    return create_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,46 @@
+import pytest
+
+from flask_app.core.utils.bm25_index import BM25Index, CorpusIndex
+
+SOLAR = ["solar panels convert sunlight", "solar inverters and solar batteries", "panel mounting on roofs"]
+WIND = ["wind turbines in the north sea", "offshore wind farms", "solar and wind hybrid parks", "grid storage"]
+
+def _scores(hits):
+    return [round(score, 9) for score, *_ in hits]
+
+def test_scores_match_one_index_over_every_chunk(tmp_path):
+    corpus = CorpusIndex()
+    corpus.add_document("solar", BM25Index.from_chunks(SOLAR))
+    # Documents loaded from disk and documents added chunk by chunk index the same way.
+    BM25Index.from_chunks(WIND).save(str(tmp_path / "wind"))
+    corpus.add_document("wind", BM25Index.load(str(tmp_path / "wind")))
+    corpus.add_chunk("permits", BM25Index().add("solar farm permits"), {"solar": 1, "farm": 1, "permits": 1}, 3)
+
+    combined = BM25Index.from_chunks(SOLAR + WIND + ["solar farm permits"])
+    hits = corpus.search("solar wind", top_k=10)
+    assert _scores(hits) == _scores(combined.search("solar wind", top_k=10))
+    assert {doc_id for _, doc_id, _ in hits} == {"solar", "wind", "permits"}
+
+def test_filtering_keeps_corpus_wide_statistics():
+    corpus = CorpusIndex()
+    corpus.add_document("solar", BM25Index.from_chunks(SOLAR))
+    corpus.add_document("wind", BM25Index.from_chunks(WIND))
+
+    filtered = corpus.search("solar", top_k=10, doc_ids=["wind"])
+    unfiltered = {(doc_id, chunk_id): score for score, doc_id, chunk_id in corpus.search("solar", top_k=10)}
+    assert filtered == [(unfiltered[("wind", 2)], "wind", 2)]
+
+@pytest.mark.parametrize("replacement", [None, ["a rewritten solar document"]])
+def test_removing_or_replacing_a_document(replacement):
+    corpus = CorpusIndex()
+    corpus.add_document("solar", BM25Index.from_chunks(SOLAR))
+    corpus.add_document("wind", BM25Index.from_chunks(WIND))
+    if replacement is None:
+        corpus.remove("solar")
+    else:
+        corpus.add_document("solar", BM25Index.from_chunks(replacement))
+
+    remaining = WIND + (replacement or [])
+    assert _scores(corpus.search("solar wind", top_k=10)) == \
+        _scores(BM25Index.from_chunks(remaining).search("solar wind", top_k=10))
+    assert corpus.num_chunks == len(remaining)
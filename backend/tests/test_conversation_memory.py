@@ -0,0 +1,30 @@
+import threading
+
+from flask_app.core.services.conversation_memory import TaskConversationMemory
+
+def test_summarizing_does_not_block_the_task():
+    started, release = threading.Event(), threading.Event()
+
+    def _summarizer(previous_summary, transcript):
+        started.set()
+        release.wait(5)
+        return "they discussed solar panels"
+
+    memory = TaskConversationMemory(token_budget=140, summarizer=_summarizer)
+    for i in range(3):
+        memory.add_turn("t1", f"question {i} about solar panels", f"answer {i} " * 10)
+    writer = threading.Thread(target=memory.add_turn, args=("t1", "one more question", "answer " * 10))
+    writer.start()
+    assert started.wait(5)
+
+    # While the summarizer runs, the task can still be read and written; old turns are still there.
+    assert "question 0" in memory.get_context("t1")
+    memory.add_turn("t1", "a concurrent question", "short answer")
+
+    release.set()
+    writer.join(5)
+    context = memory.get_context("t1")
+    assert context.startswith("Summary of earlier conversation: they discussed solar panels")
+    assert "question 0" not in context
+    assert "a concurrent question" in context
+    assert memory.get_metrics()["summaries"] == 1
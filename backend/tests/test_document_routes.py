@@ -0,0 +1,70 @@
+import io
+import time
+from datetime import datetime, timezone
+
+from db.models import db, UploadedFile
+
+def test_status_fallback_reports_utc_epoch_seconds(monkeypatch, app):
+    # A non-UTC local zone exposes naive datetimes being read as local time.
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        with app.app_context():
+            uploaded = UploadedFile(filename="report.pdf", doc_id="doc-1", status="ready",
+                                    uploaded_at=datetime(2024, 1, 1, 12, 0, 0),
+                                    processed_at=datetime(2024, 1, 1, 12, 0, 30))
+            db.session.add(uploaded)
+            db.session.commit()
+            file_id = uploaded.id
+
+        response = app.test_client().get(f"/api/document/{file_id}/status")
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+    assert response.status_code == 200
+    queued_at = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc).timestamp()
+    assert response.json["timings"] == {"queued_at": queued_at, "ready_at": queued_at + 30}
+
+class _RecordingQueue:
+    def __init__(self):
+        self.submitted = []
+
+    def is_full(self):
+        return False
+
+    def submit(self, job_id, file_path, doc_id, metadata=None):
+        self.submitted.append(doc_id)
+        return {"job_id": job_id, "doc_id": doc_id, "status": "queued"}
+
+def test_replacement_is_not_deduplicated_onto_another_document(monkeypatch, tmp_path, app):
+    from core.routes import document_routes
+
+    queue = _RecordingQueue()
+    monkeypatch.setattr(document_routes, "_ingestion_queue", queue)
+    app.config["UPLOAD_FOLDER"] = str(tmp_path)
+    content = b"%PDF-1.4 shared bytes"
+    (tmp_path / "indexed.pdf").write_bytes(content)
+    with app.app_context():
+        content_hash = document_routes.file_sha256(str(tmp_path / "indexed.pdf"))
+        db.session.add_all([
+            UploadedFile(filename="a.pdf", doc_id="doc-a", content_hash="other", status="ready"),
+            UploadedFile(filename="b.pdf", doc_id="doc-b", content_hash=content_hash, status="ready"),
+        ])
+        db.session.commit()
+    client = app.test_client()
+
+    def _upload(**form):
+        return client.post("/api/document/upload", content_type="multipart/form-data",
+                           data={"file": (io.BytesIO(content), "new.pdf"), **form})
+
+    replaced = _upload(replace_doc_id="doc-a")
+    assert replaced.status_code == 202
+    assert replaced.json["doc_id"] == "doc-a"
+    assert queue.submitted == ["doc-a"]
+
+    # Without a replacement target the same bytes still reuse the indexed document.
+    deduplicated = _upload()
+    assert deduplicated.status_code == 200
+    assert deduplicated.json["doc_id"] == "doc-b" and deduplicated.json["deduplicated"] is True
+    assert queue.submitted == ["doc-a"]
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from flask_app.core.utils.rate_limit import TokenBucket
+from flask_app.tools import gemini_connector
+from flask_app.tools.gemini_connector import AsyncGeminiClient, GeminiError, count_model_calls
+
+@pytest.fixture
+def flaky_request(monkeypatch):
+    """
+    Stub _request that raises the queued errors in turn, then answers.
+
+    Yields:
+        dict: {"errors": exceptions to raise first, "calls": attempts made}.
+    """
+    state = {"errors": [], "calls": 0}
+
+    def _request(prompt, config, timeout, on_chunk=None, cancelled=None):
+        state["calls"] += 1
+        if state["errors"]:
+            raise state["errors"].pop(0)
+        return f"answer to: {prompt}"
+
+    monkeypatch.setattr(gemini_connector, "_request", _request)
+    return state
+
+def _client(**kwargs):
+    return AsyncGeminiClient(requests_per_second=0, backoff_base=0.001, backoff_cap=0.01, **kwargs)
+
+def test_retryable_errors_are_retried_with_backoff(monkeypatch, flaky_request):
+    delays = []
+    backoff_delay = gemini_connector.backoff_delay
+    monkeypatch.setattr(gemini_connector, "backoff_delay",
+                        lambda attempt, base, cap: delays.append(attempt) or backoff_delay(attempt, base, cap))
+    flaky_request["errors"] = [google_exceptions.ServiceUnavailable("busy"), google_exceptions.TooManyRequests("slow down")]
+    client = _client(max_retries=3)
+
+    assert client.generate_sync("hello", use_cache=False) == "answer to: hello"
+    assert flaky_request["calls"] == 3
+    assert delays == [0, 1]
+    assert client.stats == {"requests": 3, "retries": 2, "failures": 0}
+
+def test_gives_up_after_max_retries(flaky_request):
+    flaky_request["errors"] = [google_exceptions.ServiceUnavailable("busy")] * 5
+    client = _client(max_retries=2)
+
+    with pytest.raises(GeminiError, match="after 3 attempts"):
+        client.generate_sync("hello", use_cache=False)
+    assert flaky_request["calls"] == 3
+    assert client.stats["failures"] == 1
+
+def test_non_retryable_errors_fail_immediately(flaky_request):
+    flaky_request["errors"] = [google_exceptions.InvalidArgument("bad prompt")]
+    client = _client(max_retries=3)
+
+    with pytest.raises(GeminiError):
+        client.generate_sync("hello", use_cache=False)
+    assert flaky_request["calls"] == 1
+    assert client.stats["retries"] == 0
+
+def test_token_bucket_lets_a_burst_through_then_paces_requests():
+    async def _acquire_all(bucket, count):
+        started = time.monotonic()
+        stamps = []
+        for _ in range(count):
+            await bucket.acquire()
+            stamps.append(time.monotonic() - started)
+        return stamps
+
+    stamps = asyncio.run(_acquire_all(TokenBucket(rate=20, capacity=2), 4))
+
+    assert stamps[1] < 0.02  # The burst capacity is available at once.
+    assert stamps[2] >= 0.04  # Then one token per 1/20 s.
+    assert stamps[3] >= 0.09
+
+def test_deterministic_prompts_are_served_from_the_cache(fake_model):
+    with count_model_calls() as counter:
+        first = gemini_connector.generate_response("what is 2 + 2?", config={"temperature": 0})
+        second = gemini_connector.generate_response("what is 2 + 2?", config={"temperature": 0})
+        gemini_connector.generate_response("what is 2 + 2?")  # Sampled output is not cached.
+
+    assert first == second
+    assert fake_model["prompts"] == ["what is 2 + 2?", "what is 2 + 2?"]
+    assert counter == {"calls": 2, "cache_hits": 1}
@@ -0,0 +1,31 @@
+import threading
+
+from flask_app.core.services.ingestion_service import IngestionQueue
+
+class _DedupingRAGService:
+    """Reports every upload as a duplicate of an already indexed document."""
+
+    def process_document(self, file_path, doc_id, metadata=None, progress_callback=None):
+        progress_callback({"doc_id": "indexed-doc", "status": "ready", "deduplicated": True})
+        return "indexed-doc"
+
+    def get_status(self, doc_id):
+        return None
+
+def test_ready_job_carries_the_doc_id_that_was_indexed():
+    finished = threading.Event()
+    transitions = []
+
+    def _on_transition(job):
+        transitions.append(job)
+        if job["status"] in ("ready", "failed"):
+            finished.set()
+
+    ingestion_queue = IngestionQueue(rag_service=_DedupingRAGService(), workers=1, on_transition=_on_transition)
+    ingestion_queue.submit(1, "upload.pdf", "new-doc")
+
+    assert finished.wait(5)
+    assert transitions[-1]["status"] == "ready"
+    assert transitions[-1]["doc_id"] == "indexed-doc"
+    assert transitions[-1]["deduplicated"] is True
+    assert ingestion_queue.get_job(1)["doc_id"] == "indexed-doc"
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+
+import pytest
+
+from flask_app.core.utils import memory
+from flask_app.core.utils.embeddings import HashingEmbedder
+from flask_app.core.utils.memory import MemoryManager, task_namespace
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "memory" / "context.jsonl")
+
+def _manager(log_path, flush_interval=3600.0, **kwargs):
+    # A long interval keeps the background flusher out of the way; tests flush explicitly.
+    return MemoryManager(log_path=log_path, flush_interval=flush_interval, legacy_path=None, **kwargs)
+
+def _log_lines(log_path):
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path) as f:
+        return f.readlines()
+
+def test_writes_are_visible_at_once_and_reach_the_log_on_flush(log_path):
+    manager = _manager(log_path)
+    manager.set("topic", "solar", namespace=task_namespace(1))
+
+    assert manager.get("topic", namespace=task_namespace(1))["value"] == "solar"
+    assert _log_lines(log_path) == []
+
+    manager.flush()
+    assert len(_log_lines(log_path)) == 1
+
+def test_instances_replay_each_others_writes(log_path):
+    first, second = _manager(log_path), _manager(log_path)
+    first.set("shared", "from first")
+    first.flush()
+    second.flush()
+    assert second.get("shared")["value"] == "from first"
+
+    # An unflushed local write stays on top of an older write replayed from the log.
+    second.set("shared", "from second")
+    first.set("shared", "newest")
+    second.flush()
+    first.flush()
+    assert first.get("shared")["value"] == "newest"
+    assert _manager(log_path).get("shared")["value"] == "newest"
+
+@pytest.mark.parametrize("semantic", [False, True])
+def test_log_is_compacted_to_the_live_keys(monkeypatch, log_path, semantic):
+    monkeypatch.setattr(memory, "COMPACT_MIN_RECORDS", 10)
+    embedder = HashingEmbedder() if semantic else None
+    manager = _manager(log_path, flush_interval=0, embedder=embedder)
+    for version in range(40):
+        manager.set("counter", version)
+    manager.set("other", "solar panel vendors")
+
+    assert len(_log_lines(log_path)) < 10
+    reloaded = _manager(log_path, embedder=embedder)
+    assert reloaded.get("counter")["value"] == 39
+    assert reloaded.get("other")["value"] == "solar panel vendors"
+    if semantic:
+        assert reloaded.recall("solar vendors", top_k=1)[0]["key"] == "other"
+
+def test_entries_expire_after_their_ttl(log_path):
+    manager = _manager(log_path)
+    manager.set("short", "gone soon", ttl=0.05)
+    manager.set("long", "still here")
+    manager.flush()
+    time.sleep(0.1)
+
+    assert manager.get("short") is None
+    assert manager.get("long")["value"] == "still here"
+    assert _manager(log_path).get("short") is None
+
+def test_reads_and_writes_do_not_wait_for_a_flush(monkeypatch, log_path):
+    manager = _manager(log_path)
+    manager.set("before", 1)
+    syncing, release = threading.Event(), threading.Event()
+    fsync = os.fsync
+
+    def _slow_fsync(fd):
+        syncing.set()
+        release.wait(5)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", _slow_fsync)
+    flusher = threading.Thread(target=manager.flush)
+    flusher.start()
+    assert syncing.wait(5)
+
+    worker = threading.Thread(target=lambda: (manager.set("during", 2), manager.get("before")))
+    worker.start()
+    worker.join(1)
+    blocked = worker.is_alive()
+    release.set()
+    flusher.join(5)
+    worker.join(5)
+
+    assert not blocked
+    manager.flush()
+    assert _manager(log_path).get("during")["value"] == 2
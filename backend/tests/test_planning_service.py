@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+from flask import Flask
+from sqlalchemy import inspect
+
+from db.db_init import init_db
+from db.models import db
+from flask_app.core.services.planning_service import PlanningService
+
+def _flask_app(uri):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    init_db(app)
+    return app
+
+@pytest.fixture
+def planning(tmp_path):
+    return PlanningService(app=_flask_app(f"sqlite:///{tmp_path / 'plans.db'}"))
+
+def test_rerunning_a_plan_keeps_completed_checkpoints(planning):
+    planning.create_plan("solar research", ["find sources", "summarize"], task_id="t1")
+    planning.update_checkpoint("t1", "goal-1")
+
+    plan = planning.create_plan("solar research", ["find sources", "summarize"], task_id="t1")
+    assert [cp["completed"] for cp in plan["checkpoints"]] == [True, False]
+
+    # Changed goals replace the plan; the unchanged checkpoint keeps its status.
+    planning.tasks.clear()
+    plan = planning.create_plan("solar research", ["find sources", "compare vendors"], task_id="t1")
+    assert [cp["completed"] for cp in plan["checkpoints"]] == [True, False]
+    assert planning.check_progress("t1")["completed"] == 1
+
+def test_init_db_adds_columns_missing_from_an_older_database(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE uploaded_file (id INTEGER PRIMARY KEY, filename VARCHAR(255), "
+                           "filepath VARCHAR(255), uploaded_at DATETIME)")
+        connection.execute("INSERT INTO uploaded_file (filename) VALUES ('old.pdf')")
+
+    app = _flask_app(f"sqlite:///{path}")
+    with app.app_context():
+        inspector = inspect(db.engine)
+        columns = {column["name"] for column in inspector.get_columns("uploaded_file")}
+        indexes = {index["name"] for index in inspector.get_indexes("uploaded_file")}
+    assert {"doc_id", "content_hash", "status", "processed_at", "error"} <= columns
+    assert "ix_uploaded_file_content_hash" in indexes
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT filename, status FROM uploaded_file").fetchall() == [("old.pdf", None)]
@@ -0,0 +1,113 @@
+import random
+import threading
+from collections import namedtuple
+
+import pytest
+
+from flask_app.core.services import rag_service
+from flask_app.core.services.rag_service import RAGService
+
+Page = namedtuple("Page", "text total")
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi omicron pi rho sigma tau".split()
+
+def _document(inserted: str = "") -> str:
+    """Ten pages of pseudo-random sentences, pages separated by form feeds."""
+    rng = random.Random(7)
+    sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))).capitalize() + "."
+                 for _ in range(1000)]
+    if inserted:
+        sentences.insert(40, inserted)
+    return "\f".join(" ".join(sentences[i:i + 100]) for i in range(0, len(sentences), 100))
+
+@pytest.fixture
+def text_pages(monkeypatch):
+    """Parse test files as form-feed separated pages, pausing per page so ingestions overlap."""
+    started = threading.Event()
+
+    def _iter_file_pages(file_path, workers=None):
+        with open(file_path) as f:
+            pages = f.read().split("\f")
+        for page in pages:
+            started.set()
+            threading.Event().wait(0.005)
+            yield Page(page, len(pages))
+
+    monkeypatch.setattr(rag_service, "iter_file_pages", _iter_file_pages)
+    return started
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_edited_document_reuses_chunks_away_from_the_edit(tmp_path, text_pages, persistent):
+    service = RAGService(store_path=str(tmp_path / "rag") if persistent else None)
+    original, edited = tmp_path / "original.txt", tmp_path / "edited.txt"
+    original.write_text(_document())
+    edited.write_text(_document(inserted="A sentence added near the start."))
+
+    assert service.process_document(str(original), "doc", metadata={"user_id": "u1"}) == "doc"
+    assert service.process_document(str(edited), "doc") == "doc"
+
+    status = service.get_status("doc")
+    assert status["reused_chunks"] >= status["chunks"] - 3
+    # No metadata on the re-ingest: what was stored is kept.
+    assert service.search("alpha", filters={"user_id": "u1"}, top_k=1)
+
+def test_concurrent_identical_uploads_are_ingested_once(tmp_path, text_pages):
+    service = RAGService(store_path=None)
+    path = tmp_path / "report.txt"
+    path.write_text(_document())
+    results = []
+
+    def _upload(doc_id):
+        results.append(service.process_document(str(path), doc_id))
+
+    first = threading.Thread(target=_upload, args=("first",))
+    first.start()
+    assert text_pages.wait(5)
+    others = [threading.Thread(target=_upload, args=(f"copy-{i}",)) for i in range(2)]
+    for thread in others:
+        thread.start()
+    for thread in [first] + others:
+        thread.join(10)
+
+    assert results == ["first"] * 3
+    assert list(service.documents) == ["first"]
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_failed_reingest_keeps_the_indexed_version(tmp_path, text_pages, monkeypatch, persistent):
+    service = RAGService(store_path=str(tmp_path / "rag") if persistent else None)
+    original, edited = tmp_path / "original.txt", tmp_path / "edited.txt"
+    original.write_text(_document())
+    edited.write_text(_document(inserted="A sentence added near the start."))
+    assert service.process_document(str(original), "doc") == "doc"
+    before = {mode: service.search("alpha beta", top_k=3, mode=mode) for mode in ("vector", "lexical", "hybrid")}
+
+    parse_pages = rag_service.iter_file_pages
+
+    def _fail_on_page_two(file_path, workers=None):
+        for number, page in enumerate(parse_pages(file_path, workers), start=1):
+            if number == 2:
+                raise ValueError("corrupt page")
+            yield page
+
+    monkeypatch.setattr(rag_service, "iter_file_pages", _fail_on_page_two)
+    assert service.process_document(str(edited), "doc") is None
+    assert service.get_status("doc")["status"] == "failed"
+
+    for mode, hits in before.items():
+        assert hits and service.search("alpha beta", top_k=3, mode=mode) == hits
+
+def test_lexical_search_ranks_all_workers_documents_together(tmp_path, text_pages):
+    store_path = str(tmp_path / "rag")
+    writer = RAGService(store_path=store_path)
+    solar, wind = tmp_path / "solar.txt", tmp_path / "wind.txt"
+    solar.write_text("Solar panels convert sunlight. Solar inverters feed the grid.")
+    wind.write_text("Wind turbines spin offshore. Storage smooths wind and solar output.")
+    writer.process_document(str(solar), "solar")
+
+    # Another worker sees documents committed before and after its first search.
+    reader = RAGService(store_path=store_path)
+    assert {hit["doc_id"] for hit in reader.search("solar", mode="lexical")} == {"solar"}
+    writer.process_document(str(wind), "wind")
+    hits = reader.search("solar", mode="lexical")
+    assert [hit["doc_id"] for hit in hits] == ["solar", "wind"]
+    assert [hit["doc_id"] for hit in reader.search("solar", doc_ids=["wind"], mode="lexical")] == ["wind"]
+    assert hits == writer.search("solar", mode="lexical")
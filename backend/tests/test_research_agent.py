@@ -0,0 +1,28 @@
+import json
+
+from flask_app.agents.research_agent import ResearchAgent
+from flask_app.core.utils.telemetry import get_trace, trace_task
+from flask_app.tools import serpapi_connector
+
+def test_fan_out_keeps_the_raw_query_results_when_the_budget_is_spent(monkeypatch, fake_model):
+    searched = []
+
+    def _request(query, num_results):
+        searched.append(query)
+        return {"organic_results": [{"title": query, "link": f"https://example.com/{len(searched)}",
+                                     "snippet": f"about {query}"}]}
+
+    monkeypatch.setattr(serpapi_connector.serp_client, "_request", _request)
+    monkeypatch.setattr(serpapi_connector.serp_client, "cache", None)
+    fake_model["reply"] = lambda prompt: (json.dumps(["solar cell efficiency", "perovskite stability"])
+                                          if "JSON array" in prompt else "synthesis")
+
+    agent = ResearchAgent(use_web_search=True, fanout_width=3, time_budget=0)
+    with trace_task("fan-out"):
+        sub_queries, web_results = agent._fan_out("solar panels", None)
+
+    assert sub_queries[0] == "solar panels"
+    assert "about solar panels" in web_results
+    # The background search ran in the task's context, so its span is in the trace.
+    spans = [span for span in get_trace("fan-out")["spans"] if span["name"] == "serpapi.search"]
+    assert any(span["attributes"]["source"] == "request" for span in spans)
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from flask_app.core.utils.response_cache import ResponseCache
+from flask_app.tools.serpapi_connector import SerpClient, SerpError
+
+@pytest.fixture
+def serp_client(monkeypatch):
+    """
+    SerpClient with an in-memory cache and a stubbed _request.
+
+    Yields:
+        tuple: (client, state) where state holds the queries sent, a "release"
+            event gating every request, and an optional "error" to raise.
+    """
+    client = SerpClient(api_key="test-key", cache=ResponseCache(max_entries=16, ttl=60))
+    state = {"queries": [], "release": threading.Event(), "error": None}
+    state["release"].set()
+
+    def _request(query, num_results):
+        state["queries"].append(query)
+        state["release"].wait(5)
+        if state["error"] is not None:
+            raise state["error"]
+        return {"organic_results": [{"title": query, "link": "https://example.com", "snippet": "result"}]}
+
+    monkeypatch.setattr(client, "_request", _request)
+    return client, state
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+def test_normalized_queries_are_served_from_the_cache(serp_client):
+    client, state = serp_client
+
+    first = client.search("Solar  Panels")
+    second = client.search("solar panels")
+
+    assert first == second
+    assert state["queries"] == ["Solar  Panels"]
+    assert client.get_stats()["cache"]["hits"] == 1
+    assert client.search("solar panels", num_results=3) and len(state["queries"]) == 2
+
+def test_identical_queries_in_flight_share_one_request(serp_client):
+    client, state = serp_client
+    state["release"].clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.search("wind turbines"))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: client.get_stats()["coalesced"] == 2)
+
+    state["release"].set()
+    for thread in threads:
+        thread.join(5)
+
+    assert state["queries"] == ["wind turbines"]
+    assert len(results) == 3 and results[0] == results[1] == results[2]
+
+def test_failed_request_reaches_waiters_and_is_not_cached(serp_client):
+    client, state = serp_client
+    state["release"].clear()
+    state["error"] = SerpError("quota exceeded")
+    errors = []
+
+    def _search():
+        try:
+            client.search("tidal power")
+        except SerpError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=_search) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: client.get_stats()["coalesced"] == 1)
+    state["release"].set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 2
+    state["error"] = None
+    assert client.search("tidal power")
+    assert state["queries"] == ["tidal power", "tidal power"]
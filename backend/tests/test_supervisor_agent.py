@@ -0,0 +1,49 @@
+from flask_app.agents.supervisor_agent import SupervisorAgent
+from flask_app.tools import gemini_connector
+
+def test_failed_research_cancels_downstream_steps(fake_model, monkeypatch):
+    def _request(prompt, config, timeout, on_chunk=None, cancelled=None):
+        fake_model["prompts"].append(prompt)
+        raise ValueError("model unavailable")  # not retryable: fails on the first attempt
+
+    monkeypatch.setattr(gemini_connector, "_request", _request)
+    events = []
+
+    result = SupervisorAgent().manage_task("t-fail", {"query": "q", "goals": ["g"]}, on_event=events.append)
+
+    assert "research step failed" in result["error"]
+    assert len(fake_model["prompts"]) == 1
+    started = {event["step"] for event in events if event["type"] == "step_start"}
+    assert started <= {"plan", "research"}
+
+def test_manage_task_runs_direct_mode(fake_model):
+    result = SupervisorAgent().manage_task("t-direct", {"query": "q", "goals": ["status"], "mode": "direct"})
+
+    assert "error" not in result
+    assert result["research"].startswith("answer to:")
+    assert result["model_calls"]["calls"] == len(fake_model["prompts"])
+
+def test_manage_task_reports_unknown_mode():
+    assert SupervisorAgent().manage_task("t-bad", {"query": "q", "mode": "bogus"}) == {
+        "error": "Unknown execution mode: bogus"
+    }
+
+def test_critique_recovers_from_a_failed_batch_call(fake_model, monkeypatch):
+    def _request(prompt, config, timeout, on_chunk=None, cancelled=None):
+        fake_model["prompts"].append(prompt)
+        if "one object per goal" in prompt:
+            raise ValueError("batch critique rejected")
+        if "evaluator" in prompt:
+            return "0.9\nCovers the goal."
+        text = f"answer to: {prompt[:40]}"
+        if on_chunk is not None:
+            on_chunk(text)
+        return text
+
+    monkeypatch.setattr(gemini_connector, "_request", _request)
+
+    result = SupervisorAgent().manage_task("t-critique", {"query": "q", "goals": ["explain solar cells"],
+                                                          "mode": "direct"})
+
+    assert "error" not in result
+    assert result["critique"] == {"score": 0.9, "passed": True, "text": "Covers the goal."}
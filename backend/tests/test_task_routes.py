@@ -0,0 +1,51 @@
+import json
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        data = [line[len("data: "):] for line in block.splitlines() if line.startswith("data: ")]
+        events.append(json.loads("".join(data)))
+    return events
+
+def test_stream_task_emits_steps_tokens_and_result(client, fake_model):
+    response = client.post("/api/task/t-stream/stream", json={"query": "ocean currents", "goals": ["explain drift"]})
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = _parse_sse(response.get_data(as_text=True))
+    types = [event["type"] for event in events]
+    assert types[0] == "accepted"
+    assert types[-1] == "done"
+    assert "error" not in types
+
+    started = [event["step"] for event in events if event["type"] == "step_start"]
+    ended = [event["step"] for event in events if event["type"] == "step_end"]
+    assert {"plan", "research", "strategy"} <= set(started)
+    assert sorted(started) == sorted(ended)
+    # Research output reaches the client as tokens before its step ends.
+    research_tokens = [i for i, event in enumerate(events) if event["type"] == "token" and event["step"] == "research"]
+    research_end = next(i for i, event in enumerate(events) if event["type"] == "step_end" and event["step"] == "research")
+    assert research_tokens and research_tokens[-1] < research_end
+
+    result = events[-1]["result"]
+    assert result["research"].startswith("answer to:")
+    assert result["mode"] == "stream"
+    assert result["plan"]["task_id"] == "t-stream"
+
+def test_stream_task_requires_query(client):
+    response = client.post("/api/task/t-empty/stream", json={})
+
+    assert response.status_code == 400
+
+def test_agent_pool_counters_are_exported_to_prometheus(client):
+    from flask_app.core.services.agent_service import get_agent_pool
+
+    pool = get_agent_pool()
+    constructions = pool.get_metrics()["constructions"]
+    pool.record_construction(0.25)
+
+    lines = client.get("/metrics").get_data(as_text=True).splitlines()
+    assert "# TYPE sage_agent_constructions_total counter" in lines
+    assert f"sage_agent_constructions_total {constructions + 1}" in lines
+    assert any(line.startswith("sage_agent_construction_seconds_total ") for line in lines)
+    assert any(line.startswith("sage_agent_pool_builds_total ") for line in lines)